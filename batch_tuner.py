@@ -0,0 +1,169 @@
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import pandas as pd
+
+
+class BatchTuner:
+	"""
+	Find batch size of executemany with most rows per second, by growing or shrinking it between batches
+	"""
+
+	# tuned batch size of each (server, table) for tuners without state file
+	TUNED = {}
+
+	def __init__(self, initial=1000, min_batch=100, max_batch=100000, max_bytes=64 * 1024 * 1024,
+	             max_packet_bytes=None, growth=2.0, tolerance=0.05, probe_every=20, state_path=None):
+		"""
+		Initialization for attributes
+		:param initial: int | first batch size if nothing is tuned for (server, table) yet
+		:param min_batch: int | smallest batch size
+		:param max_batch: int | largest batch size
+		:param max_bytes: int | estimated client memory of one batch at most
+		:param max_packet_bytes: int | estimated size of one statement at most, e.g. max_allowed_packet of MySQL
+		:param growth: float | factor of first steps, smaller after each change of direction
+		:param tolerance: float | change of rows per second treated as noise, 0.05 is 5 %
+		:param probe_every: int | unchanged batches after which batch size is changed again for a test
+		:param state_path: path like | JSON file keeping tuned sizes between runs, memory of process only if None
+		"""
+
+		self.initial = initial
+		self.min_batch = min_batch
+		self.max_batch = max_batch
+		self.max_bytes = max_bytes
+		self.max_packet_bytes = max_packet_bytes
+		self.growth = growth
+		self.tolerance = tolerance
+		self.probe_every = probe_every
+		self.state_path = state_path
+		self.lock = threading.Lock()
+		self.trace = pd.DataFrame()
+
+		self.tuned = self.TUNED
+		if state_path is not None:
+			self.tuned = {}
+			if os.path.exists(state_path):
+				with open(file=state_path, mode="r", encoding="utf-8") as f:
+					self.tuned = json.load(f)
+
+	@staticmethod
+	def key(server, table_name):
+		"""
+		Key of tuned batch size
+		:param server: str | server name
+		:param table_name: str | table name
+		:return: str | key
+		"""
+
+		return f"{server}/{table_name}"
+
+	def batch_size(self, server, table_name):
+		"""
+		Tuned batch size
+		:param server: str | server name
+		:param table_name: str | table name
+		:return: int | tuned size, initial size if not tuned yet
+		"""
+
+		with self.lock:
+			return self.tuned.get(self.key(server, table_name), self.initial)
+
+	def write(self, server, table_name, rows, execute):
+		"""
+		Write rows batch by batch and tune batch size on the way
+		:param server: str | server name, part of key of tuned size
+		:param table_name: str | table name, part of key of tuned size
+		:param rows: iterable | tuples of values
+		:param execute: function | writes one batch, e.g. lambda batch: cursor.executemany(sql, batch)
+		:return: int | rows written; each batch is in attribute trace
+		"""
+
+		rows = iter(rows)
+		sample = list(itertools.islice(rows, 100))
+		if not sample:
+			self.trace = pd.DataFrame()
+			return 0
+		rows = itertools.chain(sample, rows)
+
+		upper = self._upper_limit(sample)
+		size = min(max(self.batch_size(server, table_name), self.min_batch), upper)
+		direction = 1
+		factor = self.growth
+		previous = None
+		stable = 0
+		best_size, best_speed = size, 0.0
+
+		trace = []
+		total = 0
+		for number in itertools.count(1):
+			batch = list(itertools.islice(rows, size))
+			if not batch:
+				break
+
+			start = time.perf_counter()
+			execute(batch)
+			seconds = time.perf_counter() - start
+
+			speed = len(batch) / seconds if seconds else float("inf")
+			total += len(batch)
+			trace.append({"batch": number, "batch_size": size, "rows": len(batch), "seconds": seconds,
+			              "rows_per_second": speed, "limit": upper})
+
+			# last batch is not full, its speed says nothing about size
+			if len(batch) < size:
+				break
+
+			if speed > best_speed:
+				best_size, best_speed = size, speed
+
+			if previous is not None:
+				if speed < previous * (1 - self.tolerance):
+					# last step made it slower: go back with smaller steps
+					direction = -direction
+					factor = max(math.sqrt(factor), 1.1)
+				elif speed <= previous * (1 + self.tolerance):
+					# no clear change: stay, but try a step now and then since load of server changes
+					previous = speed
+					stable += 1
+					if stable < self.probe_every:
+						continue
+			previous = speed
+			stable = 0
+
+			size = int(round(min(max(size * factor ** direction, self.min_batch), upper)))
+
+		self.trace = pd.DataFrame(data=trace, columns=["batch", "batch_size", "rows", "seconds", "rows_per_second",
+		                                               "limit"])
+		if best_speed:
+			self._remember(self.key(server, table_name), best_size)
+
+		return total
+
+	def _upper_limit(self, sample):
+		"""
+		Largest batch size allowed by memory and packet limits, from estimated size of sample rows
+		:param sample: list | some rows
+		:return: int
+		"""
+
+		row_bytes = max(1, sum(sum(len(str(value)) + 8 for value in row) for row in sample) // len(sample))
+
+		upper = min(self.max_batch, self.max_bytes // row_bytes)
+		if self.max_packet_bytes:
+			upper = min(upper, self.max_packet_bytes // row_bytes)
+
+		return max(self.min_batch, int(upper))
+
+	def _remember(self, key, size):
+		with self.lock:
+			self.tuned[key] = size
+			if self.state_path is None:
+				return
+
+			path_tmp = f"{self.state_path}.tmp"
+			with open(file=path_tmp, mode="w", encoding="utf-8") as f:
+				json.dump(self.tuned, f, indent=2)
+			os.replace(path_tmp, self.state_path)
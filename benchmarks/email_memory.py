@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from send_email import SendEmail, MailSession, PART_CACHE
+from benchmarks.smtp_sink import SMTPSink
+
+
+def measure(send):
+	"""
+	Run one send function and trace memory
+	:param send: function | sends one email
+	:return: tuple | (seconds, peak traced memory in MB)
+	"""
+
+	PART_CACHE.clear()
+	tracemalloc.start()
+	start = time.perf_counter()
+	send()
+	seconds = time.perf_counter() - start
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	return seconds, peak / 1024 / 1024
+
+
+def main(sizes_mb=(1, 8, 32)):
+	"""
+	Compare peak memory of as_string() and streamed sending for attachments of different size
+	:param sizes_mb: tuple | attachment sizes in MB
+	:return: list | one dict for each size and method
+	"""
+
+	results = []
+	email = SendEmail(sender_name="Benchmark", sender_address="benchmark@localhost", receiver=["sink@localhost"],
+	                  cc=[], subject="memory benchmark", content="report attached")
+
+	with SMTPSink() as sink, tempfile.TemporaryDirectory() as dir_tmp:
+		host, port = sink.server_address
+
+		with MailSession(host=host, port=port) as session:
+			for size_mb in sizes_mb:
+				path = os.path.join(dir_tmp, f"report_{size_mb}mb.pdf")
+				with open(file=path, mode="wb") as f:
+					f.write(os.urandom(size_mb * 1024 * 1024))
+
+				methods = {
+					"as_string": lambda: email.send_email_with_text(session=session, attachment_path=[path]),
+					"streamed": lambda: email.send_email_streamed(attachment_path=[path], session=session),
+				}
+				for method, send in methods.items():
+					seconds, peak_mb = measure(send)
+					results.append({"size_mb": size_mb, "method": method, "seconds": seconds, "peak_mb": peak_mb})
+					print(f"{size_mb:>4} MB  {method:<10} {seconds:8.3f} s  peak {peak_mb:8.1f} MB")
+
+	return results
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,62 @@
+"""
+In-process DB-API driver for benchmarks, keeps executed SQL and row counts instead of talking to a server
+"""
+
+apilevel = "2.0"
+threadsafety = 1
+paramstyle = "qmark"
+
+
+class Error(Exception):
+	pass
+
+
+class Cursor:
+
+	def __init__(self, connection):
+		self.connection = connection
+		self.fast_executemany = False
+		self.rowcount = -1
+
+	def execute(self, sql, *parameters):
+		self.connection.statements.append(sql)
+		self.rowcount = 1
+		return self
+
+	def executemany(self, sql, rows):
+		self.connection.statements.append(sql)
+		count = 0
+		for _ in rows:
+			count += 1
+		self.connection.rows += count
+		self.rowcount = count
+
+	def fetchall(self):
+		return []
+
+	def close(self):
+		pass
+
+
+class Connection:
+
+	def __init__(self):
+		self.statements = []
+		self.rows = 0
+		self.commits = 0
+
+	def cursor(self):
+		return Cursor(self)
+
+	def commit(self):
+		self.commits += 1
+
+	def rollback(self):
+		pass
+
+	def close(self):
+		pass
+
+
+def connect(*args, **kwargs):
+	return Connection()
@@ -0,0 +1,82 @@
+import socketserver
+import threading
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+	"""
+	Answer SMTP commands and discard the email data
+	"""
+
+	def handle(self):
+		self.wfile.write(b"220 sink ready\r\n")
+		self.server.connections += 1
+		messages = 0
+
+		while True:
+			line = self.rfile.readline()
+			if not line:
+				return
+
+			command = line.strip().upper()
+			if command.startswith((b"EHLO", b"HELO")):
+				self.wfile.write(b"250-sink\r\n250 8BITMIME\r\n")
+
+			elif command.startswith(b"MAIL") and self.server.max_messages_per_connection is not None and \
+					messages >= self.server.max_messages_per_connection:
+				# like Exchange: limit of connection reached, server closes it
+				self.wfile.write(b"421 too many messages in this connection\r\n")
+				return
+
+			elif command == b"DATA":
+				self.wfile.write(b"354 end with <CRLF>.<CRLF>\r\n")
+				size = 0
+				while True:
+					data_line = self.rfile.readline()
+					if not data_line:
+						# client dropped connection inside DATA, email is incomplete
+						return
+					if data_line == b".\r\n":
+						break
+					size += len(data_line)
+				self.server.received.append(size)
+				messages += 1
+				self.wfile.write(b"250 queued\r\n")
+
+			elif command == b"QUIT":
+				self.wfile.write(b"221 bye\r\n")
+				return
+
+			else:
+				self.wfile.write(b"250 ok\r\n")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+	"""
+	Local SMTP server for benchmarks, usable as context manager
+	"""
+
+	allow_reuse_address = True
+	daemon_threads = True
+
+	def __init__(self, host="127.0.0.1", port=0, max_messages_per_connection=None):
+		"""
+		Initialization for attributes
+		:param host: str | address to listen on
+		:param port: int | port to listen on, a free port is chosen if 0
+		:param max_messages_per_connection: int | answer 421 and close connection after this many emails
+		"""
+
+		super().__init__((host, port), _SinkHandler)
+		self.max_messages_per_connection = max_messages_per_connection
+		self.received = []
+		self.connections = 0
+		self.thread = None
+
+	def __enter__(self):
+		self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+		self.thread.start()
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.shutdown()
+		self.server_close()
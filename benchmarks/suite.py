@@ -0,0 +1,419 @@
+import argparse
+import importlib
+import importlib.util
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import fake_dbapi
+from benchmarks.smtp_sink import SMTPSink
+
+# database drivers are not needed offline, fake driver is used if they are not installed
+for _driver in ("pyodbc", "pymssql"):
+	try:
+		importlib.import_module(_driver)
+	except ImportError:
+		sys.modules[_driver] = fake_dbapi
+
+PATH_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# name: (function, unit, required packages)
+CASES = {}
+
+
+def benchmark(name, unit, requires=()):
+	"""
+	Register benchmark case; function gets a temp directory and returns (function to measure, amount of units),
+	optionally also a function called after measuring
+	:param name: str | case name
+	:param unit: str | unit of amount, e.g. "MB" or "rows"
+	:param requires: tuple | packages needed, case is skipped if one is missing
+	:return: function | decorator
+	"""
+
+	def decorator(func):
+		CASES[name] = (func, unit, requires)
+		return func
+
+	return decorator
+
+
+def _write_random(path, size_mb, header=b""):
+	with open(file=path, mode="wb") as f:
+		f.write(header + os.urandom(int(size_mb * 1024 * 1024)))
+	return path
+
+
+def _fake_mssql():
+	from sql_server_connection import MSSQL
+
+	mssql = MSSQL(server="benchmark", database="benchmark", user="benchmark", password="benchmark")
+	mssql.con_pyodbc = fake_dbapi.connect
+	return mssql
+
+
+def _encrypted_workbook(dir_tmp, rows):
+	import openpyxl
+	from msoffcrypto.format.ooxml import OOXMLFile
+
+	path_plain = os.path.join(dir_tmp, f"plain_{rows}.xlsx")
+	path_encrypted = os.path.join(dir_tmp, f"encrypted_{rows}.xlsx")
+	if os.path.exists(path_encrypted):
+		return path_encrypted
+
+	workbook = openpyxl.Workbook(write_only=True)
+	worksheet = workbook.create_sheet("Data")
+	worksheet.append(["id", "name", "amount", "day"])
+	for i in range(rows):
+		worksheet.append([i, f"name {i % 500}", i * 0.5, f"2024-01-{i % 28 + 1:02d}"])
+	workbook.save(path_plain)
+
+	with open(file=path_plain, mode="rb") as f, open(file=path_encrypted, mode="wb") as f_out:
+		OOXMLFile(f).encrypt("benchmark", f_out)
+
+	return path_encrypted
+
+
+for _size_mb in (1, 8, 32):
+	def _pdf_base64(dir_tmp, size_mb=_size_mb):
+		from pdf_file import PDFData
+
+		pdf = PDFData(dir_pdf=_write_random(os.path.join(dir_tmp, f"report_{size_mb}mb.pdf"), size_mb))
+		return pdf.convert_to_base64, size_mb
+
+	benchmark(f"pdf_base64_{_size_mb}mb", "MB", requires=("pandas",))(_pdf_base64)
+
+
+@benchmark("mssql_create_table", "tables", requires=("sqlalchemy",))
+def _mssql_create_table(dir_tmp):
+	mssql = _fake_mssql()
+	columns = {f"column_{i}": "NVARCHAR(100)" if i % 2 else "DECIMAL(18, 4)" for i in range(200)}
+
+	def run():
+		for i in range(2000):
+			mssql.create_table(table_name=f"table_{i}", dict_columns=columns)
+
+	return run, 2000
+
+
+@benchmark("mssql_sql_generation", "statements", requires=("sqlalchemy",))
+def _mssql_sql_generation(dir_tmp):
+	mssql = _fake_mssql()
+
+	def run():
+		for i in range(5000):
+			mssql.truncate_table(table_name=f"table_{i}")
+			mssql.drop_table(table_name=f"table_{i}")
+			mssql.add_table_property(table_name=f"table_{i}", table_desc="benchmark table")
+			mssql.update_table_property(table_name=f"table_{i}", table_desc="benchmark table")
+
+	return run, 20000
+
+
+@benchmark("excel_load_fake_driver", "rows", requires=("openpyxl", "msoffcrypto", "sqlalchemy"))
+def _excel_load(dir_tmp):
+	from excel_loader import ExcelLoader
+
+	loader = ExcelLoader(mssql=_fake_mssql(), file_path=_encrypted_workbook(dir_tmp, rows=20000),
+	                     password="benchmark", chunk_size=5000,
+	                     dtypes={"id": "int", "name": "str", "amount": "float", "day": "datetime"})
+
+	return lambda: loader.load(sheet_map={"Data": "stg_data"}), 20000
+
+
+@benchmark("mime_attachment_cold", "MB")
+def _mime_attachment_cold(dir_tmp):
+	from send_email import SendEmail, PART_CACHE
+
+	path = _write_random(os.path.join(dir_tmp, "attachment_8mb.pdf"), 8)
+	email = SendEmail(sender_name="Benchmark", sender_address="benchmark@localhost", receiver=["sink@localhost"],
+	                  cc=[], subject="benchmark", content="report attached")
+
+	def run():
+		PART_CACHE.clear()
+		msg, _ = email.create_message(attachment_path=[path])
+		msg.as_bytes()
+
+	return run, 8
+
+
+@benchmark("mime_attachment_warm", "MB")
+def _mime_attachment_warm(dir_tmp):
+	from send_email import SendEmail, PART_CACHE
+
+	path = _write_random(os.path.join(dir_tmp, "attachment_8mb.pdf"), 8)
+	email = SendEmail(sender_name="Benchmark", sender_address="benchmark@localhost", receiver=["sink@localhost"],
+	                  cc=[], subject="benchmark", content="report attached")
+	PART_CACHE.clear()
+
+	def run():
+		msg, _ = email.create_message(attachment_path=[path])
+		msg.as_bytes()
+
+	return run, 8
+
+
+@benchmark("mime_html_images", "emails")
+def _mime_html_images(dir_tmp):
+	from send_email import SendEmail
+
+	paths = [_write_random(os.path.join(dir_tmp, f"image_{i}.png"), 0.2, header=b"\x89PNG\r\n\x1a\n") for i in range(5)]
+	content = "".join(f'<p>chart {i}</p><img src="cid:image{i}">' for i in range(5))
+	email = SendEmail(sender_name="Benchmark", sender_address="benchmark@localhost", receiver=["sink@localhost"],
+	                  cc=[], subject="benchmark", content=content)
+
+	def run():
+		for _ in range(20):
+			msg, _ = email.create_message(subtype="html", image_path=paths)
+			msg.as_bytes()
+
+	return run, 20
+
+
+for _output in ("memory", "spill", "file"):
+	def _decrypt(dir_tmp, output=_output):
+		from decrypt_file import DecryptFile
+
+		path = _encrypted_workbook(dir_tmp, rows=100000)
+		size_mb = os.path.getsize(path) / 1024 / 1024
+		path_output = os.path.join(dir_tmp, "decrypted.xlsx")
+
+		def run():
+			decrypted = DecryptFile(file_path=path).decrypted_file(password="benchmark", output=output,
+			                                                       spill_threshold=1024 * 1024,
+			                                                       path_output=path_output)
+			if hasattr(decrypted, "close"):
+				decrypted.close()
+
+		return run, size_mb
+
+	benchmark(f"decrypt_{_output}", "MB", requires=("msoffcrypto", "openpyxl"))(_decrypt)
+
+
+def _frame(rows):
+	import numpy as np
+	import pandas as pd
+
+	return pd.DataFrame({"id": np.arange(rows),
+	                     "name": [f"name {i % 500}" for i in range(rows)],
+	                     "amount": np.arange(rows) * 0.5,
+	                     "day": pd.date_range("2024-01-01", periods=rows, freq="min")})
+
+
+@benchmark("sqlite_bulk_load", "rows", requires=("pandas", "sqlalchemy"))
+def _sqlite_bulk_load(dir_tmp):
+	import sqlalchemy
+
+	engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(dir_tmp, 'load.db')}")
+	df_data = _frame(200000)
+
+	def run():
+		df_data.to_sql("data", engine, if_exists="replace", index=False, chunksize=10000)
+
+	return run, len(df_data)
+
+
+@benchmark("sqlite_bulk_read", "rows", requires=("pandas", "sqlalchemy"))
+def _sqlite_bulk_read(dir_tmp):
+	import pandas as pd
+	import sqlalchemy
+
+	engine = sqlalchemy.create_engine(f"sqlite:///{os.path.join(dir_tmp, 'read.db')}")
+	df_data = _frame(200000)
+	df_data.to_sql("data", engine, if_exists="replace", index=False, chunksize=10000)
+
+	def run():
+		pd.read_sql("SELECT * FROM data", engine)
+
+	return run, len(df_data)
+
+
+@benchmark("smtp_sink_send", "emails")
+def _smtp_sink_send(dir_tmp):
+	from send_email import SendEmail, MailSession
+
+	email = SendEmail(sender_name="Benchmark", sender_address="benchmark@localhost", receiver=["sink@localhost"],
+	                  cc=[], subject="benchmark", content="daily report")
+
+	# server is started once, its shutdown takes up to half a second
+	sink = SMTPSink().__enter__()
+	host, port = sink.server_address
+
+	def run():
+		with MailSession(host=host, port=port) as session:
+			for _ in range(200):
+				email.send_email_with_text(session=session)
+
+	return run, 200, lambda: sink.__exit__(None, None, None)
+
+
+@benchmark("smtp_sink_streamed_8mb", "MB")
+def _smtp_sink_streamed(dir_tmp):
+	from send_email import SendEmail, MailSession
+
+	path = _write_random(os.path.join(dir_tmp, "attachment_8mb.pdf"), 8)
+	email = SendEmail(sender_name="Benchmark", sender_address="benchmark@localhost", receiver=["sink@localhost"],
+	                  cc=[], subject="benchmark", content="report attached")
+
+	sink = SMTPSink().__enter__()
+	host, port = sink.server_address
+
+	def run():
+		with MailSession(host=host, port=port) as session:
+			email.send_email_streamed(attachment_path=[path], session=session)
+
+	return run, 8, lambda: sink.__exit__(None, None, None)
+
+
+def run_case(name, dir_tmp, repeat=3):
+	"""
+	Measure one case: best time of repeat runs after one warm-up run, then peak memory in a separate traced run
+	:param name: str | case name
+	:param dir_tmp: path like | directory for test files
+	:param repeat: int | timed runs
+	:return: dict | name, unit, amount, seconds, throughput, peak_mb; status "skipped" if a package is missing,
+	"failed" if the case raised
+	"""
+
+	func, unit, requires = CASES[name]
+	result = {"name": name, "unit": unit, "status": "ok", "amount": None, "seconds": None, "throughput": None,
+	          "peak_mb": None}
+
+	missing = [package for package in requires if importlib.util.find_spec(package) is None]
+	if missing:
+		result["status"] = f"skipped, missing {', '.join(missing)}"
+		return result
+
+	cleanup = []
+	try:
+		run, amount, *cleanup = func(dir_tmp)
+		run()
+
+		seconds = []
+		for _ in range(repeat):
+			start = time.perf_counter()
+			run()
+			seconds.append(time.perf_counter() - start)
+
+		# tracing slows down allocation, so memory is measured apart from time
+		tracemalloc.start()
+		run()
+		_, peak = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+
+	except Exception as e:
+		# one broken case must not abort the others
+		if tracemalloc.is_tracing():
+			tracemalloc.stop()
+		result["status"] = f"failed, {type(e).__name__}: {e}"
+		return result
+
+	finally:
+		for func_cleanup in cleanup:
+			func_cleanup()
+
+	result["amount"] = amount
+	result["seconds"] = min(seconds)
+	result["throughput"] = amount / min(seconds)
+	result["peak_mb"] = peak / 1024 / 1024
+
+	return result
+
+
+def compare(results, baseline, tolerance=0.2, memory_tolerance=0.2, memory_floor_mb=1.0):
+	"""
+	Find metrics worse than baseline by more than tolerance
+	:param results: list | result of run_case
+	:param baseline: dict | case name and saved result
+	:param tolerance: float | allowed drop of throughput, 0.2 is 20 %
+	:param memory_tolerance: float | allowed growth of peak memory
+	:param memory_floor_mb: float | growth of peak memory below this is ignored as noise
+	:return: list | description of each regression
+	"""
+
+	regressions = []
+	for result in results:
+		saved = baseline.get(result["name"])
+		if result["status"] != "ok" or not saved:
+			continue
+
+		if result["throughput"] < saved["throughput"] * (1 - tolerance):
+			regressions.append(f"{result['name']}: throughput {result['throughput']:.1f} {result['unit']}/s, "
+			                   f"baseline {saved['throughput']:.1f} {result['unit']}/s")
+
+		if (result["peak_mb"] > saved["peak_mb"] * (1 + memory_tolerance)
+				and result["peak_mb"] - saved["peak_mb"] > memory_floor_mb):
+			regressions.append(f"{result['name']}: peak memory {result['peak_mb']:.1f} MB, "
+			                   f"baseline {saved['peak_mb']:.1f} MB")
+
+	return regressions
+
+
+def main(argv=None):
+	"""
+	Run benchmarks, compare with baseline and optionally save results as new baseline
+	:param argv: list | command line arguments, sys.argv if None
+	:return: int | 0 if every case ran without regression, 1 otherwise
+	"""
+
+	parser = argparse.ArgumentParser(description="Offline benchmarks of Module_Common")
+	parser.add_argument("--only", nargs="*", default=None, help="run cases whose name contains one of these")
+	parser.add_argument("--repeat", type=int, default=3, help="timed runs of each case")
+	parser.add_argument("--baseline", default=PATH_BASELINE, help="JSON file of baseline results")
+	parser.add_argument("--save", action="store_true", help="save results as new baseline")
+	parser.add_argument("--tolerance", type=float, default=0.2, help="allowed drop of throughput")
+	parser.add_argument("--memory-tolerance", type=float, default=0.2, help="allowed growth of peak memory")
+	args = parser.parse_args(argv)
+
+	names = [name for name in CASES if not args.only or any(part in name for part in args.only)]
+
+	results = []
+	with tempfile.TemporaryDirectory() as dir_tmp:
+		for name in names:
+			result = run_case(name=name, dir_tmp=dir_tmp, repeat=args.repeat)
+			results.append(result)
+			if result["status"] == "ok":
+				print(f"{name:<28} {result['throughput']:>12.1f} {result['unit'] + '/s':<14} "
+				      f"{result['seconds']:8.3f} s  peak {result['peak_mb']:8.1f} MB")
+			else:
+				print(f"{name:<28} {result['status']}")
+
+	baseline = {}
+	if os.path.exists(args.baseline):
+		with open(file=args.baseline, mode="r", encoding="utf-8") as f:
+			baseline = json.load(f)["cases"]
+
+	regressions = compare(results=results, baseline=baseline, tolerance=args.tolerance,
+	                      memory_tolerance=args.memory_tolerance)
+	for regression in regressions:
+		print(f"REGRESSION {regression}")
+
+	# a gate which checked nothing must not pass
+	problems = [f"{result['name']}: {result['status']}" for result in results if result["status"].startswith("failed")]
+	if not any(result["status"] == "ok" for result in results):
+		problems.append("no case ran")
+	ran = {result["name"] for result in results if result["status"] == "ok"}
+	problems.extend(f"{name}: in baseline, but not run" for name in baseline
+	                if name not in ran and (name in names or name not in CASES))
+	for problem in problems:
+		print(f"ERROR {problem}", file=sys.stderr)
+
+	if args.save:
+		# keep baseline of cases not run this time
+		baseline.update({result["name"]: result for result in results if result["status"] == "ok"})
+		with open(file=args.baseline, mode="w", encoding="utf-8") as f:
+			json.dump({"python": platform.python_version(), "machine": platform.machine(), "cases": baseline}, f,
+			          indent=2)
+		print(f"baseline saved to {args.baseline}")
+
+	return 1 if regressions or problems else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,246 @@
+import itertools
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from send_email import SendEmail, MailSession, MAIL_HOST, MAIL_PORT
+
+
+class RateLimiter:
+	"""
+	Allow at most given emails per second, shared by threads
+	"""
+
+	def __init__(self, rate):
+		"""
+		Initialization for attributes
+		:param rate: float | emails per second, no limit if None
+		"""
+
+		self.rate = rate
+		self.next_time = time.monotonic()
+		self.lock = threading.Lock()
+
+	def acquire(self):
+		"""
+		Wait until next email is allowed
+		:return: None
+		"""
+
+		if not self.rate:
+			return
+
+		with self.lock:
+			now = time.monotonic()
+			wait = self.next_time - now
+			self.next_time = max(now, self.next_time) + 1 / self.rate
+
+		if wait > 0:
+			time.sleep(wait)
+
+
+class BulkEmail:
+	"""
+	Send personalized emails to many receivers based on one template
+	"""
+
+	def __init__(self, template, receiver_column="receiver", subtype="plain", image_path=None, attachment_path=None,
+	             connections=4, render_workers=4, rate_per_connection=None, rate_global=None,
+	             retries=3, backoff=1.0, host=MAIL_HOST, port=MAIL_PORT):
+		"""
+		Initialization for attributes
+		:param template: SendEmail | subject and content may contain {column} placeholders
+		:param receiver_column: str | column with email address of receiver, several addresses split by ","
+		:param subtype: str | "plain" or "html"
+		:param image_path: list | path of pictures used for html content
+		:param attachment_path: list | path of files attached to every email, e.g. PDF
+		:param connections: int | number of connections to Email Server
+		:param render_workers: int | number of threads to create email objects
+		:param rate_per_connection: float | emails per second on each connection, no limit if None
+		:param rate_global: float | emails per second on all connections, no limit if None
+		:param retries: int | times to resend after temporary (4xx) error
+		:param backoff: float | seconds to wait before first resend, doubled for each further resend
+		:param host: str | host name of Email Server
+		:param port: int | port of Email Server
+		"""
+
+		self.template = template
+		self.receiver_column = receiver_column
+		self.subtype = subtype
+		self.image_path = image_path
+		self.attachment_path = attachment_path
+		self.connections = connections
+		self.render_workers = render_workers
+		self.rate_per_connection = rate_per_connection
+		self.rate_global = rate_global
+		self.retries = retries
+		self.backoff = backoff
+		self.host = host
+		self.port = port
+
+	def render(self, row):
+		"""
+		Create email object for one receiver
+		:param row: dict | values of one receiver
+		:return: tuple | (email object, list of receiver and Cc)
+		"""
+
+		email = SendEmail(sender_name=self.template.sender_name,
+		                  sender_address=self.template.sender_address,
+		                  receiver=str(row[self.receiver_column]).split(","),
+		                  cc=self.template.cc,
+		                  subject=self.template.subject.format(**row),
+		                  content=self.template.content.format(**row))
+
+		return email.create_message(subtype=self.subtype, image_path=self.image_path,
+		                            attachment_path=self.attachment_path)
+
+	def send(self, rows):
+		"""
+		Render and send email for each row
+		:param rows: DataFrame or iterable of dict | one row for each receiver
+		:return: DataFrame | status, attempts and timing for each row
+		"""
+
+		if isinstance(rows, pd.DataFrame):
+			rows = rows.to_dict(orient="records")
+
+		jobs = queue.Queue(maxsize=self.connections * 10)
+		results = []
+		results_lock = threading.Lock()
+		global_limiter = RateLimiter(rate=self.rate_global)
+
+		# start one sender thread for each connection
+		senders = [threading.Thread(target=self._sender, args=(jobs, results, results_lock, global_limiter),
+		                            daemon=True)
+		           for _ in range(self.connections)]
+		for sender in senders:
+			sender.start()
+
+		# render emails in chunks so that only few messages are hold in memory
+		rows = iter(rows)
+		index = 0
+		with ThreadPoolExecutor(max_workers=self.render_workers) as pool:
+			while True:
+				chunk = list(itertools.islice(rows, self.connections * 10))
+				if not chunk:
+					break
+
+				for row, rendered in zip(chunk, pool.map(self._render_safe, chunk)):
+					self._put(jobs, (index, row.get(self.receiver_column), rendered), senders)
+					index += 1
+
+		# stop sender threads
+		for _ in senders:
+			if not any(sender.is_alive() for sender in senders):
+				break
+			self._put(jobs, None, senders)
+		for sender in senders:
+			sender.join()
+
+		df_result = pd.DataFrame(data=results,
+		                         columns=["row_index", "receiver", "status", "attempts", "latency", "total_time",
+		                                  "error"])
+		df_result.sort_values(by="row_index", inplace=True)
+		df_result.reset_index(drop=True, inplace=True)
+
+		return df_result
+
+	@staticmethod
+	def _put(jobs, job, senders, timeout=1):
+		"""
+		Put job into queue, wait for free place only while a sender thread is alive to take it
+		:param jobs: Queue | jobs of sender threads
+		:param job: tuple | job, None to stop one sender
+		:param senders: list | sender threads
+		:param timeout: float | seconds between two checks of sender threads
+		:return: None
+		"""
+
+		while True:
+			try:
+				jobs.put(job, timeout=timeout)
+				return
+			except queue.Full:
+				if not any(sender.is_alive() for sender in senders):
+					raise RuntimeError("all sender threads stopped, emails can not be sent")
+
+	def _render_safe(self, row):
+		"""
+		Create email object, return exception instead of raising it
+		:param row: dict | values of one receiver
+		:return: tuple or Exception
+		"""
+
+		try:
+			return self.render(row)
+		except Exception as e:
+			return e
+
+	def _sender(self, jobs, results, results_lock, global_limiter):
+		"""
+		Send emails from queue through one own connection
+		:return: None
+		"""
+
+		connection_limiter = RateLimiter(rate=self.rate_per_connection)
+
+		# connect lazily, so that one unreachable connection does not stop the queue
+		session = MailSession(host=self.host, port=self.port)
+
+		try:
+			while True:
+				job = jobs.get()
+				if job is None:
+					return
+
+				index, receiver, rendered = job
+				start = time.perf_counter()
+
+				if isinstance(rendered, Exception):
+					status, attempts, latency, error = "render_failed", 0, None, repr(rendered)
+				else:
+					# unexpected error must not stop the thread and lose the row
+					try:
+						status, attempts, latency, error = self._send_with_retry(session, rendered,
+						                                                         connection_limiter, global_limiter)
+					except Exception as e:
+						status, attempts, latency, error = "failed", None, None, repr(e)
+						session.close()
+
+				with results_lock:
+					results.append([index, receiver, status, attempts, latency, time.perf_counter() - start, error])
+
+		finally:
+			session.close()
+
+	def _send_with_retry(self, session, rendered, connection_limiter, global_limiter):
+		"""
+		Send one email, resend with backoff after temporary error
+		:return: list | status, attempts, latency and error
+		"""
+
+		msg, to_list = rendered
+		error = None
+
+		for attempt in range(1, self.retries + 2):
+			global_limiter.acquire()
+			connection_limiter.acquire()
+
+			try:
+				latency = session.send_message(msg=msg, to_list=to_list)
+				return ["sent", attempt, latency, None]
+
+			except (smtplib.SMTPException, OSError) as e:
+				error = e
+				temporary = MailSession.is_temporary_error(e)
+
+			if not temporary:
+				return ["failed", attempt, None, repr(error)]
+
+			if attempt <= self.retries:
+				time.sleep(self.backoff * 2 ** (attempt - 1))
+
+		return ["failed", self.retries + 1, None, repr(error)]
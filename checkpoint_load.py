@@ -0,0 +1,270 @@
+import datetime
+import itertools
+import json
+import os
+import time
+import pandas as pd
+
+
+class CheckpointLoad:
+	"""
+	Load rows into SQL Server table chunk by chunk, commit each chunk and keep checkpoint so that a rerun resumes
+	after last committed chunk
+	"""
+
+	def __init__(self, mssql, table_name, columns, load_name=None, chunk_size=50000, state_path=None,
+	             control_table=None):
+		"""
+		Initialization for attributes
+		:param mssql: MSSQL | connection settings of SQL Server
+		:param table_name: str | target table
+		:param columns: list | column names in order of values in each row
+		:param load_name: str | name of load in checkpoint, table name if None
+		:param chunk_size: int | rows committed at once
+		:param state_path: path like | local JSON file for checkpoint
+		:param control_table: str | table for checkpoint, updated in same transaction as chunk; used instead of
+		                      state_path if given
+		"""
+
+		if state_path is None and control_table is None:
+			raise ValueError("state_path or control_table is needed")
+
+		self.mssql = mssql
+		self.table_name = table_name
+		self.columns = list(columns)
+		self.load_name = load_name or table_name
+		self.chunk_size = chunk_size
+		self.state_path = state_path
+		self.control_table = control_table
+
+		self.sql_insert = (f"INSERT INTO {table_name} ({', '.join(f'[{column}]' for column in self.columns)}) "
+		                   f"VALUES ({', '.join('?' for _ in self.columns)})")
+
+	def create_control_table(self):
+		"""
+		Create control table if not exists
+		:return: None
+		"""
+
+		self.mssql.execute_sql_query(f"""
+        IF OBJECT_ID(QUOTENAME('dbo') + '.' + QUOTENAME('{self.control_table}'), 'U') IS NULL
+        BEGIN
+            CREATE TABLE {self.control_table} (
+                [load_name] NVARCHAR(200) NOT NULL PRIMARY KEY,
+                [chunk] INT NOT NULL,
+                [source_offset] BIGINT NOT NULL,
+                [done] BIT NOT NULL,
+                [updated] DATETIME2(3) NOT NULL
+            );
+        END
+        """)
+
+	def checkpoint(self):
+		"""
+		Last committed checkpoint
+		:return: dict | chunk, offset and done; chunk 0 and offset 0 if load has not started
+		"""
+
+		if self.control_table is not None:
+			con = self.mssql.con_pyodbc()
+			try:
+				return self._read_control(con.cursor())
+			finally:
+				con.close()
+
+		return self._read_state()
+
+	def reset(self, truncate=False):
+		"""
+		Forget checkpoint so that next run starts from first row
+		:param truncate: boolean | also truncate target table
+		:return: None
+		"""
+
+		if truncate:
+			self.mssql.truncate_table(table_name=self.table_name)
+
+		if self.control_table is not None:
+			self.mssql.execute_sql_query(f"DELETE FROM {self.control_table} WHERE load_name = N'"
+			                             f"{self.load_name.replace(chr(39), chr(39) * 2)}'")
+		elif os.path.exists(self.state_path):
+			os.remove(self.state_path)
+
+	def run(self, source):
+		"""
+		Load source from last checkpoint on
+		:param source: DataFrame, iterable or callable | rows as tuples; callable gets offset and returns rows from
+		               there, e.g. for reading file with skiprows; rows before offset of iterable are read and skipped
+		:return: tuple | (DataFrame with each chunk loaded in this run, dict with checkpoint and throughput)
+		"""
+
+		con = self.mssql.con_pyodbc()
+		cursor = con.cursor()
+		cursor.fast_executemany = True
+
+		results = []
+		start = time.perf_counter()
+		try:
+			if self.control_table is not None:
+				state = self._read_control(cursor)
+			else:
+				state = self._recover_state(cursor, self._read_state())
+
+			resumed = {"chunk": state["chunk"], "offset": state["offset"]}
+
+			if not state["done"]:
+				for rows in self._chunks(source, state["offset"]):
+					start_chunk = time.perf_counter()
+					self._commit_chunk(con, cursor, state, rows)
+					results.append([state["chunk"], state["offset"] - len(rows), len(rows),
+					                time.perf_counter() - start_chunk])
+
+				state["done"] = True
+				if self.control_table is not None:
+					self._write_control(cursor, state)
+					con.commit()
+				else:
+					self._write_state(state)
+
+		except Exception:
+			con.rollback()
+			raise
+
+		finally:
+			con.close()
+
+		seconds = time.perf_counter() - start
+		df_result = pd.DataFrame(data=results, columns=["chunk", "offset", "rows", "seconds"])
+		rows = int(df_result["rows"].sum())
+		summary = {"load_name": self.load_name,
+		           "resumed_chunk": resumed["chunk"],
+		           "resumed_offset": resumed["offset"],
+		           "chunks": len(df_result),
+		           "rows": rows,
+		           "last_chunk": state["chunk"],
+		           "last_offset": state["offset"],
+		           "seconds": seconds,
+		           "rows_per_second": rows / seconds if seconds else 0.0}
+
+		return df_result, summary
+
+	def _chunks(self, source, offset):
+		"""
+		Rows of source from offset in chunks
+		:return: generator | list of tuples for each chunk
+		"""
+
+		if isinstance(source, pd.DataFrame):
+			for position in range(offset, len(source), self.chunk_size):
+				df_chunk = source.iloc[position:position + self.chunk_size]
+				df_chunk = df_chunk.astype(object).where(df_chunk.notna(), None)
+				yield list(df_chunk.itertuples(index=False, name=None))
+			return
+
+		if callable(source):
+			rows = iter(source(offset))
+		else:
+			rows = itertools.islice(source, offset, None)
+
+		while True:
+			chunk = list(itertools.islice(rows, self.chunk_size))
+			if not chunk:
+				return
+			yield chunk
+
+	def _commit_chunk(self, con, cursor, state, rows):
+		"""
+		Insert and commit one chunk, move checkpoint on
+		:return: None
+		"""
+
+		if self.control_table is not None:
+			cursor.executemany(self.sql_insert, rows)
+			state["chunk"] += 1
+			state["offset"] += len(rows)
+
+			# checkpoint is committed with chunk or not at all
+			self._write_control(cursor, state)
+			con.commit()
+			return
+
+		# state file can not be part of transaction: remember expected row count of table before commit
+		state["pending"] = {"chunk": state["chunk"] + 1, "offset": state["offset"] + len(rows),
+		                    "table_rows": state["table_rows"] + len(rows)}
+		self._write_state(state)
+
+		cursor.executemany(self.sql_insert, rows)
+		con.commit()
+
+		state.update({key: state["pending"][key] for key in ("chunk", "offset", "table_rows")})
+		state["pending"] = None
+		self._write_state(state)
+
+	def _count_rows(self, cursor):
+		cursor.execute(f"SELECT COUNT_BIG(*) FROM {self.table_name}")
+		return int(cursor.fetchone()[0])
+
+	def _recover_state(self, cursor, state):
+		"""
+		Decide if chunk pending at crash was committed, by row count of table
+		:return: dict | state
+		"""
+
+		if state["table_rows"] is None:
+			state["table_rows"] = self._count_rows(cursor)
+			return state
+
+		if state["pending"] is None:
+			return state
+
+		table_rows = self._count_rows(cursor)
+		if table_rows == state["pending"]["table_rows"]:
+			state.update({key: state["pending"][key] for key in ("chunk", "offset", "table_rows")})
+		elif table_rows != state["table_rows"]:
+			raise RuntimeError(f"{self.table_name} has {table_rows} rows, checkpoint expects {state['table_rows']} "
+			                   f"or {state['pending']['table_rows']}; table was changed by someone else, "
+			                   f"check it and call reset()")
+
+		state["pending"] = None
+		self._write_state(state)
+
+		return state
+
+	def _read_state(self):
+		state = {"load_name": self.load_name, "chunk": 0, "offset": 0, "done": False, "table_rows": None,
+		         "pending": None}
+		if os.path.exists(self.state_path):
+			with open(file=self.state_path, mode="r", encoding="utf-8") as f:
+				state.update(json.load(f))
+
+		return state
+
+	def _write_state(self, state):
+		state["updated"] = datetime.datetime.now().isoformat(timespec="seconds")
+		path_tmp = f"{self.state_path}.tmp"
+		with open(file=path_tmp, mode="w", encoding="utf-8") as f:
+			json.dump(state, f, indent=2)
+			f.flush()
+			os.fsync(f.fileno())
+		os.replace(path_tmp, self.state_path)
+
+	def _read_control(self, cursor):
+		cursor.execute(f"SELECT chunk, source_offset, done FROM {self.control_table} WHERE load_name = ?",
+		               self.load_name)
+		row = cursor.fetchone()
+		if row is None:
+			return {"chunk": 0, "offset": 0, "done": False}
+
+		return {"chunk": int(row[0]), "offset": int(row[1]), "done": bool(row[2])}
+
+	def _write_control(self, cursor, state):
+		cursor.execute(f"""
+        MERGE {self.control_table} AS target
+        USING (SELECT ? AS load_name) AS source
+        ON target.load_name = source.load_name
+        WHEN MATCHED THEN
+            UPDATE SET chunk = ?, source_offset = ?, done = ?, updated = SYSDATETIME()
+        WHEN NOT MATCHED THEN
+            INSERT (load_name, chunk, source_offset, done, updated) VALUES (?, ?, ?, ?, SYSDATETIME());
+        """, self.load_name, state["chunk"], state["offset"], state["done"], self.load_name, state["chunk"],
+		               state["offset"], state["done"])
@@ -1,15 +1,329 @@
 import msoffcrypto
+from msoffcrypto.exceptions import FileFormatError, InvalidKeyError
+from msoffcrypto.format.ooxml import OOXMLFile
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+import olefile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import hashlib
 import io
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import weakref
+import zipfile
+from collections import OrderedDict
+import pandas as pd
+
+
+class DecryptCache:
+	"""
+	Keep decrypted content, either in memory with LRU and byte budget or as files in a private temp directory
+	"""
+
+	def __init__(self, max_bytes=512 * 1024 * 1024, on_disk=False, dir_cache=None):
+		"""
+		Initialization for attributes
+		:param max_bytes: int | total size of decrypted content to keep, least recently used is dropped first
+		:param on_disk: boolean | keep decrypted files in temp directory instead of memory
+		:param dir_cache: path like | directory for on_disk, a new directory only readable by current user if None;
+		                  new directory is removed with the cache or at exit, files in a given directory stay until
+		                  clear() is called
+		"""
+
+		self.max_bytes = max_bytes
+		self.on_disk = on_disk
+		self.dir_cache = dir_cache
+		if on_disk and dir_cache is None:
+			self.dir_cache = tempfile.mkdtemp(prefix="decrypt_cache_")
+			# decrypted files must not stay on disk after the process
+			weakref.finalize(self, shutil.rmtree, self.dir_cache, ignore_errors=True)
+
+		self.entries = OrderedDict()
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.lock = threading.Lock()
+
+	@staticmethod
+	def key(file_path, password):
+		"""
+		Key of one file version, password is part of key so that wrong password never gets cached content
+		:param file_path: str | path of file
+		:param password: str | password
+		:return: str | key
+		"""
+
+		stat = os.stat(file_path)
+		text = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{password}"
+
+		return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+	def get(self, key):
+		"""
+		Cached content
+		:param key: str | key of file version
+		:return: BytesIO or str | decrypted content, or path of decrypted file if on_disk; None if not cached
+		"""
+
+		with self.lock:
+			if key not in self.entries:
+				self.misses += 1
+				return None
+
+			self.entries.move_to_end(key)
+			self.hits += 1
+			value = self.entries[key]
+
+		if self.on_disk:
+			return value
+
+		# BytesIO shares the bytes object until it is written
+		return io.BytesIO(value)
+
+	def put(self, key, data):
+		"""
+		Save decrypted content
+		:param key: str | key of file version
+		:param data: bytes | decrypted content
+		:return: BytesIO or str | decrypted content, or path of decrypted file if on_disk
+		"""
+
+		if self.on_disk:
+			path = os.path.join(self.dir_cache, key)
+			descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+			with os.fdopen(descriptor, mode="wb") as f:
+				f.write(data)
+			value = path
+		else:
+			value = data
+
+		with self.lock:
+			if key not in self.entries:
+				self.entries[key] = value
+				self.size += len(data)
+
+			while self.size > self.max_bytes and len(self.entries) > 1:
+				self._drop_oldest()
+
+		return value if self.on_disk else io.BytesIO(data)
+
+	def clear(self):
+		"""
+		Drop all cached content, also removes files of on_disk cache in a given dir_cache
+		:return: None
+		"""
+
+		with self.lock:
+			while self.entries:
+				self._drop_oldest()
+
+	def _drop_oldest(self):
+		_, value = self.entries.popitem(last=False)
+
+		if self.on_disk:
+			self.size -= os.path.getsize(value)
+			os.remove(value)
+		else:
+			self.size -= len(value)
+
+
+# segment of EncryptedPackage, each encrypted with own IV by agile encryption
+SEGMENT_LENGTH = 4096
+HASH_FUNCTIONS = {"SHA1": hashlib.sha1, "SHA256": hashlib.sha256, "SHA384": hashlib.sha384, "SHA512": hashlib.sha512}
+
+
+class _SectorReader:
+	"""
+	Read large OLE stream sector by sector from disk, olefile.openstream would load it at once
+	"""
+
+	def __init__(self, ole, name):
+		"""
+		Initialization for attributes
+		:param ole: object | olefile.OleFileIO
+		:param name: str | stream name
+		"""
+
+		entry = ole.direntries[ole._find(name)]
+		self.ole = ole
+		self.sect = entry.isectStart
+		self.remaining = entry.size
+		self.buffer = b""
+
+	def read(self, size):
+		while len(self.buffer) < size and self.remaining > 0:
+			if self.sect > olefile.MAXREGSECT:
+				raise IOError("OLE stream is shorter than its size")
+			self.ole.fp.seek(self.ole.sectorsize * (self.sect + 1))
+			data = self.ole.fp.read(min(self.ole.sectorsize, self.remaining))
+			if not data:
+				raise IOError("OLE file is truncated")
+			self.buffer += data
+			self.remaining -= len(data)
+			self.sect = self.ole.fat[self.sect]
+
+		data, self.buffer = self.buffer[:size], self.buffer[size:]
+
+		return data
+
+
+def _decrypt_into(office_file, f_out):
+	"""
+	Decrypt into file object segment by segment, so that neither encrypted nor decrypted content is in memory as a
+	whole; formats other than OOXML with agile or standard encryption are decrypted by msoffcrypto in memory
+	:param office_file: object | msoffcrypto office file with loaded key
+	:param f_out: object | writable and seekable binary file, empty
+	:return: None
+	"""
+
+	encryption = getattr(office_file, "type", None)
+	if not isinstance(office_file, OOXMLFile) or encryption not in ("agile", "standard"):
+		office_file.decrypt(f_out)
+		return
+
+	key = office_file.secret_key
+	ole = office_file.file
+	# small streams are kept in mini stream, olefile reads them
+	if ole.direntries[ole._find("EncryptedPackage")].size < ole.minisectorcutoff:
+		stream = ole.openstream("EncryptedPackage")
+	else:
+		stream = _SectorReader(ole, "EncryptedPackage")
+
+	remaining = struct.unpack("<Q", stream.read(8))[0]
+	if encryption == "agile":
+		salt = office_file.info["keyDataSalt"]
+		hash_function = HASH_FUNCTIONS.get(office_file.info["keyDataHashAlgorithm"], hashlib.sha1)
+	else:
+		decryptor = Cipher(algorithms.AES(key), modes.ECB()).decryptor()
+
+	index = 0
+	while remaining > 0:
+		segment = stream.read(SEGMENT_LENGTH)
+		if not segment:
+			break
+
+		if encryption == "agile":
+			iv = hash_function(salt + struct.pack("<I", index)).digest()[:16]
+			decryptor = Cipher(algorithms.AES(key), modes.CBC(iv)).decryptor()
+			data = decryptor.update(segment) + decryptor.finalize()
+		else:
+			data = decryptor.update(segment)
+
+		f_out.write(data[:remaining])
+		remaining -= min(len(data), remaining)
+		index += 1
+
+	# wrong password gives random bytes instead of zip file
+	f_out.seek(0)
+	if not zipfile.is_zipfile(f_out):
+		raise InvalidKeyError("The file could not be decrypted with this password")
+	f_out.seek(0, io.SEEK_END)
+
+
+class MappedFile(io.RawIOBase):
+	"""
+	Read-only file object over a memory map, e.g. for pandas.read_excel; raw map is in attribute mapped
+	"""
+
+	def __init__(self, mapped):
+		"""
+		Initialization for attributes
+		:param mapped: object | mmap.mmap, None for empty content which can not be mapped
+		"""
+
+		super().__init__()
+		self.mapped = mapped
+		self.view = memoryview(mapped if mapped is not None else b"")
+		self.position = 0
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def readinto(self, buffer):
+		size = min(len(buffer), len(self.view) - self.position)
+		buffer[:size] = self.view[self.position:self.position + size]
+		self.position += size
+
+		return size
+
+	def seek(self, offset, whence=io.SEEK_SET):
+		if whence == io.SEEK_CUR:
+			offset += self.position
+		elif whence == io.SEEK_END:
+			offset += len(self.view)
+		self.position = max(offset, 0)
+
+		return self.position
+
+	def tell(self):
+		return self.position
+
+	def close(self):
+		if not self.closed:
+			self.view.release()
+			if self.mapped is not None:
+				self.mapped.close()
+		super().close()
+
+
+def _decrypt_worker(file_path, password, dir_dst):
+	"""
+	Decrypt one file in worker process
+	:return: dict | result of file, content as bytes if dir_dst is None
+	"""
+
+	start = time.perf_counter()
+	result = {"file_path": file_path, "status": None, "output": None, "bytes": 0, "seconds": None, "error": None}
+
+	try:
+		if dir_dst is None:
+			decrypted = DecryptFile(file_path=file_path).decrypted_file(password=password)
+		else:
+			# decrypt directly into destination file
+			decrypted = DecryptFile(file_path=file_path).decrypted_file(
+					password=password, output="file", path_output=os.path.join(dir_dst, os.path.basename(file_path)))
+
+		if isinstance(decrypted, str) and decrypted == file_path:
+			result["status"] = "not_encrypted"
+			result["output"] = decrypted
+
+		elif isinstance(decrypted, str):
+			result["status"] = "decrypted"
+			result["output"] = decrypted
+			result["bytes"] = os.path.getsize(decrypted)
+
+		else:
+			result["status"] = "decrypted"
+			result["output"] = decrypted.getvalue()
+			result["bytes"] = len(result["output"])
+
+	except Exception as e:
+		result["status"] = "failed"
+		result["error"] = repr(e)
+
+	result["seconds"] = time.perf_counter() - start
+
+	return result
+
 
 class DecryptFile:
 
-	def __init__(self, file_path):
+	def __init__(self, file_path, cache=None):
 		"""
 		Initialization for attributes
 		:param file_path: str | path of file
+		:param cache: DecryptCache | keep decrypted content for repeated opens, decrypt every time if None
 		"""
 
 		self.file_path = file_path
+		self.cache = cache
 
 	def is_encrypted(self):
 		"""
@@ -21,32 +335,156 @@ class DecryptFile:
 
 			with open(file=self.file_path, mode="rb") as f:
 				return msoffcrypto.OfficeFile(f).is_encrypted()
-		except:
+		except FileFormatError:
 			return False
 
-	def decrypted_file(self, password):
+	def decrypted_file(self, password, output="memory", spill_threshold=64 * 1024 * 1024, path_output=None):
 		"""
 		Read data from Excel based on different situation
 		:param password: str | password
+		:param output: str | target of decrypted content:
+		                "memory": BytesIO;
+		                "spill": in memory below spill_threshold, temp file above;
+		                "file": file at path_output, or a new temp file; its path is returned;
+		                "mmap": MappedFile, read-only memory map of a temp file;
+		                OOXML files are read and decrypted segment by segment, so that "spill", "file" and "mmap"
+		                never keep whole file in memory
+		:param spill_threshold: int | bytes kept in memory at most for output "spill"
+		:param path_output: path like | destination for output "file"
 		:return: Object
 		"""
 
-		# 如果文件被加密
-		if self.is_encrypted():
+		if output not in ("memory", "spill", "file", "mmap"):
+			raise ValueError("output must be 'memory', 'spill', 'file' or 'mmap'")
+
+		# 如果已缓存
+		use_cache = self.cache is not None and output == "memory"
+		if use_cache:
+			key = self.cache.key(file_path=self.file_path, password=password)
+			cached = self.cache.get(key)
+			if cached is not None:
+				return cached
+
+		# 只打开和解析一次文件
+		with open(file=self.file_path, mode="rb") as f:
+
+			try:
+				office_file = msoffcrypto.OfficeFile(f)
+				encrypted = office_file.is_encrypted()
+			except FileFormatError:
+				encrypted = False
+
+			# 如果文件未被加密
+			if not encrypted:
+				return self.file_path
 
+			# 如果文件被加密
 			if not password:
 				raise ValueError("文件已加密,需要提供密码")
 
-			decrypted = io.BytesIO()
-			with open(file=self.file_path, mode="rb") as f:
+			office_file.load_key(password=password)
 
-				office_file = msoffcrypto.OfficeFile(f)
-				office_file.load_key(password=password)
-				office_file.decrypt(decrypted)
+			if output == "file":
+				if path_output is None:
+					descriptor, path_output = tempfile.mkstemp(suffix=os.path.splitext(self.file_path)[1])
+					os.close(descriptor)
+					os.remove(path_output)
 
-			return decrypted
+				# 先写入同目录的临时文件, 成功后再改名, 密码错误时不留下损坏的文件
+				descriptor, path_tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path_output)),
+				                                        prefix=".decrypting_")
+				try:
+					with os.fdopen(descriptor, mode="w+b") as f_out:
+						_decrypt_into(office_file, f_out)
+					os.replace(path_tmp, path_output)
+				except BaseException:
+					os.remove(path_tmp)
+					raise
+				return path_output
 
+			if output == "mmap":
+				# file is removed by OS when closed, memory map stays valid
+				with tempfile.TemporaryFile() as f_out:
+					_decrypt_into(office_file, f_out)
+					f_out.flush()
+					# empty file can not be mapped
+					if f_out.tell() == 0:
+						return MappedFile(None)
+					return MappedFile(mmap.mmap(f_out.fileno(), 0, access=mmap.ACCESS_READ))
 
-		# 如果文件未被加密
-		else:
-			return self.file_path
+			if output == "spill":
+				decrypted = tempfile.SpooledTemporaryFile(max_size=spill_threshold)
+			else:
+				decrypted = io.BytesIO()
+			_decrypt_into(office_file, decrypted)
+
+		if use_cache:
+			return self.cache.put(key, decrypted.getvalue())
+
+		decrypted.seek(0)
+		return decrypted
+
+	@staticmethod
+	def iter_decrypt_many(paths, password_map, workers=None, dir_dst=None):
+		"""
+		Decrypt many files in a process pool, yield result of each file as soon as it is finished
+		:param paths: list | path of files
+		:param password_map: dict or str | password by full path or file name, or one password for all files
+		:param workers: int | number of processes, number of CPU cores if None
+		:param dir_dst: path like | write decrypted files into this directory, keep them in memory if None
+		:return: generator | dict with file_path, status, output, bytes, seconds and error
+		"""
+
+		if dir_dst is not None:
+			os.makedirs(dir_dst, exist_ok=True)
+
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			futures = []
+			for path in paths:
+				if isinstance(password_map, dict):
+					password = password_map.get(path, password_map.get(os.path.basename(path)))
+				else:
+					password = password_map
+				futures.append(pool.submit(_decrypt_worker, path, password, dir_dst))
+
+			for future in as_completed(futures):
+				result = future.result()
+
+				# content comes back from worker as bytes
+				if isinstance(result["output"], bytes):
+					result["output"] = io.BytesIO(result["output"])
+
+				yield result
+
+	@staticmethod
+	def decrypt_many(paths, password_map, workers=None, dir_dst=None):
+		"""
+		Decrypt many files in a process pool, errors of single files do not stop the batch
+		:param paths: list | path of files
+		:param password_map: dict or str | password by full path or file name, or one password for all files
+		:param workers: int | number of processes, number of CPU cores if None
+		:param dir_dst: path like | write decrypted files into this directory, keep them in memory if None
+		:return: tuple | (DataFrame with result of each file, dict with timing statistics)
+		"""
+
+		start = time.perf_counter()
+		results = list(DecryptFile.iter_decrypt_many(paths=paths, password_map=password_map, workers=workers,
+		                                             dir_dst=dir_dst))
+		seconds = time.perf_counter() - start
+
+		df_result = pd.DataFrame(data=results,
+		                         columns=["file_path", "status", "output", "bytes", "seconds", "error"])
+		busy_seconds = float(df_result["seconds"].sum())
+		total_bytes = int(df_result["bytes"].sum())
+		summary = {"files": len(df_result),
+		           "decrypted": int((df_result["status"] == "decrypted").sum()),
+		           "not_encrypted": int((df_result["status"] == "not_encrypted").sum()),
+		           "failed": int((df_result["status"] == "failed").sum()),
+		           "bytes": total_bytes,
+		           "seconds": seconds,
+		           "busy_seconds": busy_seconds,
+		           "speedup": busy_seconds / seconds if seconds else 0.0,
+		           "mb_per_second": total_bytes / 1024 / 1024 / seconds if seconds else 0.0,
+		           "max_file_seconds": float(df_result["seconds"].max()) if len(df_result) else 0.0}
+
+		return df_result, summary
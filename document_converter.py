@@ -0,0 +1,467 @@
+import os
+import math
+import queue
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+import pandas as pd
+
+try:
+	import comtypes
+	import comtypes.client
+except ImportError:
+	comtypes = None
+
+
+class ConverterBackend:
+	"""
+	Interface of conversion backend, one instance is used by one worker thread only
+	"""
+
+	name = "backend"
+
+	# instances allowed at the same time, None for no limit
+	max_workers = None
+
+	def start(self):
+		"""
+		Start application, called once by worker before first file
+		:return: None
+		"""
+
+	def convert(self, path_src, path_dst, output_format):
+		"""
+		Convert one file
+		:param path_src: path like | source file
+		:param path_dst: path like | destination file
+		:param output_format: str | e.g. "pdf"
+		:return: None
+		"""
+
+		raise NotImplementedError
+
+	def convert_batch(self, tasks, output_format):
+		"""
+		Convert several files, failure of one file does not stop the others
+		:param tasks: list | tuples of path of source file and destination file
+		:param output_format: str | e.g. "pdf"
+		:return: list | exception of each file, None if converted
+		"""
+
+		errors = []
+		for path_src, path_dst in tasks:
+			try:
+				self.convert(path_src, path_dst, output_format)
+				errors.append(None)
+			except Exception as e:
+				errors.append(e)
+
+		return errors
+
+	def export_slides(self, path_src, slides, dir_dst, width=None, height=None):
+		"""
+		Export slides of presentation as PNG files slide_<number>.png
+		:param path_src: path like | presentation
+		:param slides: list | slide numbers starting from 1, all slides if None
+		:param dir_dst: path like | destination directory
+		:param width: int | width of image in pixel, size of slide if None
+		:param height: int | height of image in pixel, keeps aspect ratio if None
+		:return: dict | slide number and path of image
+		"""
+
+		raise NotImplementedError
+
+	def stop(self):
+		"""
+		Quit application, called once by worker after last file
+		:return: None
+		"""
+
+
+class PowerPointBackend(ConverterBackend):
+	"""
+	PowerPoint by COM, application is started once and kept open without window, only on Windows; PowerPoint runs
+	as single instance, so that Quit of one backend would close the application of all others
+	"""
+
+	name = "powerpoint"
+	max_workers = 1
+
+	# PpSaveAsFileType
+	FORMATS = {"pdf": 32, "png": 18, "jpg": 17, "pptx": 24}
+
+	def __init__(self):
+		"""
+		Initialization for attributes
+		"""
+
+		if comtypes is None:
+			raise ValueError("backend 'powerpoint' needs package comtypes on Windows")
+
+		self.application = None
+
+	def start(self):
+		# COM has to be initialized in each worker thread
+		comtypes.CoInitialize()
+		self.application = comtypes.client.CreateObject("PowerPoint.Application")
+
+	def convert(self, path_src, path_dst, output_format):
+		if output_format not in self.FORMATS:
+			raise ValueError(f"output format {output_format} not supported by PowerPoint")
+
+		presentation = self.application.Presentations.Open(os.path.abspath(path_src), ReadOnly=True,
+		                                                   Untitled=False, WithWindow=False)
+		try:
+			presentation.SaveAs(os.path.abspath(path_dst), self.FORMATS[output_format])
+		finally:
+			presentation.Close()
+
+	def export_slides(self, path_src, slides, dir_dst, width=None, height=None):
+		presentation = self.application.Presentations.Open(os.path.abspath(path_src), ReadOnly=True,
+		                                                   Untitled=False, WithWindow=False)
+		try:
+			if slides is None:
+				slides = range(1, presentation.Slides.Count + 1)
+
+			# Export does not keep aspect ratio by itself
+			if width and not height:
+				height = round(width * presentation.PageSetup.SlideHeight / presentation.PageSetup.SlideWidth)
+
+			images = {}
+			for slide_index in slides:
+				image_path = os.path.join(os.path.abspath(dir_dst), f"slide_{slide_index}.png")
+				if width:
+					presentation.Slides(slide_index).Export(image_path, "PNG", width, height)
+				else:
+					presentation.Slides(slide_index).Export(image_path, "PNG")
+				images[slide_index] = image_path
+		finally:
+			presentation.Close()
+
+		return images
+
+	def stop(self):
+		if self.application is not None:
+			try:
+				self.application.Quit()
+			finally:
+				self.application = None
+				comtypes.CoUninitialize()
+
+
+class LibreOfficeBackend(ConverterBackend):
+	"""
+	Headless LibreOffice with soffice --convert-to, each worker keeps own profile so that workers run in parallel;
+	one soffice launch converts a whole batch of files
+	"""
+
+	name = "libreoffice"
+
+	def __init__(self, soffice=None, timeout=300):
+		"""
+		Initialization for attributes
+		:param soffice: str | path of soffice, searched in PATH if None
+		:param timeout: float | seconds for one file, a batch gets this for each file; soffice and its child
+		                processes are killed afterwards
+		"""
+
+		self.soffice = soffice or shutil.which("soffice") or shutil.which("libreoffice")
+		if self.soffice is None:
+			raise ValueError("backend 'libreoffice' needs soffice in PATH")
+
+		self.timeout = timeout
+		self.dir_profile = None
+		self.dir_out = None
+
+	def start(self):
+		# profile is created at first launch and reused, later launches are much faster
+		self.dir_profile = tempfile.mkdtemp(prefix="soffice_profile_")
+		self.dir_out = tempfile.mkdtemp(prefix="soffice_out_")
+
+	def convert(self, path_src, path_dst, output_format):
+		error = self.convert_batch([(path_src, path_dst)], output_format)[0]
+		if error is not None:
+			raise error
+
+	def convert_batch(self, tasks, output_format):
+		errors = [None] * len(tasks)
+		pending = list(range(len(tasks)))
+
+		while pending:
+			# files with same name would overwrite each other in output directory, they go to next launch
+			names = set()
+			current = []
+			rest = []
+			for index in pending:
+				name = Path(tasks[index][0]).stem.lower()
+				if name in names:
+					rest.append(index)
+				else:
+					names.add(name)
+					current.append(index)
+
+			command = [self.soffice, "--headless", "--norestore", "--nolockcheck",
+			           f"-env:UserInstallation={Path(self.dir_profile).as_uri()}",
+			           "--convert-to", output_format, "--outdir", self.dir_out]
+			command += [os.path.abspath(tasks[index][0]) for index in current]
+			stdout, stderr = self._run(command, timeout=self.timeout * len(current))
+
+			# soffice returns 0 even if conversion failed, check output file instead
+			for index in current:
+				path_src, path_dst = tasks[index]
+				path_out = os.path.join(self.dir_out, f"{Path(path_src).stem}.{output_format.split(':')[0]}")
+				if os.path.exists(path_out):
+					os.replace(path_out, path_dst)
+				else:
+					message = stderr.decode(errors="replace").strip() or stdout.decode(errors="replace").strip()
+					errors[index] = RuntimeError(f"soffice did not create {output_format} file of "
+					                             f"{os.path.basename(path_src)}: {message}")
+
+			pending = rest
+
+		return errors
+
+	@staticmethod
+	def _run(command, timeout):
+		"""
+		Run soffice in own process group, kill whole group on timeout so that no child keeps profile locked
+		:return: tuple | (stdout, stderr)
+		"""
+
+		if os.name == "nt":
+			process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+			                           creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+		else:
+			process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+			                           start_new_session=True)
+
+		try:
+			return process.communicate(timeout=timeout)
+		except subprocess.TimeoutExpired:
+			if os.name == "nt":
+				subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], stdout=subprocess.DEVNULL,
+				               stderr=subprocess.DEVNULL)
+			else:
+				try:
+					os.killpg(process.pid, signal.SIGKILL)
+				except ProcessLookupError:
+					pass
+			process.communicate()
+			raise
+
+	def export_slides(self, path_src, slides, dir_dst, width=None, height=None):
+		# soffice exports only first slide as image, so convert to PDF and render pages with pdftoppm
+		pdftoppm = shutil.which("pdftoppm")
+		if pdftoppm is None:
+			raise ValueError("slide export with backend 'libreoffice' needs pdftoppm in PATH")
+
+		path_pdf = os.path.join(self.dir_out, f"{Path(path_src).stem}.slides.pdf")
+		self.convert(path_src, path_pdf, "pdf")
+
+		try:
+			if slides is None:
+				slides = range(1, self._page_count(pdftoppm, path_pdf) + 1)
+
+			images = {}
+			for slide_index in slides:
+				prefix = os.path.join(dir_dst, f"slide_{slide_index}")
+				command = [pdftoppm, "-png", "-singlefile", "-f", str(slide_index), "-l", str(slide_index)]
+				if width:
+					command += ["-scale-to-x", str(width), "-scale-to-y", str(height or -1)]
+				subprocess.run(command + [path_pdf, prefix], check=True, stdout=subprocess.PIPE,
+				               stderr=subprocess.PIPE, timeout=self.timeout)
+				images[slide_index] = f"{prefix}.png"
+		finally:
+			os.remove(path_pdf)
+
+		return images
+
+	def _page_count(self, pdftoppm, path_pdf):
+		pdfinfo = shutil.which("pdfinfo") or os.path.join(os.path.dirname(pdftoppm), "pdfinfo")
+		completed = subprocess.run([pdfinfo, path_pdf], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+		                           timeout=self.timeout)
+		for line in completed.stdout.decode(errors="replace").splitlines():
+			if line.startswith("Pages:"):
+				return int(line.split(":", 1)[1])
+
+		raise RuntimeError(f"page count of {path_pdf} not found")
+
+	def stop(self):
+		for directory in (self.dir_profile, self.dir_out):
+			if directory is not None:
+				shutil.rmtree(directory, ignore_errors=True)
+		self.dir_profile = None
+		self.dir_out = None
+
+
+BACKENDS = {"powerpoint": PowerPointBackend, "libreoffice": LibreOfficeBackend}
+
+
+class DocumentConverter:
+	"""
+	Convert many documents with several workers, each worker keeps one application instance for all its files
+	"""
+
+	def __init__(self, backend="libreoffice", workers=2, output_format="pdf", batch_size=20):
+		"""
+		Initialization for attributes
+		:param backend: str or callable | "libreoffice", "powerpoint", or function returning a ConverterBackend
+		:param workers: int | files converted in parallel; limited to max_workers of backend, which is 1 for
+		                PowerPoint
+		:param output_format: str | e.g. "pdf"
+		:param batch_size: int | files handed to backend at once, LibreOffice converts them with one launch
+		"""
+
+		if isinstance(backend, str):
+			if backend not in BACKENDS:
+				raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+			backend = BACKENDS[backend]
+
+		self.backend_factory = backend
+		self.workers = workers
+		max_workers = getattr(backend, "max_workers", None)
+		if max_workers is not None:
+			self.workers = min(workers, max_workers)
+		self.output_format = output_format
+		self.batch_size = batch_size
+
+	def convert_many(self, paths, dir_dst):
+		"""
+		Convert files, failure of one file does not stop the others
+		:param paths: list | path of source files
+		:param dir_dst: path like | destination directory, file name is kept with new extension; sources with same
+		                name get suffix _2, _3, ... instead of overwriting each other
+		:return: tuple | (DataFrame with result of each file and seconds of its batch, dict with timing statistics)
+		"""
+
+		os.makedirs(dir_dst, exist_ok=True)
+
+		tasks = queue.Queue()
+		used = set()
+		for path in paths:
+			stem = Path(path).stem
+			extension = self.output_format.split(":")[0]
+			name = f"{stem}.{extension}"
+			suffix = 1
+			while name.lower() in used:
+				suffix += 1
+				name = f"{stem}_{suffix}.{extension}"
+			used.add(name.lower())
+			tasks.put((path, os.path.join(dir_dst, name)))
+
+		results = []
+		batches = []
+		startups = []
+		lock = threading.Lock()
+
+		workers = max(1, min(self.workers, len(paths)))
+		# smaller batches if there are few files, so that all workers get some
+		batch_size = max(1, min(self.batch_size, math.ceil(len(paths) / workers)))
+
+		start = time.perf_counter()
+		threads = [threading.Thread(target=self._work,
+		                            args=(number, tasks, batch_size, results, batches, startups, lock), daemon=True)
+		           for number in range(workers)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		seconds = time.perf_counter() - start
+
+		df_result = pd.DataFrame(data=results, columns=["path_src", "path_dst", "status", "worker", "batch",
+		                                                "batch_files", "batch_seconds", "retried", "error"])
+		converted = int((df_result["status"] == "converted").sum())
+		summary = {"files": len(df_result),
+		           "converted": converted,
+		           "failed": len(df_result) - converted,
+		           "workers": len(threads),
+		           "batches": len(batches),
+		           "retried": int(df_result["retried"].sum()),
+		           "seconds": seconds,
+		           "startup_seconds": sum(startups, 0.0),
+		           "busy_seconds": sum(batches, 0.0),
+		           "files_per_second": converted / seconds if seconds else 0.0,
+		           "max_batch_seconds": max(batches, default=0.0)}
+
+		return df_result, summary
+
+	def _work(self, number, tasks, batch_size, results, batches, startups, lock):
+		"""
+		Worker thread, starts backend once and restarts it only after a failed file; files of a batch which failed
+		as a whole, e.g. by timeout, are converted again one by one so that one bad file does not fail the others
+		:return: None
+		"""
+
+		backend = None
+		try:
+			while True:
+				batch = []
+				while len(batch) < batch_size:
+					try:
+						batch.append(tasks.get_nowait())
+					except queue.Empty:
+						break
+				if not batch:
+					break
+
+				backend, errors, seconds, broken = self._convert_batch(backend, batch, startups, lock)
+				if not broken or len(batch) == 1:
+					self._save_batch(number, batch, errors, seconds, False, results, batches, lock)
+					continue
+
+				with lock:
+					batches.append(seconds)
+				for task in batch:
+					backend, errors, seconds, _ = self._convert_batch(backend, [task], startups, lock)
+					self._save_batch(number, [task], errors, seconds, True, results, batches, lock)
+
+		finally:
+			if backend is not None:
+				backend.stop()
+
+	def _convert_batch(self, backend, batch, startups, lock):
+		"""
+		Convert one batch, start backend if needed and stop it after a failure
+		:return: tuple | (backend or None, list of exception or None for each file, seconds of batch,
+		         True if batch failed as a whole)
+		"""
+
+		start = time.perf_counter()
+		broken = False
+		try:
+			if backend is None:
+				backend = self.backend_factory()
+				backend.start()
+				with lock:
+					startups.append(time.perf_counter() - start)
+				start = time.perf_counter()
+
+			errors = backend.convert_batch(batch, self.output_format)
+
+		except Exception as e:
+			errors = [e] * len(batch)
+			broken = True
+
+		seconds = time.perf_counter() - start
+
+		# application may be broken, next file gets a new one
+		if backend is not None and any(error is not None for error in errors):
+			try:
+				backend.stop()
+			except Exception:
+				pass
+			backend = None
+
+		return backend, errors, seconds, broken
+
+	@staticmethod
+	def _save_batch(number, batch, errors, seconds, retried, results, batches, lock):
+		with lock:
+			batches.append(seconds)
+			for (path_src, path_dst), error in zip(batch, errors):
+				results.append([path_src, path_dst, "failed" if error is not None else "converted", number,
+				                len(batches), len(batch), seconds, retried, repr(error) if error is not None else None])
@@ -0,0 +1,270 @@
+import asyncio
+import json
+import logging
+import smtplib
+import sqlite3
+import threading
+import time
+from email.policy import SMTP
+from send_email import MailSession, MAIL_HOST, MAIL_PORT
+
+
+class EmailOutbox:
+	"""
+	Queue emails in a local SQLite spool file and send them in background with asyncio
+	"""
+
+	def __init__(self, spool_path, batch_size=50, interval=1.0, max_attempts=8, backoff=2.0, max_backoff=600,
+	             host=MAIL_HOST, port=MAIL_PORT, logger=None):
+		"""
+		Initialization for attributes
+		:param spool_path: path like | SQLite file to keep queued emails, survives crash of the job
+		:param batch_size: int | emails sent in one batch
+		:param interval: float | seconds to wait for new emails when queue is empty
+		:param max_attempts: int | give up email after this many failed attempts
+		:param backoff: float | seconds to wait after first failure, doubled for each further failure
+		:param max_backoff: float | longest wait between two attempts
+		:param host: str | host name of Email Server
+		:param port: int | port of Email Server
+		:param logger: object | logger for errors of background sender, logger "email_outbox" if None
+		"""
+
+		self.spool_path = spool_path
+		self.batch_size = batch_size
+		self.interval = interval
+		self.max_attempts = max_attempts
+		self.backoff = backoff
+		self.max_backoff = max_backoff
+		self.session = MailSession(host=host, port=port)
+		self.logger = logger or logging.getLogger("email_outbox")
+
+		self.lock = threading.Lock()
+		self.con = sqlite3.connect(database=spool_path, check_same_thread=False)
+		self.con.execute("PRAGMA journal_mode=WAL")
+		self.con.execute("""
+		CREATE TABLE IF NOT EXISTS outbox (
+			id INTEGER PRIMARY KEY AUTOINCREMENT,
+			dedup_key TEXT UNIQUE,
+			from_addr TEXT NOT NULL,
+			to_addrs TEXT NOT NULL,
+			message BLOB NOT NULL,
+			status TEXT NOT NULL DEFAULT 'pending',
+			attempts INTEGER NOT NULL DEFAULT 0,
+			next_attempt REAL NOT NULL,
+			created REAL NOT NULL,
+			last_error TEXT
+		)
+		""")
+		self.con.execute("CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (status, next_attempt)")
+		self.con.commit()
+
+		self.loop = None
+		self.task = None
+		self.wake = None
+		self.drained = None
+
+	def enqueue(self, email, subtype="plain", image_path=None, attachment_path=None, dedup_key=None):
+		"""
+		Put one email into the spool and return immediately, can be called from any thread
+		:param email: SendEmail | email to send
+		:param subtype: str | "plain" or "html"
+		:param image_path: list | path of pictures used for html content
+		:param attachment_path: list | path of files to attach, e.g. PDF
+		:param dedup_key: str | email with a key already in the spool is ignored
+		:return: int | id in the spool, None if dedup_key already exists
+		"""
+
+		msg, to_list = email.create_message(subtype=subtype, image_path=image_path,
+		                                    attachment_path=attachment_path)
+		now = time.time()
+		# smtplib sends bytes as they are, so they need CRLF line endings already
+		data = msg.as_bytes(policy=SMTP)
+
+		with self.lock:
+			cursor = self.con.execute(
+					"INSERT OR IGNORE INTO outbox (dedup_key, from_addr, to_addrs, message, next_attempt, created) "
+					"VALUES (?, ?, ?, ?, ?, ?)",
+					(dedup_key, msg["From"], json.dumps(to_list), data, now, now))
+			self.con.commit()
+			row_id = cursor.lastrowid if cursor.rowcount else None
+
+		if row_id is not None and self.loop is not None:
+			self.loop.call_soon_threadsafe(self._notify)
+
+		return row_id
+
+	def pending_count(self):
+		"""
+		Number of emails not sent yet
+		:return: int
+		"""
+
+		with self.lock:
+			return self.con.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+	async def start(self):
+		"""
+		Start background sender in running event loop
+		:return: None
+		"""
+
+		if self.task is not None:
+			return
+
+		self.loop = asyncio.get_running_loop()
+		self.wake = asyncio.Event()
+		self.drained = asyncio.Event()
+		self.task = asyncio.create_task(self._run())
+
+	async def flush(self, timeout=None):
+		"""
+		Wait until all queued emails are sent or given up
+		:param timeout: float | seconds to wait at most, wait forever if None
+		:return: int | number of emails still pending
+		"""
+
+		if self.task is None:
+			await self.start()
+
+		self._notify()
+		try:
+			await asyncio.wait_for(self.drained.wait(), timeout=timeout)
+		except asyncio.TimeoutError:
+			pass
+
+		return self.pending_count()
+
+	async def close(self, timeout=None):
+		"""
+		Flush queue, stop background sender and close spool file
+		:param timeout: float | seconds to wait for flush at most
+		:return: int | number of emails left in the spool for next run
+		"""
+
+		pending = await self.flush(timeout=timeout)
+
+		if self.task is not None:
+			self.task.cancel()
+			try:
+				await self.task
+			except asyncio.CancelledError:
+				pass
+			self.task = None
+
+		await asyncio.to_thread(self.session.close)
+		self.con.close()
+
+		return pending
+
+	async def __aenter__(self):
+		await self.start()
+		return self
+
+	async def __aexit__(self, exc_type, exc_val, exc_tb):
+		await self.close()
+
+	def _notify(self):
+		self.drained.clear()
+		self.wake.set()
+
+	async def _run(self):
+		"""
+		Send due emails in batches until cancelled
+		:return: None
+		"""
+
+		while True:
+			self.wake.clear()
+			batch = []
+			try:
+				batch = self._due_batch()
+
+				if batch:
+					outcomes = await asyncio.to_thread(self._send_batch, batch)
+					self._save_outcomes(outcomes)
+					continue
+
+				# nothing due now, sleep until new email or next retry
+				next_attempt = self._next_attempt()
+
+			except Exception as e:
+				# sender must keep running, emails of broken batch are given up instead of sent again
+				self.logger.exception("email outbox failed to process batch of %d emails", len(batch))
+				self._fail_batch(batch, e)
+				await asyncio.sleep(self.interval)
+				continue
+
+			if next_attempt is None:
+				self.drained.set()
+				delay = self.interval
+			else:
+				delay = min(max(next_attempt - time.time(), 0), self.interval)
+
+			try:
+				await asyncio.wait_for(self.wake.wait(), timeout=delay)
+			except asyncio.TimeoutError:
+				pass
+
+	def _due_batch(self):
+		with self.lock:
+			return self.con.execute(
+					"SELECT id, from_addr, to_addrs, message, attempts FROM outbox "
+					"WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt, id LIMIT ?",
+					(time.time(), self.batch_size)).fetchall()
+
+	def _next_attempt(self):
+		with self.lock:
+			return self.con.execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+	def _send_batch(self, batch):
+		"""
+		Send one batch through the persistent session, runs in worker thread
+		:param batch: list | rows of the spool
+		:return: list | (id, attempts, error) for each email
+		"""
+
+		outcomes = []
+		for row_id, from_addr, to_addrs, message, attempts in batch:
+			try:
+				self.session.send_raw(from_addr=from_addr, to_list=json.loads(to_addrs), data=message)
+				outcomes.append((row_id, attempts + 1, None))
+			except (smtplib.SMTPException, OSError) as e:
+				outcomes.append((row_id, attempts + 1, e))
+
+		return outcomes
+
+	def _fail_batch(self, batch, error):
+		"""
+		Mark emails of batch as failed after unexpected error
+		:param batch: list | rows of the spool
+		:param error: Exception | unexpected error
+		:return: None
+		"""
+
+		try:
+			with self.lock:
+				self.con.executemany("UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+				                     [(attempts + 1, repr(error), row_id) for row_id, _, _, _, attempts in batch])
+				self.con.commit()
+		except Exception:
+			self.logger.exception("email outbox failed to mark %d emails as failed", len(batch))
+
+	def _save_outcomes(self, outcomes):
+		now = time.time()
+
+		with self.lock:
+			for row_id, attempts, error in outcomes:
+				if error is None:
+					self.con.execute("UPDATE outbox SET status = 'sent', attempts = ?, last_error = NULL WHERE id = ?",
+					                 (attempts, row_id))
+
+				elif MailSession.is_temporary_error(error) and attempts < self.max_attempts:
+					delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+					self.con.execute("UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?",
+					                 (attempts, now + delay, repr(error), row_id))
+
+				else:
+					self.con.execute("UPDATE outbox SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?",
+					                 (attempts, repr(error), row_id))
+
+			self.con.commit()
@@ -0,0 +1,218 @@
+import queue
+import threading
+import time
+import openpyxl
+import pandas as pd
+from decrypt_file import DecryptFile
+from timing import timed
+
+# text accepted for "bool" columns besides booleans and numbers
+BOOL_STRINGS = {"true": True, "false": False, "yes": True, "no": False, "1": True, "0": False}
+
+
+class ExcelLoader:
+	"""
+	Decrypt Excel, read worksheets in chunks of rows and insert each chunk into SQL Server while next one is read
+	"""
+
+	def __init__(self, mssql, file_path, password=None, chunk_size=10000, dtypes=None, queue_chunks=2,
+	             spill_threshold=64 * 1024 * 1024):
+		"""
+		Initialization for attributes
+		:param mssql: MSSQL | connection settings of SQL Server
+		:param file_path: str | path of Excel, may be encrypted
+		:param password: str | password of encrypted Excel
+		:param chunk_size: int | rows read and inserted at once
+		:param dtypes: dict | column name and type: "int", "float", "str", "datetime" or "bool"
+		:param queue_chunks: int | chunks read ahead at most, peak memory is about queue_chunks + 2 chunks
+		:param spill_threshold: int | decrypted content above this size is kept in temp file instead of memory
+		"""
+
+		self.mssql = mssql
+		self.file_path = file_path
+		self.password = password
+		self.chunk_size = chunk_size
+		self.dtypes = dtypes or {}
+		self.queue_chunks = queue_chunks
+		self.spill_threshold = spill_threshold
+
+	@timed()
+	def load(self, sheet_map, truncate=False):
+		"""
+		Load worksheets into tables
+		:param sheet_map: dict | worksheet name and table name, e.g. {"Sales": "stg_sales"}
+		:param truncate: boolean | truncate each table before loading
+		:return: DataFrame | rows, chunks and throughput of each worksheet
+		"""
+
+		decrypted = DecryptFile(file_path=self.file_path).decrypted_file(password=self.password, output="spill",
+		                                                                 spill_threshold=self.spill_threshold)
+		workbook = openpyxl.load_workbook(decrypted, read_only=True, data_only=True)
+
+		results = []
+		try:
+			for sheet_name, table_name in sheet_map.items():
+				if truncate:
+					self.mssql.truncate_table(table_name=table_name)
+				results.append(self._load_sheet(worksheet=workbook[sheet_name], table_name=table_name))
+		finally:
+			workbook.close()
+			if hasattr(decrypted, "close"):
+				decrypted.close()
+
+		df_result = pd.DataFrame(data=results, columns=["sheet", "table", "rows", "chunks", "seconds", "read_seconds",
+		                                                "insert_seconds", "rows_per_second"])
+
+		return df_result
+
+	def iter_chunks(self, worksheet):
+		"""
+		Read worksheet in chunks, first row is header, empty header cells become column_<position>
+		:param worksheet: object | read-only openpyxl worksheet
+		:return: generator | DataFrame with coerced types for each chunk
+		"""
+
+		rows = worksheet.iter_rows(values_only=True)
+		header = next(rows, None)
+		if header is None:
+			return
+		columns = [f"column_{number}" if column is None else str(column) for number, column in enumerate(header, 1)]
+
+		chunk = []
+		for row in rows:
+			chunk.append(row)
+			if len(chunk) >= self.chunk_size:
+				yield self.coerce(pd.DataFrame(data=chunk, columns=columns))
+				chunk = []
+
+		if chunk:
+			yield self.coerce(pd.DataFrame(data=chunk, columns=columns))
+
+	def coerce(self, df_chunk):
+		"""
+		Convert columns into configured types, values which can not be converted become NULL
+		:param df_chunk: DataFrame | one chunk
+		:return: DataFrame
+		"""
+
+		for column, dtype in self.dtypes.items():
+			if column not in df_chunk.columns:
+				continue
+
+			if dtype == "int":
+				df_chunk[column] = pd.to_numeric(df_chunk[column], errors="coerce").astype("Int64")
+			elif dtype == "float":
+				df_chunk[column] = pd.to_numeric(df_chunk[column], errors="coerce")
+			elif dtype == "datetime":
+				df_chunk[column] = pd.to_datetime(df_chunk[column], errors="coerce")
+			elif dtype == "bool":
+				df_chunk[column] = df_chunk[column].map(self._to_bool).astype("boolean")
+			elif dtype == "str":
+				df_chunk[column] = df_chunk[column].astype("string").str.strip()
+			else:
+				raise ValueError(f"unknown type {dtype} for column {column}")
+
+		return df_chunk
+
+	@staticmethod
+	def _to_bool(value):
+		"""
+		Convert one value for "bool" column: numbers are True unless 0, text as in BOOL_STRINGS, else None
+		:param value: object | cell value
+		:return: boolean | True, False or None
+		"""
+
+		if pd.api.types.is_bool(value):
+			return bool(value)
+		if pd.api.types.is_number(value) and not pd.isna(value):
+			return value != 0
+		if isinstance(value, str):
+			return BOOL_STRINGS.get(value.strip().lower())
+
+		return None
+
+	def _load_sheet(self, worksheet, table_name):
+		"""
+		Read chunks in a thread and insert them in calling thread
+		:return: list | result of worksheet
+		"""
+
+		chunks = queue.Queue(maxsize=self.queue_chunks)
+		read_seconds = [0.0]
+		errors = []
+
+		def read():
+			try:
+				start = time.perf_counter()
+				for df_chunk in self.iter_chunks(worksheet):
+					read_seconds[0] += time.perf_counter() - start
+					chunks.put(df_chunk)
+					start = time.perf_counter()
+			except Exception as e:
+				errors.append(e)
+			finally:
+				chunks.put(None)
+
+		reader = threading.Thread(target=read, daemon=True)
+		start = time.perf_counter()
+		reader.start()
+
+		rows = 0
+		chunk_count = 0
+		insert_seconds = 0.0
+		con = self.mssql.con_pyodbc()
+		try:
+			cursor = con.cursor()
+			cursor.fast_executemany = True
+
+			while True:
+				df_chunk = chunks.get()
+				if df_chunk is None:
+					break
+
+				start_insert = time.perf_counter()
+				columns = ", ".join(f"[{column}]" for column in df_chunk.columns)
+				placeholders = ", ".join("?" for _ in df_chunk.columns)
+				cursor.executemany(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})",
+				                   self._to_parameters(df_chunk))
+				insert_seconds += time.perf_counter() - start_insert
+
+				rows += len(df_chunk)
+				chunk_count += 1
+
+			reader.join()
+			if errors:
+				raise errors[0]
+
+			# one transaction for each worksheet
+			con.commit()
+
+		except Exception:
+			con.rollback()
+			# let reader finish so that its thread does not wait forever
+			while reader.is_alive():
+				try:
+					chunks.get(timeout=0.1)
+				except queue.Empty:
+					pass
+			raise
+
+		finally:
+			con.close()
+
+		seconds = time.perf_counter() - start
+
+		return [worksheet.title, table_name, rows, chunk_count, seconds, read_seconds[0], insert_seconds,
+		        rows / seconds if seconds else 0.0]
+
+	@staticmethod
+	def _to_parameters(df_chunk):
+		"""
+		Rows as tuples of Python values, missing values as None
+		:param df_chunk: DataFrame | one chunk
+		:return: list | tuple for each row
+		"""
+
+		df_object = df_chunk.astype(object).where(df_chunk.notna(), None)
+
+		return list(df_object.itertuples(index=False, name=None))
@@ -0,0 +1,241 @@
+import re
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+# smallest pandas type holding each SQL integer type, nullable variant is used if column has missing values
+SQL_INTEGER_TYPES = {"BIT": "bool", "BOOLEAN": "bool", "TINYINT": "int16", "SMALLINT": "int16",
+                     "MEDIUMINT": "int32", "INT": "int32", "INTEGER": "int32", "BIGINT": "int64"}
+# strings accepted for BIT besides numbers, like SQL Server converts them
+SQL_BIT_STRINGS = {"true": True, "false": False}
+SQL_FLOAT32_TYPES = ("REAL", "FLOAT(24)")
+SQL_FLOAT_TYPES = ("FLOAT", "DOUBLE", "DECIMAL", "NUMERIC", "MONEY", "SMALLMONEY")
+SQL_STRING_TYPES = ("CHAR", "VARCHAR", "NCHAR", "NVARCHAR", "TEXT", "NTEXT", "TINYTEXT", "MEDIUMTEXT", "LONGTEXT")
+SQL_DATE_TYPES = ("DATE",)
+SQL_DATETIME_TYPES = ("DATETIME", "DATETIME2", "SMALLDATETIME", "TIMESTAMP")
+
+
+class FrameOptimizer:
+	"""
+	Shrink DataFrame before database load: downcast numbers, categories for repeated strings, trimmed strings and
+	timezone-free datetimes, optionally following column types of target table
+	"""
+
+	def __init__(self, category_ratio=0.5, trim=True, empty_as_null=False, downcast_float=True, utc=True):
+		"""
+		Initialization for attributes
+		:param category_ratio: float | strings become category if unique values / rows is not above this
+		:param trim: boolean | strip leading and trailing whitespace of strings
+		:param empty_as_null: boolean | empty strings, also after trim, become NULL
+		:param downcast_float: boolean | float64 becomes float32 if no value changes
+		:param utc: boolean | timezone-aware datetimes are converted to UTC without timezone
+		"""
+
+		self.category_ratio = category_ratio
+		self.trim = trim
+		self.empty_as_null = empty_as_null
+		self.downcast_float = downcast_float
+		self.utc = utc
+
+	@staticmethod
+	def table_types(con, table_name, schema=None):
+		"""
+		Column types of existing table, e.g. from MSSQL.con_sqlalchemy() or MySQL.sqlalchemy_connection()
+		:param con: object | SQLAlchemy engine or connection
+		:param table_name: str | table name
+		:param schema: str | schema name, default schema if None
+		:return: dict | column name and SQL type, e.g. {"amount": "DECIMAL(18, 4)"}
+		"""
+
+		inspector = sqlalchemy.inspect(con)
+
+		return {column["name"]: str(column["type"]) for column in inspector.get_columns(table_name, schema=schema)}
+
+	def optimize(self, df_data, table_types=None):
+		"""
+		Optimize all columns, input DataFrame is not changed
+		:param df_data: DataFrame | data to load
+		:param table_types: dict | column name and SQL type of target table, see table_types; analyze values if None
+		:return: tuple | (optimized DataFrame, dict with bytes before and after and DataFrame of each column)
+		"""
+
+		table_types = {str(k).lower(): v for k, v in (table_types or {}).items()}
+		columns = {}
+		report = []
+
+		for column in df_data.columns:
+			series = df_data[column]
+			sql_type = table_types.get(str(column).lower())
+
+			if sql_type is not None:
+				optimized = self._to_sql_type(series, sql_type.upper())
+			else:
+				optimized = self._analyze(series)
+
+			columns[column] = optimized
+			bytes_before = int(series.memory_usage(index=False, deep=True))
+			bytes_after = int(optimized.memory_usage(index=False, deep=True))
+			report.append([column, sql_type, str(series.dtype), str(optimized.dtype), bytes_before, bytes_after])
+
+		df_optimized = pd.DataFrame(columns, index=df_data.index)
+		df_report = pd.DataFrame(data=report, columns=["column", "sql_type", "dtype_before", "dtype_after",
+		                                               "bytes_before", "bytes_after"])
+
+		bytes_before = int(df_data.memory_usage(index=True, deep=True).sum())
+		bytes_after = int(df_optimized.memory_usage(index=True, deep=True).sum())
+		summary = {"rows": len(df_data),
+		           "bytes_before": bytes_before,
+		           "bytes_after": bytes_after,
+		           "bytes_saved": bytes_before - bytes_after,
+		           "ratio": bytes_after / bytes_before if bytes_before else 1.0,
+		           "columns": df_report}
+
+		return df_optimized, summary
+
+	def _analyze(self, series):
+		"""
+		Choose type from values of column
+		:return: Series
+		"""
+
+		if pd.api.types.is_bool_dtype(series):
+			return series
+
+		if pd.api.types.is_integer_dtype(series):
+			return self._downcast_integer(series)
+
+		if pd.api.types.is_float_dtype(series):
+			return self._downcast_float(series)
+
+		if isinstance(series.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_any_dtype(series):
+			return self._normalize_datetime(series)
+
+		if isinstance(series.dtype, pd.CategoricalDtype):
+			return series
+
+		if series.dtype == object or pd.api.types.is_string_dtype(series):
+			inferred = pd.api.types.infer_dtype(series, skipna=True)
+
+			if inferred == "string":
+				return self._optimize_string(series)
+			if inferred == "integer":
+				return self._downcast_integer(series)
+			if inferred in ("floating", "mixed-integer-float"):
+				return self._downcast_float(pd.to_numeric(series))
+			if inferred == "boolean":
+				return series.astype("boolean")
+			if inferred in ("datetime", "datetime64", "date"):
+				return self._normalize_datetime(pd.to_datetime(series, utc=self.utc))
+
+		return series
+
+	def _to_sql_type(self, series, sql_type):
+		"""
+		Convert column to pandas type matching SQL type, so that driver binds compact parameters
+		:return: Series
+		"""
+
+		base_type = re.split(r"[\s(]", sql_type, maxsplit=1)[0]
+
+		if base_type in SQL_INTEGER_TYPES:
+			dtype = SQL_INTEGER_TYPES[base_type]
+			if dtype == "bool":
+				return self._to_bit(series)
+			numbers = self._to_integer(series)
+			# keep values out of range as they are, database reports them instead of silent overflow
+			limits = np.iinfo(dtype)
+			if numbers.min() < limits.min or numbers.max() > limits.max:
+				return numbers
+			return numbers.astype(dtype.capitalize() if numbers.isna().any() else dtype)
+
+		if sql_type.replace(" ", "") in SQL_FLOAT32_TYPES:
+			return pd.to_numeric(series, errors="coerce").astype("float32")
+
+		if base_type in SQL_FLOAT_TYPES:
+			# DECIMAL and FLOAT(53) need full precision
+			return pd.to_numeric(series, errors="coerce").astype("float64")
+
+		if base_type in SQL_STRING_TYPES:
+			if pd.api.types.infer_dtype(series, skipna=True) != "string":
+				series = series.where(series.isna(), series.astype(str))
+			return self._optimize_string(series)
+
+		if base_type in SQL_DATE_TYPES:
+			return self._normalize_datetime(pd.to_datetime(series, errors="coerce", utc=self.utc)).dt.normalize()
+
+		if base_type in SQL_DATETIME_TYPES:
+			return self._normalize_datetime(pd.to_datetime(series, errors="coerce", utc=self.utc))
+
+		return series
+
+	@staticmethod
+	def _to_bit(series):
+		"""
+		Convert values for BIT: 0 is False, other numbers are True, "true" and "false" in any case; anything else
+		becomes NULL, since astype(bool) would turn "0" and "False" into True
+		:return: Series
+		"""
+
+		if pd.api.types.is_bool_dtype(series):
+			return series
+
+		numbers = pd.to_numeric(series, errors="coerce")
+		words = series.map(lambda value: SQL_BIT_STRINGS.get(value.strip().lower()) if isinstance(value, str) else None)
+		bits = (numbers != 0).astype("boolean").mask(numbers.isna(), words.astype("boolean"))
+
+		return bits if bits.isna().any() else bits.astype(bool)
+
+	@staticmethod
+	def _to_integer(series):
+		"""
+		Convert values to numbers, integers with missing values become Int64 directly, as float64 in between would
+		change values above 2**53
+		:return: Series
+		"""
+
+		if series.isna().any() and pd.api.types.infer_dtype(series, skipna=True) == "integer":
+			try:
+				return series.astype("Int64")
+			except (TypeError, ValueError, OverflowError):
+				pass
+
+		return pd.to_numeric(series, errors="coerce")
+
+	def _downcast_integer(self, series):
+		if series.isna().any():
+			# nullable integer: downcast via values without missing ones
+			numbers = self._to_integer(series)
+			downcast = pd.to_numeric(numbers.dropna(), downcast="integer")
+			return numbers.astype(str(downcast.dtype).capitalize())
+
+		return pd.to_numeric(series, downcast="integer")
+
+	def _downcast_float(self, series):
+		if not self.downcast_float or series.dtype == np.float32:
+			return series
+
+		values = series.to_numpy(dtype=np.float64)
+		values_32 = values.astype(np.float32)
+		# only if every value survives the round trip
+		if np.array_equal(values_32.astype(np.float64), values, equal_nan=True):
+			return pd.Series(values_32, index=series.index, name=series.name)
+
+		return series.astype(np.float64)
+
+	def _normalize_datetime(self, series):
+		if isinstance(series.dtype, pd.DatetimeTZDtype) and self.utc:
+			return series.dt.tz_convert("UTC").dt.tz_localize(None)
+
+		return series
+
+	def _optimize_string(self, series):
+		if self.trim:
+			series = series.str.strip()
+		if self.empty_as_null:
+			series = series.mask(series == "")
+
+		non_null = series.count()
+		if non_null and series.nunique(dropna=True) / non_null <= self.category_ratio:
+			return series.astype("category")
+
+		return series
@@ -0,0 +1,352 @@
+import logging
+import queue
+import threading
+import time
+import pandas as pd
+from timing import span
+
+
+class Stage:
+	"""
+	One step of job, see JobRunner.add_stage
+	"""
+
+	def __init__(self, name, func, depends_on=(), args=(), kwargs=None, retries=0, backoff=1.0, stream=False,
+	             count=None):
+		self.name = name
+		self.func = func
+		self.depends_on = list(depends_on)
+		self.args = args
+		self.kwargs = kwargs or {}
+		self.retries = retries
+		self.backoff = backoff
+		self.stream = stream
+		self.count = count
+
+
+class _StreamEnd:
+	"""
+	Marker put into stream queue after last item, keeps error of producer
+	"""
+
+	def __init__(self, error=None):
+		self.error = error
+
+
+class _Stream:
+	"""
+	Bounded queue from streaming stage to one consumer, producer stops feeding it once it is closed
+	"""
+
+	def __init__(self, maxsize):
+		self.items = queue.Queue(maxsize=maxsize)
+		self.closed = threading.Event()
+
+	def put(self, item):
+		while not self.closed.is_set():
+			try:
+				self.items.put(item, timeout=0.1)
+				return
+			except queue.Full:
+				pass
+
+	def close(self):
+		self.closed.set()
+
+
+def _read_stream(stream):
+	"""
+	Iterate items of streaming stage until producer is finished
+	:param stream: _Stream | filled by producer
+	:return: generator | items
+	"""
+
+	while True:
+		item = stream.items.get()
+		if isinstance(item, _StreamEnd):
+			if item.error is not None:
+				raise RuntimeError("upstream stage failed") from item.error
+			return
+		yield item
+
+
+class JobRunner:
+	"""
+	Run stages of job as soon as their upstream stages are finished, independent stages run concurrently
+	"""
+
+	def __init__(self, name="job", max_workers=4, stream_buffer=100, logger=None):
+		"""
+		Initialization for attributes
+		:param name: str | job name, used for log and timing spans
+		:param max_workers: int | stages running at the same time; consumers of streaming stages always start
+		:param stream_buffer: int | items kept between streaming stage and each consumer at most
+		:param logger: object | logger, logger with job name if None
+		"""
+
+		self.name = name
+		self.max_workers = max_workers
+		self.stream_buffer = stream_buffer
+		self.logger = logger or logging.getLogger(name)
+		self.stages = {}
+
+	def add_stage(self, name, func, depends_on=(), args=(), kwargs=None, retries=0, backoff=1.0, stream=False,
+	              count=None):
+		"""
+		Add stage, called as func(inputs, *args, **kwargs) where inputs is a dict of upstream stage name and result
+		:param name: str | unique stage name
+		:param func: function | work of stage
+		:param depends_on: list | names of upstream stages, which have to be added before
+		:param args: tuple | positional arguments after inputs
+		:param kwargs: dict | keyword arguments
+		:param retries: int | repeats after failure, waiting backoff * 2 ** n seconds; stages reading or writing
+		                stream are not repeated since items are already passed on
+		:param backoff: float | seconds before first repeat
+		:param stream: boolean | func returns iterable, downstream stages get an iterator and start at once
+		:param count: function | number of items processed from result, for throughput; len of result if None
+		:return: Stage
+		"""
+
+		if name in self.stages:
+			raise ValueError(f"stage {name} already exists")
+
+		for dependency in depends_on:
+			if dependency not in self.stages:
+				raise ValueError(f"stage {name} depends on unknown stage {dependency}")
+
+		stage = Stage(name=name, func=func, depends_on=depends_on, args=args, kwargs=kwargs, retries=retries,
+		              backoff=backoff, stream=stream, count=count)
+		self.stages[name] = stage
+
+		return stage
+
+	def stage(self, name=None, **options):
+		"""
+		Decorator for add_stage, stage name is function name if None
+		:return: function | decorator
+		"""
+
+		def decorator(func):
+			self.add_stage(name=name or func.__name__, func=func, **options)
+			return func
+
+		return decorator
+
+	def run(self):
+		"""
+		Run all stages, a failed stage skips its downstream stages only
+		:return: tuple | (DataFrame with result of each stage, dict with critical path and timing statistics)
+		"""
+
+		states = {name: "pending" for name in self.stages}
+		results = {}
+		records = {name: {"stage": name, "status": "pending", "attempts": 0, "start": None, "end": None,
+		                  "seconds": None, "items": None, "items_per_second": None, "error": None}
+		           for name in self.stages}
+		# one stream for each streaming stage and consumer
+		streams = {(name, consumer.name): _Stream(maxsize=self.stream_buffer)
+		           for name, stage in self.stages.items() if stage.stream
+		           for consumer in self.stages.values() if name in consumer.depends_on}
+		condition = threading.Condition()
+
+		self.logger.info("job %s started with %d stages", self.name, len(self.stages))
+		start = time.perf_counter()
+
+		with condition:
+			while True:
+				running = sum(1 for state in states.values() if state == "running")
+
+				for name, stage in self.stages.items():
+					if states[name] != "pending":
+						continue
+
+					dependency_states = [states[dependency] for dependency in stage.depends_on]
+					if any(state in ("failed", "skipped") for state in dependency_states):
+						states[name] = "skipped"
+						records[name]["status"] = "skipped"
+						# nobody reads streams of skipped stage, producers must not wait for it
+						for dependency in stage.depends_on:
+							if self.stages[dependency].stream:
+								streams[(dependency, name)].close()
+						self.logger.warning("stage %s skipped, upstream stage failed", name)
+						continue
+
+					# streaming upstream stage only has to be started
+					ready = all(states[dependency] == "done" or
+					            (self.stages[dependency].stream and states[dependency] == "running")
+					            for dependency in stage.depends_on)
+					consumes_stream = any(self.stages[dependency].stream for dependency in stage.depends_on)
+					if not ready or (running >= self.max_workers and not consumes_stream):
+						continue
+
+					outputs = None
+					if stage.stream:
+						outputs = [stream for (producer, _), stream in streams.items() if producer == name]
+
+					inputs = {}
+					for dependency in stage.depends_on:
+						if self.stages[dependency].stream:
+							inputs[dependency] = _read_stream(streams[(dependency, name)])
+						else:
+							inputs[dependency] = results[dependency]
+
+					states[name] = "running"
+					running += 1
+					threading.Thread(target=self._run_stage,
+					                 args=(stage, inputs, outputs, streams, states, results, records, condition),
+					                 daemon=True).start()
+
+				if all(state in ("done", "failed", "skipped") for state in states.values()):
+					break
+				condition.wait()
+
+		seconds = time.perf_counter() - start
+
+		for record in records.values():
+			if record["start"] is not None:
+				record["start"] -= start
+				record["end"] -= start
+
+		critical_path = self._critical_path(records)
+		df_result = pd.DataFrame(data=list(records.values()))
+		df_result["critical_path"] = df_result["stage"].isin(critical_path)
+
+		summary = {"job": self.name,
+		           "stages": len(df_result),
+		           "done": int((df_result["status"] == "done").sum()),
+		           "failed": int((df_result["status"] == "failed").sum()),
+		           "skipped": int((df_result["status"] == "skipped").sum()),
+		           "seconds": seconds,
+		           "busy_seconds": float(df_result["seconds"].sum()),
+		           "critical_path": critical_path,
+		           "critical_path_seconds": sum((records[name]["seconds"] for name in critical_path), 0.0)}
+		summary["parallelism"] = summary["busy_seconds"] / seconds if seconds else 0.0
+
+		self.logger.info("job %s finished in %.3fs, %d done, %d failed, %d skipped, critical path %s", self.name,
+		                 seconds, summary["done"], summary["failed"], summary["skipped"], " -> ".join(critical_path))
+
+		return df_result, summary
+
+	def _run_stage(self, stage, inputs, outputs, streams, states, results, records, condition):
+		"""
+		Run one stage in its own thread with retries, pass items on if streaming; state of stage is always set,
+		so that run() does not wait forever
+		:return: None
+		"""
+
+		record = records[stage.name]
+		record["start"] = time.perf_counter()
+		result = None
+		try:
+			result = self._attempt(stage, inputs, outputs, record)
+
+			record["status"] = "done"
+			record["items"] = self._count(stage, result)
+			if record["items"] is not None and record["seconds"]:
+				record["items_per_second"] = record["items"] / record["seconds"]
+			self.logger.info("stage %s done in %.3fs", stage.name, record["seconds"])
+
+		except Exception as e:
+			record["status"] = "failed"
+			record["error"] = repr(e)
+			self.logger.error("stage %s failed: %r", stage.name, e)
+
+		finally:
+			if record["end"] is None:
+				record["end"] = time.perf_counter()
+				record["seconds"] = record["end"] - record["start"]
+
+			# producers stop feeding streams this stage does not read anymore
+			for name in stage.depends_on:
+				if self.stages[name].stream:
+					streams[(name, stage.name)].close()
+
+			with condition:
+				results[stage.name] = result
+				states[stage.name] = record["status"] if record["status"] in ("done", "failed") else "failed"
+				condition.notify_all()
+
+	def _attempt(self, stage, inputs, outputs, record):
+		"""
+		Call function of stage until it succeeds or attempts are used up
+		:return: object | result of stage, number of items for streaming stage
+		"""
+
+		streamed = outputs is not None or any(self.stages[name].stream for name in stage.depends_on)
+		max_attempts = 1 if streamed else stage.retries + 1
+
+		result = None
+		error = None
+		with span(f"{self.name}/{stage.name}"):
+			for attempt in range(1, max_attempts + 1):
+				record["attempts"] = attempt
+				try:
+					result = stage.func(inputs, *stage.args, **stage.kwargs)
+
+					if outputs is not None:
+						count = 0
+						for item in result:
+							for stream in outputs:
+								stream.put(item)
+							count += 1
+						result = count
+
+					error = None
+					break
+
+				except Exception as e:
+					error = e
+					self.logger.warning("stage %s attempt %d/%d failed: %r", stage.name, attempt, max_attempts, e)
+					if attempt < max_attempts:
+						time.sleep(stage.backoff * 2 ** (attempt - 1))
+
+		if outputs is not None:
+			for stream in outputs:
+				stream.put(_StreamEnd(error=error))
+
+		record["end"] = time.perf_counter()
+		record["seconds"] = record["end"] - record["start"]
+
+		if error is not None:
+			raise error
+
+		return result
+
+	@staticmethod
+	def _count(stage, result):
+		"""
+		Number of items processed by stage
+		:return: int | None if unknown
+		"""
+
+		if stage.stream:
+			return result
+		if stage.count is not None:
+			return stage.count(result)
+		if isinstance(result, dict) and "rows" in result:
+			return result["rows"]
+		try:
+			return len(result)
+		except TypeError:
+			return None
+
+	def _critical_path(self, records):
+		"""
+		Chain of stages which decided end of job: from last finished stage back through upstream stage finished last
+		:return: list | stage names in order of run
+		"""
+
+		finished = [record for record in records.values() if record["end"] is not None]
+		if not finished:
+			return []
+
+		current = max(finished, key=lambda record: record["end"])["stage"]
+		path = [current]
+		while True:
+			upstream = [records[name] for name in self.stages[current].depends_on if records[name]["end"] is not None]
+			if not upstream:
+				break
+			current = max(upstream, key=lambda record: record["end"])["stage"]
+			path.append(current)
+
+		return path[::-1]
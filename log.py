@@ -1,17 +1,315 @@
+import atexit
+import copy
+import datetime
+import gzip
+import json
 import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from timing import METRICS
+
+try:
+	import zstandard
+except ImportError:
+	zstandard = None
+
+LOG_FORMAT = "%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s"
+LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+
+class BatchFileHandler(logging.FileHandler):
+	"""
+	FileHandler which does not flush after each record, flush is called once per batch
+	"""
+
+	def emit(self, record):
+		if self.stream is None:
+			self.stream = self._open()
+
+		try:
+			self.stream.write(self.format(record) + self.terminator)
+		except Exception:
+			self.handleError(record)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+	"""
+	QueueHandler for a bounded queue, either drop records or block caller when queue is full
+	"""
+
+	def __init__(self, log_queue, block=False, timeout=None):
+		"""
+		Initialization for attributes
+		:param log_queue: object | queue.Queue or multiprocessing.Queue
+		:param block: boolean | wait for free space if queue is full, otherwise drop record
+		:param timeout: float | seconds to wait at most when block is True, wait forever if None
+		"""
+
+		super().__init__(log_queue)
+		self.block = block
+		self.timeout = timeout
+		self.dropped = 0
+
+	def prepare(self, record):
+		# merge arguments into message and keep traceback as text, so that record can be pickled
+		record = copy.copy(record)
+		record.msg = record.getMessage()
+		record.args = None
+		if record.exc_info:
+			record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+			record.exc_info = None
+
+		return record
+
+	def enqueue(self, record):
+		try:
+			self.queue.put(record, block=self.block, timeout=self.timeout)
+		except queue.Full:
+			self.dropped += 1
+
+
+class BatchQueueListener:
+	"""
+	Thread which takes records from queue and writes them in batches
+	"""
+
+	def __init__(self, log_queue, handlers, batch_size=500):
+		"""
+		Initialization for attributes
+		:param log_queue: object | queue.Queue or multiprocessing.Queue
+		:param handlers: list | handlers which write the records
+		:param batch_size: int | records written before handlers are flushed
+		"""
+
+		self.queue = log_queue
+		self.handlers = handlers
+		self.batch_size = batch_size
+		self.thread = None
+
+	def start(self):
+		self.thread = threading.Thread(target=self._monitor, daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		"""
+		Write all records left in queue and stop thread
+		:return: None
+		"""
+
+		if self.thread is None:
+			return
+
+		self.queue.put(None)
+		self.thread.join()
+		self.thread = None
+
+	def _monitor(self):
+		while True:
+			batch = [self.queue.get()]
+
+			# take all records waiting, up to one batch
+			while len(batch) < self.batch_size and batch[-1] is not None:
+				try:
+					batch.append(self.queue.get_nowait())
+				except queue.Empty:
+					break
+
+			for record in batch:
+				if record is None:
+					continue
+				for handler in self.handlers:
+					if record.levelno >= handler.level:
+						handler.handle(record)
+
+			for handler in self.handlers:
+				handler.flush()
+
+			if batch[-1] is None:
+				return
+
+
+class JsonFormatter(logging.Formatter):
+	"""
+	Format record as one JSON object per line
+	"""
+
+	def format(self, record):
+		data = {"time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+		        "level": record.levelname,
+		        "logger": record.name,
+		        "file": record.filename,
+		        "line": record.lineno,
+		        "process": record.process,
+		        "thread": record.threadName,
+		        "message": record.getMessage()}
+
+		if record.exc_info:
+			data["exception"] = self.formatException(record.exc_info)
+		elif record.exc_text:
+			data["exception"] = record.exc_text
+
+		return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _RotationMixin:
+	"""
+	Compress rotated files in background thread, optionally write without flush for each record
+	"""
+
+	def _setup_rotation(self, compression, flush_each_record):
+		if compression not in (None, "gzip", "zstd"):
+			raise ValueError("compression must be None, 'gzip' or 'zstd'")
+		if compression == "zstd" and zstandard is None:
+			raise ValueError("compression 'zstd' needs package zstandard")
+
+		self.compression = compression
+		self.flush_each_record = flush_each_record
+		self.compressor = ThreadPoolExecutor(max_workers=1) if compression else None
+		self.pending = None
+
+		if compression:
+			self.namer = self._compressed_name
+			self.rotator = self._rotate_and_compress
+
+	def emit(self, record):
+		try:
+			if self.shouldRollover(record):
+				self.doRollover()
+			if self.stream is None:
+				self.stream = self._open()
+
+			self.stream.write(self.format(record) + self.terminator)
+			if self.flush_each_record:
+				self.stream.flush()
+		except Exception:
+			self.handleError(record)
+
+	def doRollover(self):
+		# rotated files are renamed during rollover, so last compression must be done first
+		self._wait_compression()
+		super().doRollover()
+
+	def close(self):
+		self._wait_compression()
+		if self.compressor is not None:
+			self.compressor.shutdown(wait=True)
+		super().close()
+
+	def _wait_compression(self):
+		if self.pending is not None:
+			self.pending.result()
+			self.pending = None
+
+	def _compressed_name(self, name):
+		return name + (".gz" if self.compression == "gzip" else ".zst")
+
+	def _rotate_and_compress(self, source, dest):
+		# rename is fast, compression runs in background
+		path_tmp = f"{dest}.tmp"
+		os.replace(source, path_tmp)
+		self.pending = self.compressor.submit(self._compress, path_tmp, dest)
+
+	def _compress(self, source, dest):
+		with open(file=source, mode="rb") as f_in:
+			if self.compression == "gzip":
+				with gzip.open(filename=dest, mode="wb") as f_out:
+					shutil.copyfileobj(f_in, f_out, length=1024 * 1024)
+			else:
+				with open(file=dest, mode="wb") as f_out:
+					zstandard.ZstdCompressor().copy_stream(f_in, f_out)
+
+		os.remove(source)
+
+
+class SizeRotatingFileHandler(_RotationMixin, logging.handlers.RotatingFileHandler):
+	"""
+	Rotate log file when it reaches given size
+	"""
+
+	def __init__(self, filename, mode="a", max_bytes=0, backup_count=0, compression=None, flush_each_record=True):
+		"""
+		Initialization for attributes
+		:param filename: path | log file
+		:param mode: str | log mode
+		:param max_bytes: int | rotate when file would grow beyond this size
+		:param backup_count: int | rotated files to keep
+		:param compression: str | None, "gzip" or "zstd"
+		:param flush_each_record: boolean | flush file after each record
+		"""
+
+		super().__init__(filename=filename, mode=mode, maxBytes=max_bytes, backupCount=backup_count,
+		                 encoding="utf-8")
+		self._setup_rotation(compression=compression, flush_each_record=flush_each_record)
+
+
+class TimeRotatingFileHandler(_RotationMixin, logging.handlers.TimedRotatingFileHandler):
+	"""
+	Rotate log file after given time interval
+	"""
+
+	def __init__(self, filename, when="midnight", interval=1, backup_count=0, compression=None,
+	             flush_each_record=True):
+		"""
+		Initialization for attributes
+		:param filename: path | log file
+		:param when: str | unit of interval, e.g. "S", "M", "H", "D", "midnight" or "W0"
+		:param interval: int | rotate after this many units
+		:param backup_count: int | rotated files to keep
+		:param compression: str | None, "gzip" or "zstd"
+		:param flush_each_record: boolean | flush file after each record
+		"""
+
+		super().__init__(filename=filename, when=when, interval=interval, backupCount=backup_count,
+		                 encoding="utf-8")
+		self._setup_rotation(compression=compression, flush_each_record=flush_each_record)
+
+
 class Log:
 
-	def __init__(self, level, dir_log, mode="a"):
+	def __init__(self, level, dir_log, mode="a", async_mode=False, queue_size=10000, block=False,
+	             multiprocess=False, batch_size=500, max_bytes=0, when=None, interval=1, backup_count=7,
+	             compression=None, json_format=False):
 		"""
 		Initialization for attributes
 		:param level: object | loging level
 		:param dir_log: path | absolute directory of log file
 		:param mode: str | log mode
+		:param async_mode: boolean | callers only put records into a queue, one thread writes the file
+		:param queue_size: int | records kept in queue at most
+		:param block: boolean | wait when queue is full, otherwise drop record
+		:param multiprocess: boolean | use a multiprocessing queue, so that worker processes write to same file
+		:param batch_size: int | records written before file is flushed
+		:param max_bytes: int | rotate log file when it reaches this size, no size rotation if 0
+		:param when: str | rotate log file by time, e.g. "H", "midnight" or "W0", no time rotation if None
+		:param interval: int | rotate after this many units of when
+		:param backup_count: int | rotated files to keep
+		:param compression: str | compress rotated files in background, None, "gzip" or "zstd"
+		:param json_format: boolean | write one JSON object per line instead of text
 		"""
 
 		self.level = level
 		self.dir_log = dir_log
 		self.mode = mode
+		self.async_mode = async_mode
+		self.queue_size = queue_size
+		self.block = block
+		self.multiprocess = multiprocess
+		self.batch_size = batch_size
+		self.max_bytes = max_bytes
+		self.when = when
+		self.interval = interval
+		self.backup_count = backup_count
+		self.compression = compression
+		self.json_format = json_format
+
+		self.queue = None
+		self.queue_handler = None
+		self.listener = None
 
 	def format_configuration(self):
 		"""
@@ -19,8 +317,105 @@ class Log:
 		:return: object
 		"""
 
-		return logging.basicConfig(filename=self.dir_log,
-		                           level=self.level,
-		                           format="%(asctime)s - %(filename)s[line:%(lineno)d] - %(levelname)s: %(message)s",
-		                           datefmt="%Y-%m-%d %H:%M:%S",
-		                           handlers=[logging.FileHandler(filename=self.dir_log, mode=self.mode)])
+		if not self.async_mode:
+			return logging.basicConfig(level=self.level, handlers=[self.create_file_handler(flush_each_record=True)])
+
+		# file is only written by listener thread
+		file_handler = self.create_file_handler(flush_each_record=False)
+
+		if self.multiprocess:
+			self.queue = multiprocessing.Queue(maxsize=self.queue_size)
+		else:
+			self.queue = queue.Queue(maxsize=self.queue_size)
+
+		self.queue_handler = BoundedQueueHandler(log_queue=self.queue, block=self.block)
+		self.listener = BatchQueueListener(log_queue=self.queue, handlers=[file_handler], batch_size=self.batch_size)
+		self.listener.start()
+		atexit.register(self.shutdown)
+
+		return logging.basicConfig(level=self.level, handlers=[self.queue_handler])
+
+	def create_file_handler(self, flush_each_record=True):
+		"""
+		Create handler writing log file, with rotation and format as configured
+		:param flush_each_record: boolean | flush file after each record
+		:return: object | handler
+		"""
+
+		if self.when:
+			file_handler = TimeRotatingFileHandler(filename=self.dir_log, when=self.when, interval=self.interval,
+			                                       backup_count=self.backup_count, compression=self.compression,
+			                                       flush_each_record=flush_each_record)
+		elif self.max_bytes:
+			file_handler = SizeRotatingFileHandler(filename=self.dir_log, mode=self.mode, max_bytes=self.max_bytes,
+			                                       backup_count=self.backup_count, compression=self.compression,
+			                                       flush_each_record=flush_each_record)
+		elif flush_each_record:
+			file_handler = logging.FileHandler(filename=self.dir_log, mode=self.mode)
+		else:
+			file_handler = BatchFileHandler(filename=self.dir_log, mode=self.mode)
+
+		if self.json_format:
+			file_handler.setFormatter(JsonFormatter())
+		else:
+			file_handler.setFormatter(logging.Formatter(fmt=LOG_FORMAT, datefmt=LOG_DATEFMT))
+
+		return file_handler
+
+	def add_handler(self, handler):
+		"""
+		Write records also to given handler, e.g. SQLServerLogHandler; in async mode it runs in listener thread
+		:param handler: object | logging handler
+		:return: object | handler
+		"""
+
+		if self.listener is not None:
+			self.listener.handlers.append(handler)
+		else:
+			logging.getLogger().addHandler(handler)
+
+		return handler
+
+	def enable_timing(self, flush_interval=60, path_metrics=None):
+		"""
+		Enable spans of timing module, summary of each span is written to this log
+		:param flush_interval: float | seconds between two summaries, only at exit if None
+		:param path_metrics: path like | also append summary to .csv or .parquet file
+		:return: object | Metrics collecting the spans
+		"""
+
+		METRICS.start(flush_interval=flush_interval, path_metrics=path_metrics)
+
+		return METRICS
+
+	def shutdown(self):
+		"""
+		Write last timing summary and records left in queue, stop listener thread
+		:return: int | number of records dropped because queue was full
+		"""
+
+		# last timing summary still goes through queue
+		METRICS.stop()
+
+		if self.listener is None:
+			return 0
+
+		self.listener.stop()
+		for handler in self.listener.handlers:
+			handler.close()
+		self.listener = None
+
+		return self.queue_handler.dropped
+
+	@staticmethod
+	def worker_configuration(log_queue, level, block=False):
+		"""
+		Configure log in worker process, e.g. as initializer of multiprocessing.Pool
+		:param log_queue: object | Log.queue of main process created with multiprocess=True
+		:param level: object | loging level
+		:param block: boolean | wait when queue is full, otherwise drop record
+		:return: object
+		"""
+
+		return logging.basicConfig(level=level, handlers=[BoundedQueueHandler(log_queue=log_queue, block=block)],
+		                           force=True)
@@ -1,6 +1,8 @@
+import itertools
 from urllib.parse import quote_plus
 import sqlalchemy
 import pymysql
+from batch_tuner import BatchTuner
 
 class MySQL:
 	"""
@@ -35,3 +37,54 @@ class MySQL:
 				f"mysql+pymysql://{self.user}:{encoded_password}@{self.server}:{self.port}/{self.database}")
 
 		return con
+
+	def insert_rows(self, table_name, columns, rows, batch_size="auto", tuner=None):
+		"""
+		Insert rows with executemany in batches
+		:param table_name: str | table name
+		:param columns: list | column names
+		:param rows: iterable | tuples of values, e.g. df.itertuples(index=False, name=None)
+		:param batch_size: int or str | rows of one executemany, "auto" tunes it while writing
+		:param tuner: BatchTuner | tuner for batch_size "auto", keeps tuned size and trace; a new one if None
+		:return: int | rows inserted
+		"""
+
+		sql_insert = (f"INSERT INTO {table_name} ({', '.join(f'`{column}`' for column in columns)}) "
+		              f"VALUES ({', '.join('%s' for _ in columns)})")
+
+		# plain DB-API connection, an engine would keep its pool open after each call
+		con = pymysql.connect(host=self.server, user=self.user, password=self.password, database=self.database,
+		                      port=int(self.port))
+		cursor = con.cursor()
+
+		try:
+			if batch_size == "auto":
+				tuner = tuner or BatchTuner()
+
+				# one statement must not exceed max_allowed_packet of server
+				if tuner.max_packet_bytes is None:
+					cursor.execute("SELECT @@max_allowed_packet")
+					tuner.max_packet_bytes = int(cursor.fetchone()[0])
+
+				count = tuner.write(server=self.server, table_name=table_name, rows=rows,
+				                    execute=lambda batch: cursor.executemany(sql_insert, batch))
+			else:
+				count = 0
+				rows = iter(rows)
+				while True:
+					batch = list(itertools.islice(rows, batch_size))
+					if not batch:
+						break
+					cursor.executemany(sql_insert, batch)
+					count += len(batch)
+
+			con.commit()
+
+		except Exception:
+			con.rollback()
+			raise
+
+		finally:
+			con.close()
+
+		return count
@@ -1,3 +1,4 @@
+import os
 import comtypes.client
 import win32com.client as win32
 
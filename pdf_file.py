@@ -1,6 +1,9 @@
 import base64
+import datetime
 import math
+from pathlib import Path
 import pandas as pd
+from timing import timed
 
 class PDFData:
 	"""
@@ -17,6 +20,7 @@ class PDFData:
 		self.creation_time = datetime.datetime.fromtimestamp(Path(dir_pdf).stat().st_ctime)
 		self.last_modified_time = datetime.datetime.fromtimestamp(Path(dir_pdf).stat().st_mtime)
 
+	@timed()
 	def convert_to_base64(self):
 		"""
 		:return: DataFrame with spil string
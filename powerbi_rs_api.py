@@ -1,22 +1,201 @@
 from requests_ntlm import HttpNtlmAuth
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from concurrent.futures import ThreadPoolExecutor
+import codecs
+import datetime
+import json
 import os
+import re
+import threading
+import time
+from urllib.parse import urljoin
 import requests
+import pandas as pd
+from timing import timed
+
+# seconds spent to open TCP and TLS connection, per thread
+_connect_time = threading.local()
+
+
+def _record_connect(connect):
+	"""
+	Measure time of one connect function
+	:param connect: function | connect of parent connection class
+	:return: None
+	"""
+
+	start = time.perf_counter()
+	try:
+		connect()
+	finally:
+		_connect_time.seconds = getattr(_connect_time, "seconds", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnection(HTTPConnection):
+	def connect(self):
+		_record_connect(super().connect)
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+	def connect(self):
+		_record_connect(super().connect)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+	ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+	ConnectionCls = _TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+	"""
+	HTTPAdapter which records time to open new connections
+	"""
+
+	def init_poolmanager(self, *args, **kwargs):
+		super().init_poolmanager(*args, **kwargs)
+		self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool,
+		                                           "https": _TimedHTTPSConnectionPool}
+
+
+class CatalogCache:
+	"""
+	Keep catalog pages in memory and optionally in a JSON file, each collection with own time to live; file is
+	written by flush only
+	"""
+
+	def __init__(self, ttl=0, ttl_by_collection=None, cache_path=None):
+		"""
+		Initialization for attributes
+		:param ttl: float | seconds a page is used without asking server, 0 to always ask and use a cached page
+		only after 304 Not Modified
+		:param ttl_by_collection: dict | ttl for single collections, e.g. {"CacheRefreshPlans": 60}
+		:param cache_path: path like | JSON file to keep pages between runs, memory only if None
+		"""
+
+		self.ttl = ttl
+		self.ttl_by_collection = ttl_by_collection or {}
+		self.cache_path = cache_path
+		self.lock = threading.Lock()
+		self.entries = {}
+		self.dirty = False
+
+		if cache_path and os.path.exists(cache_path):
+			with open(file=cache_path, mode="r", encoding="utf-8") as f:
+				self.entries = json.load(f)
+
+	def get(self, collection, params):
+		"""
+		Cached page of one request
+		:param collection: str | catalog collection
+		:param params: dict | OData query options
+		:return: dict | with items, time, etag and last_modified, None if not cached
+		"""
+
+		with self.lock:
+			return self.entries.get(self._key(collection, params))
+
+	def is_fresh(self, entry):
+		"""
+		If cached page can be used without asking server
+		:param entry: dict | cached page
+		:return: boolean | True or False
+		"""
+
+		return time.time() - entry["time"] < self.ttl_by_collection.get(entry["collection"], self.ttl)
+
+	def put(self, collection, params, items, etag=None, last_modified=None, next_link=None):
+		"""
+		Save page of one request
+		:param collection: str | catalog collection
+		:param params: dict | OData query options
+		:param items: list | items of page
+		:param etag: str | ETag header of response
+		:param last_modified: str | Last-Modified header of response
+		:param next_link: str | @odata.nextLink of page
+		:return: None
+		"""
+
+		with self.lock:
+			self.entries[self._key(collection, params)] = {"collection": collection, "time": time.time(),
+			                                               "etag": etag, "last_modified": last_modified,
+			                                               "next_link": next_link, "items": items}
+			self.dirty = True
+
+	def touch(self, collection, params):
+		"""
+		Mark cached page as fresh again, e.g. after 304 Not Modified
+		:return: None
+		"""
+
+		with self.lock:
+			entry = self.entries.get(self._key(collection, params))
+			if entry is not None:
+				entry["time"] = time.time()
+				self.dirty = True
+
+	def invalidate(self, collection=None):
+		"""
+		Drop cached pages
+		:param collection: str | only drop pages of this collection, drop all if None
+		:return: None
+		"""
+
+		with self.lock:
+			self.entries = {k: v for k, v in self.entries.items()
+			                if collection is not None and v["collection"] != collection}
+			self.dirty = True
+
+	def flush(self):
+		"""
+		Write cache file if pages changed since last flush
+		:return: None
+		"""
+
+		with self.lock:
+			if not self.cache_path or not self.dirty:
+				return
+
+			# replace file at once so that a crash never leaves half written cache
+			path_tmp = f"{self.cache_path}.tmp"
+			with open(file=path_tmp, mode="w", encoding="utf-8") as f:
+				json.dump(self.entries, f)
+			os.replace(path_tmp, self.cache_path)
+			self.dirty = False
+
+	@staticmethod
+	def _key(collection, params):
+		return json.dumps([collection, sorted((k, str(v)) for k, v in params.items())])
+
 
 class PBIRS_API:
 	"""
 	Call REST API to realize interaction with Power BI Resport Server
 	"""
 
-	def __init__(self, user_name="SCHAEFFLER\\P3PQ", password="Pq0123456", localhost="p01251735"):
+	def __init__(self, user_name="SCHAEFFLER\\P3PQ", password="Pq0123456", localhost="p01251735",
+	             pool_maxsize=10, timeout=(10, 300), cache_ttl=0, cache_ttl_by_collection=None, cache_path=None):
 		"""
 		Initialization for attributes
 		:param user_name: str | admin username of Power BI Report Server
 		:param password: str | password of admin username
 		:param localhost: str | server name
+		:param pool_maxsize: int | connections kept alive to server, each authenticated by NTLM only once
+		:param timeout: tuple | seconds to wait for (connect, response)
+		:param cache_ttl: float | seconds catalog pages are used without asking server, 0 to always ask; opt-in since
+		changes on server are not seen within this time
+		:param cache_ttl_by_collection: dict | cache_ttl for single collections, e.g. {"CacheRefreshPlans": 60}
+		:param cache_path: path like | JSON file to keep catalog pages between runs, written on close, memory only if
+		None
 		"""
 		self.user_name = user_name
 		self.password = password
 		self.localhost = localhost
+		self.timeout = timeout
 
 		# create authority
 		self.auth = HttpNtlmAuth(username=self.user_name, password=self.password)
@@ -27,6 +206,70 @@ class PBIRS_API:
 		# create requests header
 		self.header = {"Content-Type": "application/json"}
 
+		# create session, connections are kept alive and reused by following calls
+		self.session = requests.Session()
+		self.session.auth = self.auth
+		self.session.headers.update(self.header)
+		self.session.verify = False
+		adapter = TimedHTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+		self.session.mount("https://", adapter)
+		self.session.mount("http://", adapter)
+
+		# timing of each call
+		self.timings = []
+
+		# cache of catalog pages and name to id index
+		self.cache = CatalogCache(ttl=cache_ttl, ttl_by_collection=cache_ttl_by_collection, cache_path=cache_path)
+		self.indexes = {}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def close(self):
+		"""
+		Close all connections of session and write cache file
+		:return: None
+		"""
+
+		self.cache.flush()
+		self.session.close()
+
+	@timed()
+	def request(self, method, query_string, **kwargs):
+		"""
+		Call REST API through session and record timing
+		:param method: str | HTTP method, e.g. "GET"
+		:param query_string: str | path after base URL
+		:param kwargs: dict | further arguments of requests.Session.request
+		:return: object | response
+		"""
+
+		# concatenate URL, absolute URL like @odata.nextLink is used as is
+		url_full = query_string if "://" in query_string else os.path.join(self.url_base, query_string)
+
+		kwargs.setdefault("timeout", self.timeout)
+		_connect_time.seconds = 0.0
+		start = time.perf_counter()
+
+		# execute requests
+		response = self.session.request(method=method, url=url_full, **kwargs)
+
+		# NTLM handshake answers 401 before final response
+		total = time.perf_counter() - start
+		self.timings.append({"method": method,
+		                     "url": url_full,
+		                     "status_code": response.status_code,
+		                     "connect": _connect_time.seconds,
+		                     "auth": sum((r.elapsed.total_seconds() for r in response.history), 0.0),
+		                     "auth_legs": len(response.history),
+		                     "response": response.elapsed.total_seconds(),
+		                     "total": total})
+
+		return response
+
 	def post_cache_refresh_plan(self, plan_id):
 		"""
 		Execute schedule plan to refresh model
@@ -37,20 +280,127 @@ class PBIRS_API:
 		# create query string
 		query_string = f"CacheRefreshPlans({plan_id})/Model.Execute"
 
-		# concatenate URL
-		url_full = os.path.join(self.url_base, query_string)
-
 		# execute requests
-		response = requests.post(url=url_full,
-		                         auth=self.auth,
-		                         headers=self.header,
-		                         verify=False)
+		response = self.request(method="POST", query_string=query_string)
 
 		# get response code
 		status_code = response.status_code
 
 		return status_code
 
+	def get_cache_refresh_plan(self, plan_id):
+		"""
+		Get properties of schedule plan, e.g. LastStatus and LastRunTime
+		:param plan_id: str | schedule plan id
+		:return: dict | properties of schedule plan
+		"""
+
+		response = self.request(method="GET", query_string=f"CacheRefreshPlans({plan_id})")
+		response.raise_for_status()
+
+		return response.json()
+
+	def get_cache_refresh_plan_history(self, plan_id):
+		"""
+		Get executions of schedule plan
+		:param plan_id: str | schedule plan id
+		:return: list | one dict for each execution with StartTime, EndTime, Status and Message
+		"""
+
+		response = self.request(method="GET", query_string=f"CacheRefreshPlans({plan_id})/History")
+		response.raise_for_status()
+
+		return response.json().get("value", [])
+
+	@timed()
+	def refresh_plans(self, plan_ids, max_concurrency=4, poll_initial=5, poll_max=60, poll_factor=1.5,
+	                  timeout=3600):
+		"""
+		Execute many schedule plans concurrently and wait until each one is finished
+		:param plan_ids: list | schedule plan ids
+		:param max_concurrency: int | plans refreshed at the same time, keep within capacity of server
+		:param poll_initial: float | seconds before first status check
+		:param poll_max: float | longest wait between two status checks
+		:param poll_factor: float | wait is multiplied by this factor after each check
+		:param timeout: float | seconds to wait for one plan at most
+		:return: list | one dict for each plan with outcome, message and durations
+		"""
+
+		with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+			futures = [pool.submit(self._refresh_and_wait, plan_id, poll_initial, poll_max, poll_factor, timeout)
+			           for plan_id in plan_ids]
+
+			return [future.result() for future in futures]
+
+	def _refresh_and_wait(self, plan_id, poll_initial, poll_max, poll_factor, timeout):
+		"""
+		Execute one schedule plan and poll its history until new execution is finished
+		:return: dict | outcome of plan
+		"""
+
+		result = {"plan_id": plan_id, "status_code": None, "outcome": None, "message": None, "polls": 0,
+		          "start_time": None, "end_time": None, "server_duration": None, "duration": None}
+		start = time.perf_counter()
+
+		try:
+			# executions before trigger, to recognize the new one
+			history = self.get_cache_refresh_plan_history(plan_id)
+			known = {(item.get("StartTime"), item.get("EndTime")) for item in history if item.get("EndTime")}
+
+			# wait about as long as last refresh took before first check
+			durations = [d for d in (self._server_duration(item) for item in history) if d]
+			delay = min(max(poll_initial, durations[-1] * 0.8 if durations else 0), poll_max)
+
+			result["status_code"] = self.post_cache_refresh_plan(plan_id)
+			if result["status_code"] not in [200, 201, 202, 204]:
+				result["outcome"] = "trigger_failed"
+				return result
+
+			while True:
+				if time.perf_counter() - start > timeout:
+					result["outcome"] = "timeout"
+					result["message"] = self.get_cache_refresh_plan(plan_id).get("LastStatus")
+					return result
+
+				time.sleep(delay)
+				delay = min(delay * poll_factor, poll_max)
+				result["polls"] += 1
+
+				finished = [item for item in self.get_cache_refresh_plan_history(plan_id)
+				            if item.get("EndTime") and (item.get("StartTime"), item.get("EndTime")) not in known]
+				if finished:
+					item = finished[-1]
+					result["outcome"] = item.get("Status")
+					result["message"] = item.get("Message")
+					result["start_time"] = item.get("StartTime")
+					result["end_time"] = item.get("EndTime")
+					result["server_duration"] = self._server_duration(item)
+					return result
+
+		except requests.RequestException as e:
+			result["outcome"] = "request_failed"
+			result["message"] = repr(e)
+			return result
+
+		finally:
+			result["duration"] = time.perf_counter() - start
+
+	@staticmethod
+	def _server_duration(item):
+		"""
+		Seconds between StartTime and EndTime of one execution
+		:param item: dict | one execution in history
+		:return: float | None if times are missing or not readable
+		"""
+
+		try:
+			start_time = datetime.datetime.fromisoformat(item["StartTime"])
+			end_time = datetime.datetime.fromisoformat(item["EndTime"])
+		except (KeyError, TypeError, ValueError):
+			return None
+
+		return (end_time - start_time).total_seconds()
+
 	def get_pbi_reports(self):
 		"""
 		Get basic information of catalog items
@@ -60,15 +410,8 @@ class PBIRS_API:
 		# create query string
 		query_string = f"PowerBIReports"
 
-		# concatenate URL
-		url_full = os.path.join(self.url_base, query_string)
-		print(url_full)
-
 		# execute requests
-		response = requests.get(url=url_full,
-		                        auth=self.auth,
-		                        headers=self.header,
-		                        verify=False)
+		response = self.request(method="GET", query_string=query_string)
 
 		# get response code
 		status_code = response.status_code
@@ -81,3 +424,386 @@ class PBIRS_API:
 		elif status_code == 200:
 			data = response.json()
 			return data
+
+	def iter_catalog_pages(self, collection, select=None, odata_filter=None, orderby=None, page_size=500,
+	                       max_items=None, revalidate=False):
+		"""
+		Read catalog collection page by page with OData query options; server may return less items than requested
+		per page, so paging stops only at an empty page, or at the last page of @odata.nextLink if server sends it
+		:param collection: str | e.g. "PowerBIReports", "Reports", "CatalogItems", "CacheRefreshPlans"
+		:param select: list | properties to return, e.g. ["Id", "Name", "Path"], all properties if None
+		:param odata_filter: str | OData filter, e.g. "Path eq '/Sales/Daily'" or "startswith(Path, '/Sales')"
+		:param orderby: str | OData orderby, e.g. "Name"; "Id" is used if None to keep pages stable
+		:param page_size: int | items requested with one call
+		:param max_items: int | stop after this many items, all items if None
+		:param revalidate: boolean | ask server also for fresh cached pages, 304 keeps cached page
+		:return: generator | list of dict for each page
+		"""
+
+		params = {"$orderby": orderby or "Id"}
+		if select:
+			params["$select"] = ",".join(select)
+		if odata_filter:
+			params["$filter"] = odata_filter
+
+		skip = 0
+		next_link = None
+		server_paging = False
+		while max_items is None or skip < max_items:
+			if next_link is None:
+				params["$top"] = page_size if max_items is None else min(page_size, max_items - skip)
+				params["$skip"] = skip
+				page, next_link = self._get_catalog_page(collection=collection, params=dict(params),
+				                                         revalidate=revalidate)
+			else:
+				page, next_link = self._get_catalog_page(collection=collection, next_link=next_link,
+				                                         revalidate=revalidate)
+
+			if not page:
+				break
+
+			if max_items is not None:
+				page = page[:max_items - skip]
+			yield page
+			skip += len(page)
+
+			# last page of server driven paging has no next link
+			server_paging = server_paging or next_link is not None
+			if server_paging and next_link is None:
+				break
+
+		# one write for all pages of collection
+		self.cache.flush()
+
+	@timed()
+	def get_catalog(self, collection, select=None, odata_filter=None, orderby=None, page_size=500, max_items=None,
+	                as_pages=False, revalidate=False):
+		"""
+		Read catalog collection into DataFrame
+		:param collection: str | e.g. "PowerBIReports", "Reports", "CatalogItems", "CacheRefreshPlans"
+		:param select: list | properties to return, all properties if None
+		:param odata_filter: str | OData filter
+		:param orderby: str | OData orderby
+		:param page_size: int | items requested with one call
+		:param max_items: int | stop after this many items, all items if None
+		:param as_pages: boolean | return generator of one DataFrame for each page instead of one DataFrame
+		:param revalidate: boolean | ask server also for fresh cached pages, see iter_catalog_pages
+		:return: DataFrame or generator
+		"""
+
+		pages = self.iter_catalog_pages(collection=collection, select=select, odata_filter=odata_filter,
+		                                orderby=orderby, page_size=page_size, max_items=max_items,
+		                                revalidate=revalidate)
+
+		if as_pages:
+			return (pd.DataFrame(data=page, columns=select) for page in pages)
+
+		return pd.DataFrame(data=[item for page in pages for item in page], columns=select)
+
+	def get_item_id(self, name, collection="PowerBIReports"):
+		"""
+		Look up Id of catalog item in an index built from cached catalog
+		:param name: str | name of item, or full path starting with "/" if name is not unique
+		:param collection: str | catalog collection
+		:return: str | Id of item
+		"""
+
+		index = self.indexes.get(collection)
+		if index is None or not self.cache.is_fresh(index):
+			df_items = self.get_catalog(collection=collection, select=["Id", "Name", "Path"])
+			index = {"collection": collection, "time": time.time(), "name": {}, "path": {}}
+			for item_id, item_name, item_path in df_items[["Id", "Name", "Path"]].itertuples(index=False):
+				index["name"].setdefault(item_name, []).append(item_id)
+				index["path"][item_path] = item_id
+			self.indexes[collection] = index
+
+		if name.startswith("/"):
+			if name not in index["path"]:
+				raise KeyError(f"{name} not found in {collection}")
+			return index["path"][name]
+
+		ids = index["name"].get(name, [])
+		if not ids:
+			raise KeyError(f"{name} not found in {collection}")
+		if len(ids) > 1:
+			raise ValueError(f"{name} is not unique in {collection}, use full path instead")
+
+		return ids[0]
+
+	def invalidate_cache(self, collection=None):
+		"""
+		Drop cached catalog pages and name to id index
+		:param collection: str | only drop this collection, drop all if None
+		:return: None
+		"""
+
+		self.cache.invalidate(collection=collection)
+		if collection is None:
+			self.indexes.clear()
+		else:
+			self.indexes.pop(collection, None)
+
+	def _get_catalog_page(self, collection, params=None, revalidate=False, next_link=None):
+		"""
+		Get one page from cache, revalidate with ETag or Last-Modified when expired
+		:param collection: str | catalog collection
+		:param params: dict | OData query options
+		:param revalidate: boolean | revalidate also if not expired
+		:param next_link: str | @odata.nextLink of previous page, used instead of params
+		:return: tuple | (list with items of page, @odata.nextLink of page or None)
+		"""
+
+		query_string = collection
+		if next_link is not None:
+			query_string = urljoin(self.url_base, next_link)
+			params = {"$nextLink": query_string}
+
+		entry = self.cache.get(collection=collection, params=params)
+		if entry is not None and not revalidate and self.cache.is_fresh(entry):
+			return entry["items"], entry.get("next_link")
+
+		# conditional request, server answers 304 if page did not change
+		headers = {}
+		if entry is not None and entry["etag"]:
+			headers["If-None-Match"] = entry["etag"]
+		if entry is not None and entry["last_modified"]:
+			headers["If-Modified-Since"] = entry["last_modified"]
+
+		response = self.request(method="GET", query_string=query_string,
+		                        params=None if next_link is not None else params, headers=headers, stream=True)
+		try:
+			if response.status_code == 304 and entry is not None:
+				self.cache.touch(collection=collection, params=params)
+				return entry["items"], entry.get("next_link")
+
+			response.raise_for_status()
+			annotations = {}
+			page = list(self._iter_odata_values(response, annotations=annotations))
+		finally:
+			response.close()
+
+		self.cache.put(collection=collection, params=params, items=page, etag=response.headers.get("ETag"),
+		               last_modified=response.headers.get("Last-Modified"),
+		               next_link=annotations.get("@odata.nextLink"))
+
+		return page, annotations.get("@odata.nextLink")
+
+	@timed()
+	def export_catalog(self, dir_dst, odata_filter=None, max_concurrency=4, chunk_size=1024 * 1024, skip_unchanged=True):
+		"""
+		Download content of catalog items into folder, same folder structure as on server
+		:param dir_dst: path like | destination directory
+		:param odata_filter: str | OData filter of CatalogItems, e.g. "startswith(Path, '/Sales')"
+		:param max_concurrency: int | items downloaded at the same time
+		:param chunk_size: int | bytes written to disk at once
+		:param skip_unchanged: boolean | skip items with same ModifiedDate and Size as in last export
+		:return: tuple | (DataFrame with result of each item, dict with summary and throughput)
+		"""
+
+		# cached list may miss changes within cache_ttl, which would be skipped as unchanged
+		df_items = self.get_catalog_items(select=["Id", "Name", "Path", "Type", "ModifiedDate", "Size"],
+		                                  odata_filter=odata_filter, revalidate=True)
+		df_items = df_items[~df_items["Type"].isin(["Folder", "LinkedReport"])]
+
+		# manifest remembers what was exported last time
+		path_manifest = os.path.join(dir_dst, ".export_manifest.json")
+		manifest = {"items": {}, "partial": {}}
+		if os.path.exists(path_manifest):
+			with open(file=path_manifest, mode="r", encoding="utf-8") as f:
+				manifest = json.load(f)
+		lock = threading.Lock()
+
+		start = time.perf_counter()
+		with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+			futures = [pool.submit(self._export_item, item, dir_dst, path_manifest, manifest, lock, chunk_size,
+			                       skip_unchanged)
+			           for item in df_items.to_dict(orient="records")]
+			results = [future.result() for future in futures]
+
+		with lock:
+			self._save_manifest(path_manifest=path_manifest, manifest=manifest)
+
+		df_result = pd.DataFrame(data=results, columns=["id", "path", "file", "status", "bytes", "seconds", "error"])
+		seconds = time.perf_counter() - start
+		total_bytes = int(df_result["bytes"].sum())
+		summary = {"items": len(df_result),
+		           "downloaded": int((df_result["status"] == "downloaded").sum()),
+		           "resumed": int((df_result["status"] == "resumed").sum()),
+		           "skipped": int((df_result["status"] == "skipped").sum()),
+		           "failed": int((df_result["status"] == "failed").sum()),
+		           "bytes": total_bytes,
+		           "seconds": seconds,
+		           "mb_per_second": total_bytes / 1024 / 1024 / seconds if seconds else 0.0}
+
+		return df_result, summary
+
+	def _export_item(self, item, dir_dst, path_manifest, manifest, lock, chunk_size, skip_unchanged):
+		"""
+		Download content of one catalog item, continue partial download if item did not change
+		:return: list | id, path, file, status, bytes, seconds and error
+		"""
+
+		start = time.perf_counter()
+		path_file = self._export_file_path(dir_dst=dir_dst, item=item)
+		path_part = f"{path_file}.part"
+		version = [item.get("ModifiedDate"), item.get("Size")]
+
+		with lock:
+			exported = manifest["items"].get(item["Id"])
+			partial = manifest["partial"].get(item["Id"])
+
+		if skip_unchanged and exported == version and os.path.exists(path_file):
+			return [item["Id"], item["Path"], path_file, "skipped", 0, time.perf_counter() - start, None]
+
+		# continue partial download only if item did not change since
+		offset = 0
+		if partial == version and os.path.exists(path_part):
+			offset = os.path.getsize(path_part)
+		headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+		try:
+			os.makedirs(os.path.dirname(path_file), exist_ok=True)
+			with lock:
+				manifest["partial"][item["Id"]] = version
+				self._save_manifest(path_manifest=path_manifest, manifest=manifest)
+
+			response = self.request(method="GET", query_string=f"CatalogItems({item['Id']})/Content/$value",
+			                        headers=headers, stream=True)
+			try:
+				response.raise_for_status()
+				resumed = bool(offset) and response.status_code == 206
+				written = 0
+
+				with open(file=path_part, mode="ab" if resumed else "wb") as f:
+					for chunk in response.iter_content(chunk_size=chunk_size):
+						f.write(chunk)
+						written += len(chunk)
+			finally:
+				response.close()
+
+			os.replace(path_part, path_file)
+			with lock:
+				manifest["items"][item["Id"]] = version
+				manifest["partial"].pop(item["Id"], None)
+				self._save_manifest(path_manifest=path_manifest, manifest=manifest)
+
+		except (requests.RequestException, OSError) as e:
+			return [item["Id"], item["Path"], path_file, "failed", 0, time.perf_counter() - start, repr(e)]
+
+		status = "resumed" if resumed else "downloaded"
+		return [item["Id"], item["Path"], path_file, status, written, time.perf_counter() - start, None]
+
+	@staticmethod
+	def _export_file_path(dir_dst, item):
+		"""
+		Local file of one catalog item, extension based on item type
+		:return: str | path of file
+		"""
+
+		extensions = {"PowerBIReport": ".pbix", "Report": ".rdl", "DataSet": ".rsd", "DataSource": ".rsds",
+		              "MobileReport": ".rsmobile", "Kpi": ".kpi"}
+
+		parts = [re.sub(r'[<>:"|?*]', "_", part) for part in item["Path"].strip("/").split("/")]
+		path_file = os.path.join(dir_dst, *parts)
+		extension = extensions.get(item.get("Type"), "")
+		if extension and not path_file.lower().endswith(extension):
+			path_file += extension
+
+		return path_file
+
+	@staticmethod
+	def _save_manifest(path_manifest, manifest):
+		os.makedirs(os.path.dirname(path_manifest), exist_ok=True)
+		with open(file=f"{path_manifest}.tmp", mode="w", encoding="utf-8") as f:
+			json.dump(manifest, f)
+		os.replace(f"{path_manifest}.tmp", path_manifest)
+
+	def get_power_bi_reports(self, **kwargs):
+		"""
+		Read PowerBIReports into DataFrame, see get_catalog for arguments
+		:return: DataFrame
+		"""
+
+		return self.get_catalog(collection="PowerBIReports", **kwargs)
+
+	def get_reports(self, **kwargs):
+		"""
+		Read paginated Reports into DataFrame, see get_catalog for arguments
+		:return: DataFrame
+		"""
+
+		return self.get_catalog(collection="Reports", **kwargs)
+
+	def get_catalog_items(self, **kwargs):
+		"""
+		Read CatalogItems into DataFrame, see get_catalog for arguments
+		:return: DataFrame
+		"""
+
+		return self.get_catalog(collection="CatalogItems", **kwargs)
+
+	def get_cache_refresh_plans(self, **kwargs):
+		"""
+		Read CacheRefreshPlans into DataFrame, see get_catalog for arguments; revalidated by default since state of
+		plans changes with each refresh
+		:return: DataFrame
+		"""
+
+		kwargs.setdefault("revalidate", True)
+
+		return self.get_catalog(collection="CacheRefreshPlans", **kwargs)
+
+	@staticmethod
+	def _iter_odata_values(response, chunk_size=64 * 1024, annotations=None):
+		"""
+		Parse items of "value" array while response is downloaded
+		:param response: object | streamed response of OData collection
+		:param chunk_size: int | bytes read at once
+		:param annotations: dict | filled with "@odata.nextLink" if response has it, after all items are read
+		:return: generator | dict for each item
+		"""
+
+		decoder = json.JSONDecoder()
+		utf8 = codecs.getincrementaldecoder("utf-8")()
+		chunks = (utf8.decode(chunk) for chunk in response.iter_content(chunk_size=chunk_size))
+		buffer = ""
+		position = -1
+
+		# find start of value array
+		for chunk in chunks:
+			buffer += chunk
+			position = buffer.find('"value"')
+			if position >= 0 and "[" in buffer[position:]:
+				break
+		if position < 0:
+			return
+
+		head = buffer[:position]
+		position = buffer.index("[", position) + 1
+
+		while True:
+			# skip separators between items
+			while position < len(buffer) and buffer[position] in " \t\r\n,":
+				position += 1
+
+			if position < len(buffer) and buffer[position] == "]":
+				# next link is before or after value array
+				if annotations is not None:
+					match = re.search(r'"@odata\.nextLink"\s*:\s*("(?:[^"\\]|\\.)*")',
+					                  head + buffer[position + 1:] + "".join(chunks))
+					if match:
+						annotations["@odata.nextLink"] = json.loads(match.group(1))
+				return
+
+			try:
+				item, end = decoder.raw_decode(buffer, position)
+			except json.JSONDecodeError:
+				chunk = next(chunks, None)
+				if chunk is None:
+					raise
+				buffer = buffer[position:] + chunk
+				position = 0
+				continue
+
+			yield item
+			position = end
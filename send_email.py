@@ -1,9 +1,258 @@
+import base64
+import mimetypes
+import os
+import re
 import smtplib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from email import encoders
+from email.mime.base import MIMEBase
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 from email.header import Header
 from email.utils import formataddr
+from timing import timed
+
+
+MAIL_HOST = "mail-de-hza.schaeffler.com"
+MAIL_PORT = 25
+
+
+class MimePartCache:
+	"""
+	Keep base64 encoded pictures and attachments in memory, so that repeated emails skip file reading and encoding
+	"""
+
+	def __init__(self, max_bytes=64 * 1024 * 1024):
+		"""
+		Initialization for attributes
+		:param max_bytes: int | total size of encoded parts to keep, least recently used parts are dropped first
+		"""
+
+		self.max_bytes = max_bytes
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.parts = OrderedDict()
+		self.lock = threading.Lock()
+
+	def get_part(self, path, content_id=None, attachment=False):
+		"""
+		Create MIME part of one file, based on cached encoding if file not changed
+		:param path: path like | picture or attachment
+		:param content_id: str | Content-ID to reference picture in html content, e.g. <image0>
+		:param attachment: boolean | add as attachment with file name
+		:return: object | MIME part
+		"""
+
+		stat = os.stat(path)
+		key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, content_id, attachment)
+
+		with self.lock:
+			cached = self.parts.get(key)
+			if cached is not None:
+				self.parts.move_to_end(key)
+				self.hits += 1
+
+		if cached is None:
+			cached = self._encode(path=path, attachment=attachment)
+			self._put(key=key, cached=cached)
+
+		# build new part around encoded payload
+		content_type, payload = cached
+		maintype, subtype = content_type.split("/", 1)
+		part = MIMEBase(maintype, subtype)
+		part.set_payload(payload)
+		part["Content-Transfer-Encoding"] = "base64"
+
+		if content_id:
+			part.add_header("Content-ID", content_id)
+		if attachment:
+			part.add_header("Content-Disposition", "attachment", filename=os.path.basename(path))
+
+		return part
+
+	def clear(self):
+		"""
+		Drop all cached parts
+		:return: None
+		"""
+
+		with self.lock:
+			self.parts.clear()
+			self.size = 0
+
+	@staticmethod
+	def _encode(path, attachment):
+		"""
+		Read and encode file
+		:return: tuple | (content type, base64 payload)
+		"""
+
+		with open(file=path, mode="rb") as f:
+			data = f.read()
+
+		if attachment:
+			content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+			maintype, subtype = content_type.split("/", 1)
+			part = MIMEBase(maintype, subtype)
+			part.set_payload(data)
+			encoders.encode_base64(part)
+		else:
+			part = MIMEImage(data)
+
+		return part.get_content_type(), part.get_payload()
+
+	def _put(self, key, cached):
+		size = len(cached[1])
+
+		with self.lock:
+			self.misses += 1
+			if size > self.max_bytes or key in self.parts:
+				return
+
+			self.parts[key] = cached
+			self.size += size
+
+			while self.size > self.max_bytes:
+				_, (_, payload) = self.parts.popitem(last=False)
+				self.size -= len(payload)
+
+
+PART_CACHE = MimePartCache()
+
+
+class MessageStream:
+	"""
+	Serialize email block by block, attachments are read from disk while sending
+	"""
+
+	def __init__(self, msg, file_parts):
+		"""
+		Initialization for attributes
+		:param msg: object | email object with headers and small parts, e.g. content
+		:param file_parts: list | (path, Content-ID, attachment) of files streamed from disk
+		"""
+
+		self.msg = msg
+		self.file_parts = file_parts
+		self.files = None
+		self.policy = msg.policy.clone(linesep="\r\n")
+		self.boundary = msg.get_boundary() or f"==============={uuid.uuid4().hex}=="
+		msg.set_boundary(self.boundary)
+
+	def __enter__(self):
+		self.open_files()
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close_files()
+
+	def open_files(self):
+		"""
+		Open all files before sending, so a missing file fails before SMTP DATA and not in the middle of it
+		:return: None
+		"""
+
+		if self.files is not None:
+			return
+
+		files = []
+		try:
+			for path, _, _ in self.file_parts:
+				files.append(open(file=path, mode="rb"))
+		except OSError:
+			for f in files:
+				f.close()
+			raise
+
+		self.files = files
+
+	def close_files(self):
+		"""
+		Close files opened by open_files
+		:return: None
+		"""
+
+		for f in self.files or []:
+			f.close()
+		self.files = None
+
+	def iter_bytes(self, block_size=64 * 1024):
+		"""
+		Serialized email in blocks of whole lines, dot-stuffed for SMTP DATA
+		:param block_size: int | bytes of one block
+		:return: generator | bytes
+		"""
+
+		opened = self.files is None
+		if opened:
+			self.open_files()
+
+		try:
+			buffer = bytearray()
+			for chunk in self._iter_chunks():
+				buffer += chunk
+
+				if len(buffer) >= block_size:
+					end = buffer.rfind(b"\r\n") + 2
+					if end > 1:
+						yield self._dot_stuff(bytes(buffer[:end]))
+						del buffer[:end]
+
+			if buffer:
+				yield self._dot_stuff(bytes(buffer))
+
+		finally:
+			if opened:
+				self.close_files()
+
+	def _iter_chunks(self):
+		boundary = self.boundary.encode("ascii")
+
+		# headers of email
+		yield self._headers(self.msg)
+		yield b"\r\n"
+
+		# small parts kept in memory
+		for part in self.msg.get_payload():
+			yield b"--" + boundary + b"\r\n"
+			yield part.as_bytes(policy=self.policy)
+			yield b"\r\n"
+
+		# files encoded while reading
+		for (path, content_id, attachment), f in zip(self.file_parts, self.files):
+			content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+			part = MIMEBase(*content_type.split("/", 1))
+			part["Content-Transfer-Encoding"] = "base64"
+			if content_id:
+				part.add_header("Content-ID", content_id)
+			if attachment:
+				part.add_header("Content-Disposition", "attachment", filename=os.path.basename(path))
+
+			yield b"--" + boundary + b"\r\n"
+			yield self._headers(part)
+			yield b"\r\n"
+
+			# 57 bytes are encoded to one line of 76 characters, file is read again from start after a reconnect
+			f.seek(0)
+			while True:
+				data = f.read(57 * 1024)
+				if not data:
+					break
+				yield base64.encodebytes(data).replace(b"\n", b"\r\n")
+
+		yield b"--" + boundary + b"--\r\n"
+
+	def _headers(self, msg):
+		return b"".join(self.policy.fold_binary(name, value) for name, value in msg.items())
+
+	@staticmethod
+	def _dot_stuff(block):
+		return re.sub(rb"(?m)^\.", b"..", block)
 
 
 class SendEmail:
@@ -28,9 +277,15 @@ class SendEmail:
 		self.subject = subject
 		self.content = content
 
-	def send_email_with_text(self):
-		# create connection to Email Serve
-		email_server = smtplib.SMTP(host="mail-de-hza.schaeffler.com", port=25)
+	def create_message(self, subtype="plain", image_path=None, attachment_path=None, part_cache=PART_CACHE):
+		"""
+		Create email object and full receiver list
+		:param subtype: str | "plain" or "html"
+		:param image_path: list | path of pictures referenced as <image0>, <image1>... in html content
+		:param attachment_path: list | path of files to attach, e.g. PDF
+		:param part_cache: MimePartCache | cache of encoded pictures and attachments, read files every time if None
+		:return: tuple | (email object, list of receiver and Cc)
+		"""
 
 		# create email object
 		msg = MIMEMultipart()
@@ -49,55 +304,337 @@ class SendEmail:
 		msg["Cc"] = ",".join(self.cc)
 
 		# add content
-		text = MIMEText(_text=self.content, _subtype="plain", _charset="utf-8")
+		text = MIMEText(_text=self.content, _subtype=subtype, _charset="utf-8")
 		msg.attach(text)
 
+		# add picture into content
+		if image_path:
+			for i, path in enumerate(image_path):
+				if part_cache is not None:
+					msg.attach(part_cache.get_part(path=path, content_id=f'<image{i}>'))
+					continue
+
+				with open(file=path, mode="rb") as img_file:
+					img = MIMEImage(img_file.read())
+					img.add_header('Content-ID', f'<image{i}>')
+					msg.attach(img)
+
+		# add attachment
+		if attachment_path:
+			cache = part_cache if part_cache is not None else MimePartCache(max_bytes=0)
+			for path in attachment_path:
+				msg.attach(cache.get_part(path=path, attachment=True))
+
 		# extend receiver list
-		to_list = msg["To"].split(",")
-		cc_list = msg["Cc"].split(",")
-		to_list.extend(cc_list)
+		to_list = [address for address in msg["To"].split(",") + msg["Cc"].split(",") if address]
 
-		# send email
-		email_server.sendmail(from_addr=msg["From"], to_addrs=to_list, msg=msg.as_string())
-		email_server.quit()
+		return msg, to_list
 
-	def send_email_with_html(self, image_path=None):
-		# create connection to Email Serve
-		email_server = smtplib.SMTP(host="mail-de-hza.schaeffler.com", port=25)
+	def create_stream(self, subtype="plain", image_path=None, attachment_path=None):
+		"""
+		Create email which reads pictures and attachments from disk only while sending
+		:param subtype: str | "plain" or "html"
+		:param image_path: list | path of pictures referenced as <image0>, <image1>... in html content
+		:param attachment_path: list | path of files to attach, e.g. PDF
+		:return: tuple | (MessageStream, list of receiver and Cc)
+		"""
 
-		# create email object
-		msg = MIMEMultipart()
+		msg, to_list = self.create_message(subtype=subtype)
 
-		# create subject
-		title = Header(s=self.subject, charset="utf-8").encode()
-		msg["Subject"] = title
+		file_parts = [(path, f"<image{i}>", False) for i, path in enumerate(image_path or [])]
+		file_parts.extend((path, None, True) for path in attachment_path or [])
 
-		# set sender
-		msg["From"] = formataddr((self.sender_name, self.sender_address))
+		return MessageStream(msg=msg, file_parts=file_parts), to_list
 
-		# set receiver
-		msg["To"] = ",".join(self.receiver)
+	@timed()
+	def send_email_streamed(self, subtype="plain", image_path=None, attachment_path=None, session=None,
+	                        block_size=64 * 1024):
+		"""
+		Send email with large attachments, memory used does not depend on size of attachments
+		:param subtype: str | "plain" or "html"
+		:param image_path: list | path of pictures referenced as <image0>, <image1>... in html content
+		:param attachment_path: list | path of files to attach, e.g. PDF
+		:param session: MailSession | opened session to reuse, a new connection is used if None
+		:param block_size: int | bytes sent to Email Server at once
+		:return: float | seconds used to send email
+		"""
 
-		# set Cc
-		msg["Cc"] = ",".join(self.cc)
+		stream, to_list = self.create_stream(subtype=subtype, image_path=image_path, attachment_path=attachment_path)
 
-		# add content
-		html = MIMEText(_text=self.content, _subtype="html", _charset="utf-8")
-		msg.attach(html)
+		if session is not None:
+			return session.send_stream(from_addr=stream.msg["From"], to_list=to_list, stream=stream,
+			                           block_size=block_size)
 
-		# add picture into content
-		if image_path:
-			for i, path in enumerate(image_path):
-				with open(file=path, mode="rb") as img_file:
-					img = MIMEImage(img_file.read())
-					img.add_header('Content-ID', f'<image{i}>')
-					msg.attach(img)
+		with MailSession() as single_session:
+			return single_session.send_stream(from_addr=stream.msg["From"], to_list=to_list, stream=stream,
+			                                  block_size=block_size)
 
-		# extend receiver list
-		to_list = msg["To"].split(",")
-		cc_list = msg["Cc"].split(",")
-		to_list.extend(cc_list)
+	@timed()
+	def send_email_with_text(self, session=None, attachment_path=None):
+		"""
+		Send email with normal text
+		:param session: MailSession | opened session to reuse, a new connection is used if None
+		:param attachment_path: list | path of files to attach, e.g. PDF
+		:return: float | seconds used to send email
+		"""
+
+		msg, to_list = self.create_message(subtype="plain", attachment_path=attachment_path)
+
+		return self._send(msg=msg, to_list=to_list, session=session)
+
+	@timed()
+	def send_email_with_html(self, image_path=None, session=None, attachment_path=None):
+		"""
+		Send email with html content and pictures
+		:param image_path: list | path of pictures referenced as <image0>, <image1>... in html content
+		:param session: MailSession | opened session to reuse, a new connection is used if None
+		:param attachment_path: list | path of files to attach, e.g. PDF
+		:return: float | seconds used to send email
+		"""
+
+		msg, to_list = self.create_message(subtype="html", image_path=image_path, attachment_path=attachment_path)
+
+		return self._send(msg=msg, to_list=to_list, session=session)
+
+	@staticmethod
+	def _send(msg, to_list, session):
+		"""
+		Send email through given session or one single connection
+		:param msg: object | email object
+		:param to_list: list | receiver and Cc
+		:param session: MailSession | opened session or None
+		:return: float | seconds used to send email
+		"""
+
+		if session is not None:
+			return session.send_message(msg=msg, to_list=to_list)
+
+		with MailSession() as single_session:
+			return single_session.send_message(msg=msg, to_list=to_list)
+
+
+class MailSession:
+	"""
+	Keep one connection to Email Server open for many emails
+	"""
+
+	def __init__(self, host=MAIL_HOST, port=MAIL_PORT, timeout=60, max_messages_per_connection=None, retries=1):
+		"""
+		Initialization for attributes
+		:param host: str | host name of Email Server
+		:param port: int | port of Email Server
+		:param timeout: int | seconds to wait for Email Server
+		:param max_messages_per_connection: int | reconnect after this many emails, no limit if None
+		:param retries: int | times to reconnect and resend after disconnect or temporary server limit
+		"""
+
+		self.host = host
+		self.port = port
+		self.timeout = timeout
+		self.max_messages_per_connection = max_messages_per_connection
+		self.retries = retries
+
+		self.email_server = None
+		self.message_count = 0
+		self.connection_count = 0
+		self.latencies = []
+
+	def __enter__(self):
+		self.connect()
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+	def connect(self):
+		"""
+		Create connection to Email Server
+		:return: None
+		"""
+
+		self.close()
+		self.email_server = smtplib.SMTP(host=self.host, port=self.port, timeout=self.timeout)
+		self.email_server.ehlo()
+		self.message_count = 0
+		self.connection_count += 1
+
+	def close(self):
+		"""
+		Quit connection to Email Server if opened
+		:return: None
+		"""
+
+		if self.email_server is None:
+			return
+
+		try:
+			self.email_server.quit()
+		except (smtplib.SMTPException, OSError):
+			self.email_server.close()
+
+		self.email_server = None
+
+	def send_message(self, msg, to_list):
+		"""
+		Send one email object, reconnect if server closed connection
+		:param msg: object | email object
+		:param to_list: list | receiver and Cc
+		:return: float | seconds used to send email
+		"""
+
+		return self.send_raw(from_addr=msg["From"], to_list=to_list, data=msg.as_string())
+
+	@timed()
+	def send_raw(self, from_addr, to_list, data):
+		"""
+		Send one serialized email, reconnect if server closed connection
+		:param from_addr: str | sender
+		:param to_list: list | receiver and Cc
+		:param data: str or bytes | serialized email
+		:return: float | seconds used to send email
+		"""
+
+		return self._deliver(lambda: self.email_server.sendmail(from_addr=from_addr, to_addrs=to_list, msg=data))
+
+	@timed()
+	def send_stream(self, from_addr, to_list, stream, block_size=64 * 1024):
+		"""
+		Send one MessageStream block by block, reconnect if server closed connection
+		:param from_addr: str | sender
+		:param to_list: list | receiver and Cc
+		:param stream: MessageStream | email serialized while sending
+		:param block_size: int | bytes sent to Email Server at once
+		:return: float | seconds used to send email
+		"""
+
+		with stream:
+			return self._deliver(lambda: self._sendmail_blocks(from_addr=from_addr, to_list=to_list,
+			                                                   blocks=stream.iter_bytes(block_size=block_size)))
+
+	def _deliver(self, send):
+		"""
+		Run one send function, reconnect and run again after disconnect or 421 reply
+		:param send: function | sends one email through self.email_server
+		:return: float | seconds used to send email
+		"""
+
+		attempt = 0
+		while True:
+
+			# reconnect when connection is missing or used up
+			if self.email_server is None or (self.max_messages_per_connection and
+			                                 self.message_count >= self.max_messages_per_connection):
+				self.connect()
+
+			start = time.perf_counter()
+			try:
+				send()
+
+			except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+				error = e
+
+			except smtplib.SMTPResponseException as e:
+				# 421: service not available, e.g. too many messages on this connection
+				if e.smtp_code != 421:
+					raise
+				error = e
+
+			else:
+				latency = time.perf_counter() - start
+				self.message_count += 1
+				self.latencies.append(latency)
+				return latency
+
+			# drop broken connection and try again
+			self.close()
+			attempt += 1
+			if attempt > self.retries:
+				raise error
+
+	def _sendmail_blocks(self, from_addr, to_list, blocks):
+		"""
+		Same as smtplib.SMTP.sendmail, but DATA is sent block by block
+		:param from_addr: str | sender
+		:param to_list: list | receiver and Cc
+		:param blocks: iterable | dot-stuffed bytes ending with CRLF
+		:return: dict | refused receiver
+		"""
+
+		server = self.email_server
+		server.ehlo_or_helo_if_needed()
+
+		code, resp = server.mail(from_addr)
+		if code != 250:
+			server.rset()
+			raise smtplib.SMTPSenderRefused(code, resp, from_addr)
+
+		refused = {}
+		for address in to_list:
+			code, resp = server.rcpt(address)
+			if code not in (250, 251):
+				refused[address] = (code, resp)
+		if len(refused) == len(to_list):
+			server.rset()
+			raise smtplib.SMTPRecipientsRefused(refused)
+
+		code, resp = server.docmd("data")
+		if code != 354:
+			server.rset()
+			raise smtplib.SMTPDataError(code, resp)
+
+		try:
+			for block in blocks:
+				server.send(block)
+			server.send(b".\r\n")
+			code, resp = server.getreply()
+		except BaseException:
+			# connection is left inside DATA and can not be reused, QUIT would be read as part of the email
+			server.close()
+			self.email_server = None
+			raise
+
+		if code != 250:
+			raise smtplib.SMTPDataError(code, resp)
+
+		return refused
+
+	@staticmethod
+	def is_temporary_error(error):
+		"""
+		If the error is worth sending again later, e.g. 4xx reply or lost connection
+		:param error: Exception | error raised when sending
+		:return: boolean | True or False
+		"""
+
+		if isinstance(error, smtplib.SMTPRecipientsRefused):
+			return all(400 <= code < 500 for code, _ in error.recipients.values())
+
+		if isinstance(error, smtplib.SMTPResponseException):
+			return 400 <= error.smtp_code < 500
+
+		return isinstance(error, (smtplib.SMTPException, OSError))
+
+	def send_batch(self, emails, subtype="plain", image_path=None, attachment_path=None):
+		"""
+		Send many SendEmail objects through this session
+		:param emails: list | SendEmail objects
+		:param subtype: str | "plain" or "html"
+		:param image_path: list | path of pictures used for html content
+		:param attachment_path: list | path of files to attach, e.g. PDF
+		:return: list | dict with subject, receiver, status, latency and error for each email
+		"""
+
+		results = []
+		for email in emails:
+			msg, to_list = email.create_message(subtype=subtype, image_path=image_path,
+			                                    attachment_path=attachment_path)
+
+			try:
+				latency = self.send_message(msg=msg, to_list=to_list)
+				results.append({"subject": email.subject, "receiver": to_list, "status": "sent",
+				                "latency": latency, "error": None})
+			except (smtplib.SMTPException, OSError) as e:
+				results.append({"subject": email.subject, "receiver": to_list, "status": "failed",
+				                "latency": None, "error": repr(e)})
 
-		# send email
-		email_server.sendmail(from_addr=msg["From"], to_addrs=to_list, msg=msg.as_string())
-		email_server.quit()
+		return results
@@ -0,0 +1,318 @@
+import hashlib
+import json
+import os
+import posixpath
+import queue
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+import pandas as pd
+from document_converter import BACKENDS
+
+NS_PRESENTATION = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+NS_RELATIONSHIP = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+def _rels_name(part_name):
+	directory, file_name = posixpath.split(part_name)
+	return posixpath.join(directory, "_rels", f"{file_name}.rels")
+
+
+def _related_parts(archive, part_name):
+	"""
+	Internal parts referenced by relationships of one part
+	:return: list | (relationship id, relationship type, part name)
+	"""
+
+	rels_name = _rels_name(part_name)
+	if rels_name not in archive.NameToInfo:
+		return []
+
+	parts = []
+	for relationship in ET.fromstring(archive.read(rels_name)):
+		if relationship.get("TargetMode") == "External":
+			continue
+
+		target = relationship.get("Target")
+		if target.startswith("/"):
+			name = target.lstrip("/")
+		else:
+			name = posixpath.normpath(posixpath.join(posixpath.dirname(part_name), target))
+		parts.append((relationship.get("Id"), relationship.get("Type"), name))
+
+	return parts
+
+
+def slide_fingerprints(path_deck):
+	"""
+	Fingerprint of each slide in order of presentation, from CRC of slide and all parts it uses (images, charts,
+	layout, master, theme); notes are ignored since they are not on the image
+	:param path_deck: path like | .pptx file
+	:return: list | fingerprint for each slide, None if file is not .pptx
+	"""
+
+	try:
+		archive = zipfile.ZipFile(path_deck)
+	except zipfile.BadZipFile:
+		return None
+
+	with archive:
+		if "ppt/presentation.xml" not in archive.NameToInfo:
+			return None
+
+		targets = {relationship_id: name for relationship_id, _, name in
+		           _related_parts(archive, "ppt/presentation.xml")}
+		presentation = ET.fromstring(archive.read("ppt/presentation.xml"))
+		slide_ids = presentation.find(f"{NS_PRESENTATION}sldIdLst")
+
+		fingerprints = []
+		for slide_id in ([] if slide_ids is None else slide_ids):
+			slide_name = targets[slide_id.get(f"{NS_RELATIONSHIP}id")]
+			info = archive.getinfo(slide_name)
+			entries = [f"{info.CRC}:{info.file_size}"]
+
+			# walk through all parts used by slide
+			seen = {slide_name}
+			pending = [slide_name]
+			while pending:
+				for _, relationship_type, name in _related_parts(archive, pending.pop()):
+					if name in seen or relationship_type.endswith("/notesSlide") or name not in archive.NameToInfo:
+						continue
+					seen.add(name)
+					pending.append(name)
+					info = archive.getinfo(name)
+					entries.append(f"{name}:{info.CRC}:{info.file_size}")
+
+			entries[1:] = sorted(entries[1:])
+			fingerprints.append(hashlib.sha256("|".join(entries).encode("utf-8")).hexdigest())
+
+	return fingerprints
+
+
+class SlideExporter:
+	"""
+	Export slides as PNG only for decks and slides changed since last run, several decks in parallel
+	"""
+
+	MANIFEST_NAME = ".slide_manifest.json"
+
+	def __init__(self, backend="powerpoint", workers=None, width=None, height=None):
+		"""
+		Initialization for attributes
+		:param backend: str or callable | "powerpoint", "libreoffice", or function returning a ConverterBackend
+		:param workers: int | decks exported in parallel, each worker keeps one application instance; limited to
+		                max_workers of backend, which is 1 for PowerPoint; 2 if None and backend has no limit
+		:param width: int | width of image in pixel, size of slide if None
+		:param height: int | height of image in pixel, keeps aspect ratio if None
+		"""
+
+		if isinstance(backend, str):
+			if backend not in BACKENDS:
+				raise ValueError(f"backend must be one of {', '.join(BACKENDS)}")
+			backend = BACKENDS[backend]
+
+		self.backend_factory = backend
+		max_workers = getattr(backend, "max_workers", None)
+		self.workers = workers or max_workers or 2
+		if max_workers is not None:
+			self.workers = min(self.workers, max_workers)
+		self.width = width
+		self.height = height
+		self.report = None
+
+	def export(self, paths, dir_dst, force=False):
+		"""
+		Export changed slides of decks into dir_dst/<deck name>/slide_<number>.png, decks with same name from
+		different folders into <deck name>_2, <deck name>_3...
+		:param paths: list | path of decks
+		:param dir_dst: path like | destination directory, also keeps manifest of fingerprints
+		:param force: boolean | export all slides regardless of manifest
+		:return: list | path of regenerated images; result of each deck is in attribute report
+		"""
+
+		os.makedirs(dir_dst, exist_ok=True)
+		path_manifest = os.path.join(dir_dst, self.MANIFEST_NAME)
+		manifest = {}
+		if os.path.exists(path_manifest):
+			with open(file=path_manifest, mode="r", encoding="utf-8") as f:
+				manifest = json.load(f)
+
+		dirs_deck = self._deck_dirs(paths, manifest)
+
+		tasks = queue.Queue()
+		for path in paths:
+			tasks.put(path)
+
+		images = []
+		results = []
+		lock = threading.Lock()
+		threads = [threading.Thread(target=self._work,
+		                            args=(number, tasks, dir_dst, dirs_deck, manifest, path_manifest, force, images,
+		                                  results, lock),
+		                            daemon=True)
+		           for number in range(max(1, min(self.workers, len(paths))))]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.report = pd.DataFrame(data=results, columns=["deck", "status", "slides", "exported", "removed",
+		                                                  "worker", "seconds", "error"])
+
+		return sorted(images)
+
+	@staticmethod
+	def _deck_dirs(paths, manifest):
+		"""
+		Directory name of each deck, unique regardless of case; a deck keeps directory of manifest from earlier runs
+		:param paths: list | path of decks
+		:param manifest: dict | absolute path of deck and manifest entry
+		:return: dict | absolute path of deck and directory name
+		"""
+
+		dirs_deck = {}
+		used = {entry["dir"].lower() for entry in manifest.values() if entry.get("dir")}
+		for path in paths:
+			key = os.path.abspath(path)
+			if key in dirs_deck:
+				continue
+
+			name = manifest.get(key, {}).get("dir")
+			if name is None:
+				stem = name = Path(path).stem
+				number = 1
+				while name.lower() in used:
+					number += 1
+					name = f"{stem}_{number}"
+				used.add(name.lower())
+			dirs_deck[key] = name
+
+		return dirs_deck
+
+	def _plan(self, path_deck, dir_deck, entry):
+		"""
+		Compare deck with manifest entry
+		:return: tuple | (new manifest entry, slide numbers to export or None for all, True if nothing to do)
+		"""
+
+		stat = os.stat(path_deck)
+		new_entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "width": self.width, "height": self.height}
+		same_settings = entry is not None and entry.get("width") == self.width and entry.get("height") == self.height
+
+		# unchanged file: no need to read it
+		if (same_settings and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns
+				and all(os.path.exists(os.path.join(dir_deck, f"slide_{i}.png"))
+				        for i in range(1, entry.get("slide_count", 0) + 1))):
+			return entry, [], True
+
+		digest = hashlib.sha256()
+		with open(file=path_deck, mode="rb") as f:
+			for block in iter(lambda: f.read(1024 * 1024), b""):
+				digest.update(block)
+		new_entry["sha256"] = digest.hexdigest()
+
+		fingerprints = slide_fingerprints(path_deck)
+		new_entry["slides"] = fingerprints
+		if fingerprints is not None:
+			new_entry["slide_count"] = len(fingerprints)
+
+		if not same_settings or fingerprints is None or entry.get("slides") is None:
+			# only touched, content is the same
+			if same_settings and entry.get("sha256") == new_entry["sha256"] and "slide_count" in entry:
+				new_entry["slide_count"] = entry["slide_count"]
+				return new_entry, [], False
+			return new_entry, None, False
+
+		old_slides = entry["slides"]
+		slides = [i for i, fingerprint in enumerate(fingerprints, start=1)
+		          if i > len(old_slides) or old_slides[i - 1] != fingerprint
+		          or not os.path.exists(os.path.join(dir_deck, f"slide_{i}.png"))]
+
+		return new_entry, slides, False
+
+	def _work(self, number, tasks, dir_dst, dirs_deck, manifest, path_manifest, force, images, results, lock):
+		"""
+		Worker thread, starts backend only when first deck needs export
+		:return: None
+		"""
+
+		backend = None
+		try:
+			while True:
+				try:
+					path_deck = tasks.get_nowait()
+				except queue.Empty:
+					break
+
+				key = os.path.abspath(path_deck)
+				dir_deck = os.path.join(dir_dst, dirs_deck[key])
+				result = [path_deck, None, None, 0, 0, number, None, None]
+				start = time.perf_counter()
+				try:
+					with lock:
+						entry = None if force else manifest.get(key)
+					new_entry, slides, unchanged = self._plan(path_deck, dir_deck, entry)
+					if new_entry.get("dir") != dirs_deck[key]:
+						new_entry = {**new_entry, "dir": dirs_deck[key]}
+						unchanged = False
+
+					exported = {}
+					if slides is None or slides:
+						os.makedirs(dir_deck, exist_ok=True)
+						if backend is None:
+							backend = self.backend_factory()
+							backend.start()
+						exported = backend.export_slides(path_deck, slides, dir_deck, self.width, self.height)
+						if slides is None:
+							new_entry["slide_count"] = len(exported)
+
+					# images of slides which do not exist anymore
+					removed = 0
+					slide_count = new_entry.get("slide_count", 0)
+					old_count = (entry or {}).get("slide_count", 0)
+					for slide_index in range(slide_count + 1, old_count + 1):
+						path_image = os.path.join(dir_deck, f"slide_{slide_index}.png")
+						if os.path.exists(path_image):
+							os.remove(path_image)
+							removed += 1
+
+					result[1] = "unchanged" if not exported and not removed else "exported"
+					result[2] = slide_count
+					result[3] = len(exported)
+					result[4] = removed
+
+					with lock:
+						images.extend(exported.values())
+						if not unchanged:
+							manifest[key] = new_entry
+							self._save_manifest(manifest, path_manifest)
+
+				except Exception as e:
+					result[1] = "failed"
+					result[7] = repr(e)
+
+					# application may be broken, next deck gets a new one
+					if backend is not None:
+						try:
+							backend.stop()
+						except Exception:
+							pass
+						backend = None
+
+				result[6] = time.perf_counter() - start
+				with lock:
+					results.append(result)
+
+		finally:
+			if backend is not None:
+				backend.stop()
+
+	@staticmethod
+	def _save_manifest(manifest, path_manifest):
+		# write whole manifest after each deck, so an interrupted run keeps finished decks
+		path_tmp = f"{path_manifest}.tmp"
+		with open(file=path_tmp, mode="w", encoding="utf-8") as f:
+			json.dump(manifest, f, indent=2)
+		os.replace(path_tmp, path_manifest)
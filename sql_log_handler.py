@@ -0,0 +1,275 @@
+import collections
+import datetime
+import itertools
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+import traceback
+
+
+class SQLServerLogHandler(logging.Handler):
+	"""
+	Buffer log records and insert them into SQL Server table in batches, spool to local file if database is down
+	"""
+
+	COLUMNS = ["log_time", "level", "logger", "file_name", "line", "process", "thread", "message", "exception"]
+
+	def __init__(self, mssql, table_name, batch_size=500, flush_interval=5, spool_path=None, max_buffer=100000):
+		"""
+		Initialization for attributes
+		:param mssql: MSSQL | connection settings of SQL Server
+		:param table_name: str | table for log records, see create_table
+		:param batch_size: int | records inserted with one executemany
+		:param flush_interval: float | seconds after which buffered records are inserted anyway
+		:param spool_path: path like | JSON lines file for records which could not be inserted, they are dropped if None
+		:param max_buffer: int | records kept in memory at most, oldest are dropped first
+		"""
+
+		super().__init__()
+		self.mssql = mssql
+		self.table_name = table_name
+		self.batch_size = batch_size
+		self.flush_interval = flush_interval
+		self.spool_path = spool_path
+		self.buffer = collections.deque(maxlen=max_buffer)
+		self.dropped = 0
+		self.dropped_reported = 0
+		self.connection = None
+		self.exception_formatter = logging.Formatter()
+
+		self.sql_insert = (f"INSERT INTO {table_name} ({', '.join(self.COLUMNS)}) "
+		                   f"VALUES ({', '.join('?' for _ in self.COLUMNS)})")
+
+		self.wake = threading.Event()
+		self.stopped = threading.Event()
+		self.writer_lock = threading.Lock()
+		self.writer = threading.Thread(target=self._run, daemon=True)
+		self.writer.start()
+
+	def create_table(self):
+		"""
+		Create log table if not exists
+		:return: None
+		"""
+
+		self.mssql.execute_sql_query(f"""
+        IF OBJECT_ID(QUOTENAME('dbo') + '.' + QUOTENAME('{self.table_name}'), 'U') IS NULL
+        BEGIN
+            CREATE TABLE {self.table_name} (
+                [log_time] DATETIME2(3),
+                [level] NVARCHAR(10),
+                [logger] NVARCHAR(200),
+                [file_name] NVARCHAR(260),
+                [line] INT,
+                [process] INT,
+                [thread] NVARCHAR(200),
+                [message] NVARCHAR(MAX),
+                [exception] NVARCHAR(MAX)
+            );
+        END
+        """)
+
+	def emit(self, record):
+		try:
+			if record.exc_info:
+				exception = self.exception_formatter.formatException(record.exc_info)
+			else:
+				exception = record.exc_text
+
+			# full buffer drops its oldest record
+			if len(self.buffer) == self.buffer.maxlen:
+				self.dropped += 1
+
+			self.buffer.append((datetime.datetime.fromtimestamp(record.created), record.levelname, record.name,
+			                    record.filename, record.lineno, record.process, record.threadName,
+			                    record.getMessage(), exception))
+		except Exception:
+			self.handleError(record)
+			return
+
+		if len(self.buffer) >= self.batch_size:
+			self.wake.set()
+
+	def flush(self):
+		"""
+		Wake writer thread to insert buffered records soon, without waiting for database; called by queue listener
+		after every batch, so it must not block
+		:return: None
+		"""
+
+		self.wake.set()
+
+	def close(self):
+		self.stopped.set()
+		self.wake.set()
+		self.writer.join()
+
+		# insert rest of records synchronously
+		with self.writer_lock:
+			try:
+				self._write_buffer(replay=True)
+			except Exception:
+				self._report("log records could not be written")
+		self._report_dropped()
+
+		if self.connection is not None:
+			self.connection.close()
+			self.connection = None
+
+		super().close()
+
+	def _run(self):
+		last_write = time.monotonic()
+		while not self.stopped.is_set():
+			self.wake.wait(timeout=self.flush_interval)
+			self.wake.clear()
+
+			# insert only full batches until flush_interval is over
+			if len(self.buffer) < self.batch_size and time.monotonic() - last_write < self.flush_interval:
+				continue
+
+			# writer thread must survive any error, e.g. spool file not writable
+			with self.writer_lock:
+				try:
+					self._write_buffer()
+				except Exception:
+					self._report("log records could not be written")
+			self._report_dropped()
+			last_write = time.monotonic()
+
+	def _report(self, message):
+		"""
+		Print problem of handler to stderr, like logging.Handler.handleError, a log record can not be used for it
+		:param message: str | description of problem
+		:return: None
+		"""
+
+		sys.stderr.write(f"--- {type(self).__name__} ({self.table_name}): {message} ---\n")
+		if sys.exc_info()[0] is not None:
+			traceback.print_exc(file=sys.stderr)
+
+	def _report_dropped(self):
+		"""
+		Report records dropped since last report, because buffer was full or database was down without spool_path
+		:return: None
+		"""
+
+		dropped = self.dropped - self.dropped_reported
+		if dropped:
+			self.dropped_reported = self.dropped
+			self._report(f"{dropped} log records dropped, {self.dropped} in total")
+
+	def _write_buffer(self, replay=False):
+		"""
+		Insert buffered records batch by batch, first records spooled earlier
+		:param replay: boolean | insert spooled records even if buffer is empty
+		:return: None
+		"""
+
+		if (self.buffer or replay) and not self._replay_spool():
+			# database still down, keep order of records in spool
+			while self.buffer:
+				self._spool([self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))])
+			return
+
+		while self.buffer:
+			rows = [self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))]
+			if not self._insert(rows):
+				# database is down: spool the rest without connecting again
+				self._spool(rows)
+				while self.buffer:
+					self._spool([self.buffer.popleft() for _ in range(min(self.batch_size, len(self.buffer)))])
+				return
+
+	def _insert(self, rows):
+		"""
+		Insert rows with one executemany
+		:param rows: list | tuples in order of COLUMNS
+		:return: boolean | True if inserted
+		"""
+
+		try:
+			if self.connection is None:
+				self.connection = self.mssql.con_pyodbc()
+
+			cursor = self.connection.cursor()
+			cursor.fast_executemany = True
+			cursor.executemany(self.sql_insert, rows)
+			self.connection.commit()
+			return True
+
+		except Exception:
+			# drop broken connection, reconnect at next batch; rows are spooled by caller
+			if self.connection is not None:
+				try:
+					self.connection.close()
+				except Exception:
+					pass
+				self.connection = None
+			return False
+
+	def _spool(self, rows):
+		if not self.spool_path:
+			self.dropped += len(rows)
+			return
+
+		with open(file=self.spool_path, mode="a", encoding="utf-8") as f:
+			for row in rows:
+				f.write(json.dumps([row[0].isoformat(), *row[1:]], ensure_ascii=False) + "\n")
+
+	def _replay_spool(self):
+		"""
+		Insert records of spool file, keep not inserted records if database is still down
+		:return: boolean | True if spool is empty afterwards
+		"""
+
+		if not self.spool_path:
+			return True
+
+		path_replay = f"{self.spool_path}.replay"
+		while True:
+			if not os.path.exists(path_replay):
+				if not os.path.exists(self.spool_path):
+					return True
+				os.replace(self.spool_path, path_replay)
+
+			if not self._replay_file(path_replay=path_replay):
+				return False
+
+	def _replay_file(self, path_replay):
+		"""
+		Insert records of one spool file batch by batch
+		:param path_replay: path like | spool file moved aside for replay
+		:return: boolean | True if all records inserted and file removed
+		"""
+
+		failed = False
+		with open(file=path_replay, mode="r", encoding="utf-8") as f:
+			while True:
+				lines = list(itertools.islice(f, self.batch_size))
+				if not lines:
+					break
+
+				rows = []
+				for line in lines:
+					values = json.loads(line)
+					rows.append((datetime.datetime.fromisoformat(values[0]), *values[1:]))
+
+				# keep only lines not inserted yet
+				if not self._insert(rows):
+					with open(file=f"{path_replay}.tmp", mode="w", encoding="utf-8") as f_rest:
+						f_rest.writelines(lines)
+						shutil.copyfileobj(f, f_rest)
+					failed = True
+					break
+
+		if failed:
+			os.replace(f"{path_replay}.tmp", path_replay)
+			return False
+
+		os.remove(path_replay)
+		return True
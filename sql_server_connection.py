@@ -1,7 +1,10 @@
+import itertools
 import pyodbc
 from urllib.parse import quote_plus
 import pymssql
 import sqlalchemy
+from batch_tuner import BatchTuner
+from timing import timed
 
 
 
@@ -25,6 +28,7 @@ class MSSQL:
 		self.user = user
 		self.password = password
 
+	@timed()
 	def con_pyodbc(self):
 		"""
 		Connection with pyodbc
@@ -39,6 +43,7 @@ class MSSQL:
 
 		return con_pyodbc
 
+	@timed()
 	def con_sqlalchemy(self):
 		"""
 		Connection with sqlalchemy
@@ -58,6 +63,7 @@ class MSSQL:
 
 		return con_sqlalchemy
 
+	@timed()
 	def add_table_property(self, table_name, table_desc):
 		"""
 		:param table_name: table name in MS SQL Server
@@ -98,6 +104,7 @@ class MSSQL:
 		con.commit()
 		con.close()
 
+	@timed()
 	def update_table_property(self, table_name, table_desc):
 		"""
 		:param table_name: table name in MS SQL Server
@@ -137,6 +144,7 @@ class MSSQL:
 		con.commit()
 		con.close()
 
+	@timed()
 	def execute_sql_query(self, sql):
 		"""
 		:param sql: sql query string
@@ -154,6 +162,7 @@ class MSSQL:
 		con.commit()
 		con.close()
 
+	@timed()
 	def execute_sql_stored_procedure(self, stored_procedure):
 		"""
 		Execute stored procedure in SQL Server
@@ -175,6 +184,7 @@ class MSSQL:
 		con.commit()
 		con.close()
 
+	@timed()
 	def truncate_table(self, table_name):
 		"""
 		Truncate table
@@ -200,6 +210,7 @@ class MSSQL:
 		con.commit()
 		con.close()
 
+	@timed()
 	def drop_table(self, table_name):
 		"""
 		Drop table
@@ -225,6 +236,7 @@ class MSSQL:
 		con.commit()
 		con.close()
 
+	@timed()
 	def create_table(self, table_name, dict_columns):
 		"""
 		Create table based on given table name and columns
@@ -260,3 +272,50 @@ class MSSQL:
 		# commit and close
 		con.commit()
 		con.close()
+
+	@timed()
+	def insert_rows(self, table_name, columns, rows, batch_size="auto", tuner=None):
+		"""
+		Insert rows with executemany in batches
+		:param table_name: str | table name
+		:param columns: list | column names
+		:param rows: iterable | tuples of values, e.g. df.itertuples(index=False, name=None)
+		:param batch_size: int or str | rows of one executemany, "auto" tunes it while writing
+		:param tuner: BatchTuner | tuner for batch_size "auto", keeps tuned size and trace; a new one if None
+		:return: int | rows inserted
+		"""
+
+		sql_insert = (f"INSERT INTO {table_name} ({', '.join(f'[{column}]' for column in columns)}) "
+		              f"VALUES ({', '.join('?' for _ in columns)})")
+
+		# get cursor
+		con = self.con_pyodbc()
+		cursor = con.cursor()
+		cursor.fast_executemany = True
+
+		try:
+			if batch_size == "auto":
+				tuner = tuner or BatchTuner()
+				count = tuner.write(server=self.server, table_name=table_name, rows=rows,
+				                    execute=lambda batch: cursor.executemany(sql_insert, batch))
+			else:
+				count = 0
+				rows = iter(rows)
+				while True:
+					batch = list(itertools.islice(rows, batch_size))
+					if not batch:
+						break
+					cursor.executemany(sql_insert, batch)
+					count += len(batch)
+
+			# commit and close
+			con.commit()
+
+		except Exception:
+			con.rollback()
+			raise
+
+		finally:
+			con.close()
+
+		return count
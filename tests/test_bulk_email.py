@@ -0,0 +1,38 @@
+import pytest
+from benchmarks.smtp_sink import SMTPSink
+from bulk_email import BulkEmail
+from send_email import SendEmail
+
+TEMPLATE = SendEmail(sender_name="Sender", sender_address="sender@example.com", receiver=[], cc=[],
+                     subject="report for {name}", content="hello {name}")
+
+
+def _rows(count):
+	return [{"receiver": f"user{number}@example.com", "name": f"user{number}"} for number in range(count)]
+
+
+def test_unexpected_error_keeps_row_and_sender(monkeypatch):
+	send_with_retry = BulkEmail._send_with_retry
+
+	def broken_send_with_retry(self, session, rendered, *args):
+		if "user3@" in rendered[1][0]:
+			raise ValueError("broken")
+		return send_with_retry(self, session, rendered, *args)
+
+	monkeypatch.setattr(BulkEmail, "_send_with_retry", broken_send_with_retry)
+
+	with SMTPSink() as sink:
+		host, port = sink.server_address
+		df_result = BulkEmail(TEMPLATE, connections=1, host=host, port=port).send(_rows(6))
+
+	assert df_result["row_index"].tolist() == list(range(6))
+	assert df_result["status"].tolist() == ["sent"] * 3 + ["failed"] + ["sent"] * 2
+	assert "broken" in df_result["error"][3]
+	assert len(sink.received) == 5
+
+
+def test_producer_stops_when_all_senders_died(monkeypatch):
+	monkeypatch.setattr(BulkEmail, "_sender", lambda self, *args: None)
+
+	with pytest.raises(RuntimeError, match="sender threads stopped"):
+		BulkEmail(TEMPLATE, connections=1, render_workers=1).send(_rows(50))
@@ -0,0 +1,210 @@
+import re
+import sqlite3
+import pandas as pd
+import pytest
+from checkpoint_load import CheckpointLoad
+
+
+class _Crash(Exception):
+	pass
+
+
+class _Cursor:
+	"""
+	pyodbc cursor over SQLite, translates the few T-SQL statements of CheckpointLoad
+	"""
+
+	def __init__(self, connection):
+		self.connection = connection
+		self.cursor = connection.sqlite.cursor()
+		self.fast_executemany = False
+
+	def execute(self, sql, *params):
+		if sql.strip().startswith("MERGE"):
+			table_name = re.search(r"MERGE (\w+)", sql).group(1)
+			sql = f"INSERT OR REPLACE INTO {table_name} (load_name, chunk, source_offset, done) VALUES (?, ?, ?, ?)"
+			params = params[4:]
+		self.cursor.execute(sql.replace("COUNT_BIG", "COUNT"), params)
+		return self
+
+	def executemany(self, sql, rows):
+		self.cursor.executemany(sql.replace("[", '"').replace("]", '"'), rows)
+
+	def fetchone(self):
+		return self.cursor.fetchone()
+
+
+class _Connection:
+
+	def __init__(self, server):
+		self.server = server
+		self.sqlite = sqlite3.connect(server.path)
+
+	def cursor(self):
+		return _Cursor(self)
+
+	def commit(self):
+		self.server.commits += 1
+		if self.server.commits == self.server.fail_before_commit:
+			raise _Crash("connection lost before commit")
+		self.sqlite.commit()
+		if self.server.commits == self.server.fail_after_commit:
+			raise _Crash("connection lost after commit")
+
+	def rollback(self):
+		self.sqlite.rollback()
+
+	def close(self):
+		self.sqlite.close()
+
+
+class _SQLServer:
+	"""
+	Stand-in for MSSQL, commit number fail_before_commit or fail_after_commit raises like a lost connection
+	"""
+
+	def __init__(self, path):
+		self.path = path
+		self.commits = 0
+		self.fail_before_commit = None
+		self.fail_after_commit = None
+
+		con = sqlite3.connect(path)
+		con.execute("CREATE TABLE target (id INTEGER, name TEXT)")
+		con.execute("CREATE TABLE load_control (load_name TEXT PRIMARY KEY, chunk INTEGER, source_offset INTEGER, "
+		            "done INTEGER)")
+		con.commit()
+		con.close()
+
+	def con_pyodbc(self):
+		return _Connection(self)
+
+	def execute_sql_query(self, sql):
+		con = sqlite3.connect(self.path)
+		con.execute(sql.replace("N'", "'"))
+		con.commit()
+		con.close()
+
+	def truncate_table(self, table_name):
+		self.execute_sql_query(f"DELETE FROM {table_name}")
+
+	def rows(self):
+		con = sqlite3.connect(self.path)
+		try:
+			return con.execute("SELECT id, name FROM target ORDER BY id").fetchall()
+		finally:
+			con.close()
+
+
+ROWS = [(number, f"name {number}") for number in range(1000)]
+
+
+def _source(fail_at=None):
+	for row in ROWS:
+		if row[0] == fail_at:
+			raise _Crash("source broke")
+		yield row
+
+
+@pytest.fixture
+def server(tmp_path):
+	return _SQLServer(str(tmp_path / "server.db"))
+
+
+@pytest.fixture(params=["state_file", "control_table"])
+def load(request, server, tmp_path):
+	if request.param == "state_file":
+		return CheckpointLoad(server, "target", ["id", "name"], chunk_size=100, state_path=str(tmp_path / "load.json"))
+
+	return CheckpointLoad(server, "target", ["id", "name"], chunk_size=100, control_table="load_control")
+
+
+def test_run_loads_all_rows_in_chunks(load, server):
+	df_result, summary = load.run(_source())
+
+	assert server.rows() == ROWS
+	assert len(df_result) == 10
+	assert summary["rows"] == 1000
+	assert load.checkpoint()["done"]
+
+
+def test_rerun_after_done_loads_nothing(load, server):
+	load.run(_source())
+
+	df_result, summary = load.run(_source())
+
+	assert summary["rows"] == 0
+	assert server.rows() == ROWS
+
+
+def test_rerun_resumes_after_source_failure(load, server):
+	with pytest.raises(_Crash):
+		load.run(_source(fail_at=650))
+	assert load.checkpoint()["offset"] == 600
+	assert len(server.rows()) == 600
+
+	df_result, summary = load.run(_source())
+
+	assert summary["resumed_offset"] == 600
+	assert summary["rows"] == 400
+	assert server.rows() == ROWS
+
+
+def test_rerun_repeats_chunk_lost_before_commit(load, server):
+	server.fail_before_commit = 4
+	with pytest.raises(_Crash):
+		load.run(_source())
+	assert len(server.rows()) == 300
+
+	df_result, summary = load.run(_source())
+
+	assert summary["resumed_offset"] == 300
+	assert server.rows() == ROWS
+
+
+def test_rerun_skips_chunk_committed_before_crash(load, server):
+	# chunk is in table, but client never heard of the commit
+	server.fail_after_commit = 4
+	with pytest.raises(_Crash):
+		load.run(_source())
+	assert len(server.rows()) == 400
+
+	df_result, summary = load.run(_source())
+
+	assert summary["resumed_offset"] == 400
+	assert server.rows() == ROWS
+
+
+def test_resume_with_callable_and_dataframe_source(load, server):
+	with pytest.raises(_Crash):
+		load.run(_source(fail_at=250))
+
+	offsets = []
+
+	def read_from(offset):
+		offsets.append(offset)
+		return iter(ROWS[offset:])
+
+	load.run(read_from)
+	assert offsets == [200]
+	assert server.rows() == ROWS
+
+	load.reset(truncate=True)
+	df_rows = pd.DataFrame(data=ROWS, columns=["id", "name"])
+	df_result, summary = load.run(df_rows)
+
+	assert summary["resumed_offset"] == 0
+	assert server.rows() == ROWS
+
+
+def test_changed_table_is_reported(server, tmp_path):
+	load = CheckpointLoad(server, "target", ["id", "name"], chunk_size=100, state_path=str(tmp_path / "load.json"))
+	server.fail_after_commit = 2
+	with pytest.raises(_Crash):
+		load.run(_source())
+
+	# someone else deleted rows, pending chunk can not be decided from row count
+	server.execute_sql_query("DELETE FROM target WHERE id < 10")
+
+	with pytest.raises(RuntimeError, match="reset"):
+		load.run(_source())
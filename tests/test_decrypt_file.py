@@ -0,0 +1,67 @@
+import io
+import os
+import tracemalloc
+import zipfile
+import msoffcrypto
+import pytest
+from msoffcrypto.exceptions import InvalidKeyError
+from decrypt_file import DecryptFile
+
+
+@pytest.fixture(scope="module")
+def encrypted(tmp_path_factory):
+	"""
+	Encrypted OOXML file of about 1 MB and its decrypted content
+	"""
+
+	plain = io.BytesIO()
+	with zipfile.ZipFile(plain, mode="w", compression=zipfile.ZIP_STORED) as archive:
+		archive.writestr("[Content_Types].xml",
+		                 '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>')
+		archive.writestr("xl/data.bin", os.urandom(1024 * 1024))
+	plain.seek(0)
+
+	path = str(tmp_path_factory.mktemp("decrypt") / "book.xlsx")
+	with open(file=path, mode="wb") as f:
+		msoffcrypto.OfficeFile(plain).encrypt("secret", f)
+
+	return path, plain.getvalue()
+
+
+@pytest.mark.parametrize("output", ["memory", "spill", "mmap"])
+def test_decrypted_content_matches(encrypted, output):
+	path, content = encrypted
+
+	decrypted = DecryptFile(path).decrypted_file("secret", output=output, spill_threshold=1024)
+
+	try:
+		assert decrypted.read() == content
+	finally:
+		decrypted.close()
+
+
+def test_decrypt_to_file_keeps_memory_low(encrypted, tmp_path):
+	path, content = encrypted
+	path_output = str(tmp_path / "book.xlsx")
+
+	tracemalloc.start()
+	try:
+		DecryptFile(path).decrypted_file("secret", output="file", path_output=path_output)
+		peak = tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+	with open(file=path_output, mode="rb") as f:
+		assert f.read() == content
+	# neither encrypted nor decrypted content is held at once
+	assert peak < len(content) / 4
+
+
+def test_wrong_password_leaves_no_file(encrypted, tmp_path):
+	path, _ = encrypted
+	path_output = str(tmp_path / "book.xlsx")
+
+	with pytest.raises(InvalidKeyError):
+		DecryptFile(path).decrypted_file("wrong", output="file", path_output=path_output)
+
+	assert os.listdir(tmp_path) == []
@@ -0,0 +1,70 @@
+import os
+from document_converter import ConverterBackend, DocumentConverter
+
+
+class _Backend(ConverterBackend):
+	"""
+	Copies files, a batch with a file named "crash" fails as a whole like a soffice timeout
+	"""
+
+	batches = []
+
+	def convert(self, path_src, path_dst, output_format):
+		if "bad" in os.path.basename(path_src):
+			raise RuntimeError("file could not be loaded")
+		with open(file=path_src, mode="rb") as f_src, open(file=path_dst, mode="wb") as f_dst:
+			f_dst.write(f_src.read())
+
+	def convert_batch(self, tasks, output_format):
+		self.batches.append(len(tasks))
+		if any("crash" in os.path.basename(path_src) for path_src, _ in tasks):
+			raise TimeoutError("application hangs")
+		return super().convert_batch(tasks, output_format)
+
+
+def _write(path, text):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(file=path, mode="w") as f:
+		f.write(text)
+	return path
+
+
+def test_failed_batch_is_retried_file_by_file(tmp_path):
+	paths = [_write(str(tmp_path / "src" / f"{name}.txt"), name) for name in ("a", "b", "crash", "c", "bad")]
+	_Backend.batches = []
+
+	df_result, summary = DocumentConverter(backend=_Backend, workers=1, output_format="txt",
+	                                       batch_size=5).convert_many(paths, str(tmp_path / "dst"))
+
+	status = dict(zip(df_result["path_src"].map(os.path.basename), df_result["status"]))
+	assert status == {"a.txt": "converted", "b.txt": "converted", "crash.txt": "failed", "c.txt": "converted",
+	                  "bad.txt": "failed"}
+	assert _Backend.batches == [5, 1, 1, 1, 1, 1]
+	assert summary["batches"] == 6
+	assert df_result["retried"].all()
+	assert (df_result["batch_files"] == 1).all()
+
+
+def test_batch_seconds_are_reported_per_batch(tmp_path):
+	paths = [_write(str(tmp_path / "src" / f"{name}.txt"), name) for name in ("a", "b", "c")]
+
+	df_result, summary = DocumentConverter(backend=_Backend, workers=1, output_format="txt",
+	                                       batch_size=3).convert_many(paths, str(tmp_path / "dst"))
+
+	assert summary["batches"] == 1
+	assert df_result["batch"].nunique() == 1
+	assert (df_result["batch_files"] == 3).all()
+	assert summary["busy_seconds"] == df_result["batch_seconds"].iloc[0]
+
+
+def test_sources_with_same_name_do_not_overwrite_each_other(tmp_path):
+	paths = [_write(str(tmp_path / "one" / "report.txt"), "one"), _write(str(tmp_path / "two" / "report.txt"), "two"),
+	         _write(str(tmp_path / "three" / "REPORT.txt"), "three")]
+
+	df_result, summary = DocumentConverter(backend=_Backend, workers=1, output_format="txt").convert_many(
+			paths, str(tmp_path / "dst"))
+
+	assert summary["converted"] == 3
+	assert sorted(os.listdir(tmp_path / "dst")) == ["REPORT_3.txt", "report.txt", "report_2.txt"]
+	with open(file=tmp_path / "dst" / "report_2.txt") as f:
+		assert f.read() == "two"
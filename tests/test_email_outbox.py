@@ -0,0 +1,69 @@
+import asyncio
+import sqlite3
+from benchmarks.smtp_sink import SMTPSink
+from email_outbox import EmailOutbox
+from send_email import SendEmail
+
+
+def _email(subject="test"):
+	return SendEmail(sender_name="Sender", sender_address="sender@example.com", receiver=["to@example.com"], cc=[],
+	                 subject=subject, content="line 1\nline 2")
+
+
+def _statuses(spool_path):
+	con = sqlite3.connect(spool_path)
+	try:
+		return [row[0] for row in con.execute("SELECT status FROM outbox ORDER BY id")]
+	finally:
+		con.close()
+
+
+def test_outbox_sends_spooled_emails_once(tmp_path):
+	spool_path = str(tmp_path / "spool.db")
+
+	async def main(host, port):
+		async with EmailOutbox(spool_path, host=host, port=port, interval=0.05) as outbox:
+			for number in range(3):
+				outbox.enqueue(_email(subject=f"test {number}"), dedup_key=str(number))
+			return await outbox.flush(timeout=10)
+
+	with SMTPSink() as sink:
+		pending = asyncio.run(main(*sink.server_address))
+
+	assert pending == 0
+	assert len(sink.received) == 3
+	assert _statuses(spool_path) == ["sent"] * 3
+
+
+def test_outbox_spools_crlf_message(tmp_path):
+	spool_path = str(tmp_path / "spool.db")
+	outbox = EmailOutbox(spool_path)
+	outbox.enqueue(_email())
+
+	message = outbox.con.execute("SELECT message FROM outbox").fetchone()[0]
+	outbox.con.close()
+
+	assert b"\r\n" in message
+	assert b"\n" not in message.replace(b"\r\n", b"")
+
+
+def test_outbox_survives_unexpected_error(tmp_path):
+	spool_path = str(tmp_path / "spool.db")
+
+	def broken_send_raw(**kwargs):
+		raise ValueError("broken")
+
+	async def main(host, port):
+		async with EmailOutbox(spool_path, host=host, port=port, interval=0.05) as outbox:
+			outbox.session.send_raw = broken_send_raw
+			outbox.enqueue(_email())
+			pending = await outbox.flush(timeout=10)
+			alive = not outbox.task.done()
+			return pending, alive
+
+	with SMTPSink() as sink:
+		pending, alive = asyncio.run(main(*sink.server_address))
+
+	assert pending == 0
+	assert alive
+	assert _statuses(spool_path) == ["failed"]
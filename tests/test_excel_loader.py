@@ -0,0 +1,25 @@
+import openpyxl
+import pandas as pd
+from excel_loader import ExcelLoader
+
+
+def test_bool_values_which_can_not_be_converted_become_null():
+	loader = ExcelLoader(mssql=None, file_path=None, dtypes={"flag": "bool"})
+	df_chunk = pd.DataFrame({"flag": [True, False, 1, 0, 2.5, "TRUE", " no ", "0", "maybe", None, float("nan")]})
+
+	df_chunk = loader.coerce(df_chunk)
+
+	assert str(df_chunk["flag"].dtype) == "boolean"
+	assert df_chunk["flag"].tolist() == [True, False, True, False, True, True, False, False, pd.NA, pd.NA, pd.NA]
+
+
+def test_empty_header_cells_are_named_by_position():
+	workbook = openpyxl.Workbook()
+	worksheet = workbook.active
+	worksheet.append(["id", None, "name", None])
+	worksheet.append([1, "a", "b", "c"])
+
+	df_chunk = next(ExcelLoader(mssql=None, file_path=None).iter_chunks(worksheet))
+
+	assert df_chunk.columns.tolist() == ["id", "column_2", "name", "column_4"]
+	assert df_chunk.iloc[0].tolist() == [1, "a", "b", "c"]
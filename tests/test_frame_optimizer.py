@@ -0,0 +1,30 @@
+import pandas as pd
+from frame_optimizer import FrameOptimizer
+
+
+def test_bit_column_maps_strings_explicitly():
+	df_data = pd.DataFrame({"flag": pd.Series(["1", "0", "False", " TRUE ", 0, 2.0, True, "maybe", None],
+	                                          dtype=object)})
+
+	df_optimized, _ = FrameOptimizer().optimize(df_data, table_types={"flag": "BIT"})
+
+	assert df_optimized["flag"].tolist() == [True, False, False, True, False, True, True, pd.NA, pd.NA]
+
+
+def test_large_integers_with_missing_values_keep_precision():
+	values = [2 ** 53 + 1, None, 2 ** 62 + 3]
+	df_data = pd.DataFrame({"analyzed": pd.Series(values, dtype=object), "typed": pd.Series(values, dtype=object)})
+
+	df_optimized, _ = FrameOptimizer().optimize(df_data, table_types={"typed": "BIGINT"})
+
+	for column in ("analyzed", "typed"):
+		assert str(df_optimized[column].dtype) == "Int64"
+		assert df_optimized[column].tolist() == [2 ** 53 + 1, pd.NA, 2 ** 62 + 3]
+
+
+def test_small_integers_with_missing_values_are_downcast():
+	df_data = pd.DataFrame({"number": pd.Series([1, None, 3], dtype=object)})
+
+	df_optimized, _ = FrameOptimizer().optimize(df_data)
+
+	assert str(df_optimized["number"].dtype) == "Int8"
@@ -0,0 +1,194 @@
+import threading
+import time
+from job_runner import JobRunner
+
+
+def _run(runner, timeout=10):
+	"""
+	Run job in thread, fail instead of hanging the test run
+	"""
+
+	outcome = {}
+	thread = threading.Thread(target=lambda: outcome.update(result=runner.run()), daemon=True)
+	thread.start()
+	thread.join(timeout)
+	assert not thread.is_alive(), "job did not finish"
+
+	return outcome["result"]
+
+
+def _status(df_result):
+	return dict(zip(df_result["stage"], df_result["status"]))
+
+
+def test_stages_get_results_of_upstream_stages():
+	runner = JobRunner(name="test")
+	runner.add_stage("extract", lambda inputs: [1, 2, 3])
+	runner.add_stage("double", lambda inputs: [value * 2 for value in inputs["extract"]], depends_on=["extract"])
+	runner.add_stage("total", lambda inputs: {"rows": 3, "sum": sum(inputs["double"])}, depends_on=["double"])
+
+	df_result, summary = _run(runner)
+
+	assert _status(df_result) == {"extract": "done", "double": "done", "total": "done"}
+	assert summary["critical_path"] == ["extract", "double", "total"]
+	assert df_result.set_index("stage")["items"].to_dict() == {"extract": 3, "double": 3, "total": 3}
+
+
+def test_independent_stages_run_concurrently():
+	barrier = threading.Barrier(2, timeout=5)
+
+	runner = JobRunner(name="test", max_workers=2)
+	# each stage waits for the other, only finishes if both run at the same time
+	runner.add_stage("left", lambda inputs: barrier.wait())
+	runner.add_stage("right", lambda inputs: barrier.wait())
+
+	df_result, summary = _run(runner)
+
+	assert summary["done"] == 2
+
+
+def test_streaming_stage_feeds_consumer_while_producing():
+	consumed_before_end = []
+	produced = []
+
+	def produce(inputs):
+		for number in range(50):
+			produced.append(number)
+			yield number
+
+	def consume(inputs):
+		values = []
+		for value in inputs["produce"]:
+			values.append(value)
+			if value == 0:
+				consumed_before_end.append(len(produced) < 50)
+		return values
+
+	runner = JobRunner(name="test", stream_buffer=5)
+	runner.add_stage("produce", produce, stream=True)
+	runner.add_stage("consume", consume, depends_on=["produce"])
+
+	df_result, summary = _run(runner)
+
+	assert summary["done"] == 2
+	assert consumed_before_end == [True]
+	assert df_result.set_index("stage")["items"].to_dict() == {"produce": 50, "consume": 50}
+
+
+def test_streaming_stage_feeds_each_consumer():
+	runner = JobRunner(name="test", stream_buffer=2)
+	runner.add_stage("produce", lambda inputs: iter(range(20)), stream=True)
+	runner.add_stage("first", lambda inputs: sum(inputs["produce"]), depends_on=["produce"], count=lambda r: 1)
+	runner.add_stage("second", lambda inputs: list(inputs["produce"]), depends_on=["produce"])
+
+	df_result, summary = _run(runner)
+
+	assert summary["done"] == 3
+	assert df_result.set_index("stage")["items"].to_dict() == {"produce": 20, "first": 1, "second": 20}
+
+
+def test_failed_stage_skips_downstream_stages_only():
+	def fail(inputs):
+		raise ValueError("broken")
+
+	runner = JobRunner(name="test")
+	runner.add_stage("fail", fail)
+	runner.add_stage("after_fail", lambda inputs: [], depends_on=["fail"])
+	runner.add_stage("after_after_fail", lambda inputs: [], depends_on=["after_fail"])
+	runner.add_stage("other", lambda inputs: [1])
+
+	df_result, summary = _run(runner)
+
+	assert _status(df_result) == {"fail": "failed", "after_fail": "skipped", "after_after_fail": "skipped",
+	                              "other": "done"}
+	assert "ValueError('broken')" in df_result.set_index("stage").loc["fail", "error"]
+
+
+def test_failed_producer_fails_consumer():
+	def produce(inputs):
+		yield 1
+		raise ValueError("broken")
+
+	runner = JobRunner(name="test")
+	runner.add_stage("produce", produce, stream=True)
+	runner.add_stage("consume", lambda inputs: list(inputs["produce"]), depends_on=["produce"])
+
+	df_result, summary = _run(runner)
+
+	assert _status(df_result) == {"produce": "failed", "consume": "failed"}
+
+
+def test_failed_consumer_does_not_block_producer():
+	def consume(inputs):
+		next(inputs["produce"])
+		raise ValueError("broken")
+
+	runner = JobRunner(name="test", stream_buffer=1)
+	runner.add_stage("produce", lambda inputs: iter(range(1000)), stream=True)
+	runner.add_stage("consume", consume, depends_on=["produce"])
+
+	df_result, summary = _run(runner)
+
+	assert _status(df_result) == {"produce": "done", "consume": "failed"}
+
+
+def test_skipped_consumer_does_not_block_producer():
+	def fail(inputs):
+		raise ValueError("broken")
+
+	runner = JobRunner(name="test", stream_buffer=1)
+	runner.add_stage("fail", fail)
+	runner.add_stage("produce", lambda inputs: iter(range(1000)), stream=True)
+	# skipped because of failed stage, never reads the stream
+	runner.add_stage("consume", lambda inputs: list(inputs["produce"]), depends_on=["fail", "produce"])
+
+	df_result, summary = _run(runner)
+
+	assert _status(df_result) == {"fail": "failed", "produce": "done", "consume": "skipped"}
+
+
+def test_failing_count_marks_stage_failed():
+	runner = JobRunner(name="test")
+	runner.add_stage("extract", lambda inputs: [1, 2], count=lambda result: 1 / 0)
+	runner.add_stage("load", lambda inputs: [], depends_on=["extract"])
+
+	df_result, summary = _run(runner)
+
+	assert _status(df_result) == {"extract": "failed", "load": "skipped"}
+
+
+def test_stage_is_retried_with_backoff():
+	calls = []
+
+	def flaky(inputs):
+		calls.append(time.perf_counter())
+		if len(calls) < 3:
+			raise ConnectionError("temporary")
+		return [1]
+
+	runner = JobRunner(name="test")
+	runner.add_stage("flaky", flaky, retries=2, backoff=0.05)
+
+	df_result, summary = _run(runner)
+
+	assert summary["done"] == 1
+	assert df_result.set_index("stage").loc["flaky", "attempts"] == 3
+	assert calls[2] - calls[1] >= calls[1] - calls[0] >= 0.05
+
+
+def test_streaming_stage_is_not_retried():
+	calls = []
+
+	def produce(inputs):
+		calls.append(1)
+		yield 1
+		raise ConnectionError("temporary")
+
+	runner = JobRunner(name="test")
+	runner.add_stage("produce", produce, stream=True, retries=3, backoff=0.01)
+	runner.add_stage("consume", lambda inputs: list(inputs["produce"]), depends_on=["produce"])
+
+	df_result, summary = _run(runner)
+
+	assert calls == [1]
+	assert summary["failed"] == 2
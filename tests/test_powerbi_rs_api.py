@@ -0,0 +1,243 @@
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+from powerbi_rs_api import PBIRS_API, CatalogCache
+
+
+class _ReportServer(BaseHTTPRequestHandler):
+	"""
+	Catalog and content of Power BI Report Server, ETag of catalog changes with each change of items
+	"""
+
+	protocol_version = "HTTP/1.1"
+
+	def log_message(self, *args):
+		pass
+
+	def do_GET(self):
+		server = self.server
+		url = urlparse(self.path)
+		server.requests.append((url.path, dict(self.headers)))
+
+		match = re.search(r"CatalogItems\((\w+)\)/Content/\$value$", url.path)
+		if match:
+			data = server.content[match.group(1)]
+			offset = 0
+			if self.headers.get("Range"):
+				offset = int(self.headers["Range"].split("=")[1].rstrip("-"))
+				self.send_response(206)
+			else:
+				self.send_response(200)
+			self.send_header("Content-Length", str(len(data) - offset))
+			self.end_headers()
+
+			# connection breaks after half of content
+			if match.group(1) in server.interrupt:
+				server.interrupt.discard(match.group(1))
+				self.wfile.write(data[offset:len(data) // 2])
+				self.wfile.flush()
+				self.close_connection = True
+				return
+
+			self.wfile.write(data[offset:])
+			return
+
+		etag = f'"v{server.version}"'
+		if self.headers.get("If-None-Match") == etag:
+			self.send_response(304)
+			self.send_header("Content-Length", "0")
+			self.end_headers()
+			return
+
+		# server limits page size, with next link if server.next_link is set
+		query = parse_qs(url.query)
+		top = min(int(query["$top"][0]), server.page_limit) if "$top" in query else server.page_limit
+		skip = int(query["$skip"][0])
+		items = server.items[skip:skip + top]
+		if "$select" in query:
+			items = [{key: item[key] for key in query["$select"][0].split(",")} for item in items]
+
+		payload = {"value": items}
+		if server.next_link and skip + top < len(server.items):
+			payload["@odata.nextLink"] = f"{url.path.rsplit('/', 1)[1]}?$skip={skip + top}&$select=Id,Name,Path"
+		body = json.dumps(payload).encode()
+		self.send_response(200)
+		self.send_header("ETag", etag)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+
+@pytest.fixture
+def report_server():
+	server = ThreadingHTTPServer(("127.0.0.1", 0), _ReportServer)
+	server.daemon_threads = True
+	server.version = 1
+	server.requests = []
+	server.interrupt = set()
+	server.page_limit = 1000
+	server.next_link = False
+	server.items = [{"Id": f"id{number}", "Name": f"report{number}", "Path": f"/Sales/report{number}",
+	                 "Type": "PowerBIReport", "ModifiedDate": "2024-01-01T00:00:00Z", "Size": 4000}
+	                for number in range(3)]
+	server.content = {item["Id"]: os.urandom(4000) for item in server.items}
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+
+	api = PBIRS_API()
+	api.url_base = f"http://127.0.0.1:{server.server_address[1]}/api/v2.0/"
+
+	yield server, api
+
+	api.close()
+	server.shutdown()
+	server.server_close()
+
+
+def _content_requests(server):
+	return [path for path, _ in server.requests if path.endswith("/Content/$value")]
+
+
+def test_export_catalog_downloads_all_items(report_server, tmp_path):
+	server, api = report_server
+
+	df_result, summary = api.export_catalog(tmp_path)
+
+	assert summary["downloaded"] == 3
+	for item in server.items:
+		with open(file=tmp_path / "Sales" / f"{item['Name']}.pbix", mode="rb") as f:
+			assert f.read() == server.content[item["Id"]]
+
+
+def test_export_catalog_skips_unchanged_items(report_server, tmp_path):
+	server, api = report_server
+	api.export_catalog(tmp_path)
+	server.requests.clear()
+
+	df_result, summary = api.export_catalog(tmp_path)
+
+	assert summary["skipped"] == 3
+	assert _content_requests(server) == []
+
+
+def test_export_catalog_sees_change_within_cache_ttl(report_server, tmp_path):
+	server, api = report_server
+	api.cache.ttl = 300
+	api.export_catalog(tmp_path)
+
+	# item changes on server while catalog is still cached
+	server.items[1]["ModifiedDate"] = "2024-02-01T00:00:00Z"
+	server.content["id1"] = os.urandom(4000)
+	server.version += 1
+	server.requests.clear()
+
+	df_result, summary = api.export_catalog(tmp_path)
+
+	assert summary["downloaded"] == 1
+	assert summary["skipped"] == 2
+	assert _content_requests(server) == ["/api/v2.0/CatalogItems(id1)/Content/$value"]
+	with open(file=tmp_path / "Sales" / "report1.pbix", mode="rb") as f:
+		assert f.read() == server.content["id1"]
+
+
+def test_export_catalog_resumes_interrupted_download(report_server, tmp_path):
+	server, api = report_server
+	server.interrupt.add("id2")
+
+	# small chunks, so that content before break is on disk
+	df_result, summary = api.export_catalog(tmp_path, chunk_size=500)
+
+	assert summary["failed"] == 1
+	assert os.path.getsize(tmp_path / "Sales" / "report2.pbix.part") == 2000
+	assert not os.path.exists(tmp_path / "Sales" / "report2.pbix")
+	server.requests.clear()
+
+	df_result, summary = api.export_catalog(tmp_path)
+
+	assert summary["resumed"] == 1
+	assert summary["skipped"] == 2
+	assert summary["bytes"] == 2000
+	ranges = [headers.get("Range") for path, headers in server.requests if path.endswith("/Content/$value")]
+	assert ranges == ["bytes=2000-"]
+	with open(file=tmp_path / "Sales" / "report2.pbix", mode="rb") as f:
+		assert f.read() == server.content["id2"]
+
+
+def test_export_catalog_restarts_download_of_changed_item(report_server, tmp_path):
+	server, api = report_server
+	server.interrupt.add("id0")
+	api.export_catalog(tmp_path, chunk_size=500)
+	assert os.path.getsize(tmp_path / "Sales" / "report0.pbix.part") == 2000
+
+	# partial file belongs to old version and must not be continued
+	server.items[0]["ModifiedDate"] = "2024-02-01T00:00:00Z"
+	server.content["id0"] = os.urandom(4000)
+	server.version += 1
+	server.requests.clear()
+
+	df_result, summary = api.export_catalog(tmp_path)
+
+	assert summary["downloaded"] == 1
+	ranges = [headers.get("Range") for path, headers in server.requests if path.endswith("/Content/$value")]
+	assert ranges == [None]
+	with open(file=tmp_path / "Sales" / "report0.pbix", mode="rb") as f:
+		assert f.read() == server.content["id0"]
+
+
+def _catalog_requests(server):
+	return [path for path, _ in server.requests if path.endswith("/CatalogItems")]
+
+
+def test_get_catalog_reads_pages_smaller_than_requested(report_server):
+	server, api = report_server
+	server.page_limit = 2
+
+	df_items = api.get_catalog_items(select=["Id", "Name", "Path"])
+
+	assert df_items["Id"].tolist() == ["id0", "id1", "id2"]
+	# paging stops at first empty page
+	assert len(_catalog_requests(server)) == 3
+
+
+def test_get_catalog_follows_next_link(report_server):
+	server, api = report_server
+	server.page_limit = 2
+	server.next_link = True
+
+	df_items = api.get_catalog_items(select=["Id", "Name", "Path"], page_size=2)
+
+	assert df_items["Id"].tolist() == ["id0", "id1", "id2"]
+	# last page has no next link, no empty page is requested
+	assert len(_catalog_requests(server)) == 2
+
+
+def test_catalog_cache_is_off_by_default(report_server):
+	server, api = report_server
+
+	api.get_catalog_items(select=["Id"])
+	api.get_catalog_items(select=["Id"])
+
+	# second listing asks server again, unchanged page is answered by 304
+	assert len(_catalog_requests(server)) == 4
+	assert [headers.get("If-None-Match") for _, headers in server.requests][2:] == ['"v1"', '"v1"']
+
+
+def test_catalog_cache_file_is_written_once_per_listing(report_server, tmp_path, monkeypatch):
+	server, api = report_server
+	server.page_limit = 1
+	cache_path = str(tmp_path / "catalog.json")
+	api.cache = CatalogCache(ttl=300, cache_path=cache_path)
+	writes = []
+	monkeypatch.setattr(os, "replace", lambda src, dst: writes.append(dst) or os.rename(src, dst))
+
+	api.get_catalog_items(select=["Id"])
+	assert writes == [cache_path]
+
+	# fresh pages from cache change nothing
+	api.get_catalog_items(select=["Id"])
+	api.close()
+	assert writes == [cache_path]
+	assert len(CatalogCache(cache_path=cache_path).entries) == 4
@@ -0,0 +1,97 @@
+import smtplib
+import pytest
+from benchmarks.smtp_sink import SMTPSink
+from send_email import MailSession, SendEmail
+
+MESSAGE = b"Subject: test\r\n\r\nbody\r\n"
+
+
+def test_mail_session_reuses_connection():
+	with SMTPSink() as sink:
+		host, port = sink.server_address
+		with MailSession(host=host, port=port) as session:
+			for _ in range(5):
+				session.send_raw(from_addr="a@example.com", to_list=["b@example.com"], data=MESSAGE)
+
+	assert len(sink.received) == 5
+	assert sink.connections == 1
+	assert session.connection_count == 1
+
+
+def test_mail_session_reconnects_after_421():
+	with SMTPSink(max_messages_per_connection=2) as sink:
+		host, port = sink.server_address
+		with MailSession(host=host, port=port, retries=1) as session:
+			for _ in range(5):
+				session.send_raw(from_addr="a@example.com", to_list=["b@example.com"], data=MESSAGE)
+
+	# every email is delivered once, a new connection after each 421
+	assert len(sink.received) == 5
+	assert session.connection_count == 3
+	assert len(session.latencies) == 5
+
+
+def test_mail_session_reconnects_before_server_limit():
+	with SMTPSink(max_messages_per_connection=2) as sink:
+		host, port = sink.server_address
+		with MailSession(host=host, port=port, max_messages_per_connection=2, retries=0) as session:
+			for _ in range(5):
+				session.send_raw(from_addr="a@example.com", to_list=["b@example.com"], data=MESSAGE)
+
+	assert len(sink.received) == 5
+	assert session.connection_count == 3
+
+
+def test_mail_session_raises_421_without_retries():
+	with SMTPSink(max_messages_per_connection=1) as sink:
+		host, port = sink.server_address
+		with MailSession(host=host, port=port, retries=0) as session:
+			session.send_raw(from_addr="a@example.com", to_list=["b@example.com"], data=MESSAGE)
+
+			with pytest.raises(smtplib.SMTPResponseException) as error:
+				session.send_raw(from_addr="a@example.com", to_list=["b@example.com"], data=MESSAGE)
+
+	assert error.value.smtp_code == 421
+	assert len(sink.received) == 1
+
+
+def _email():
+	return SendEmail(sender_name="Sender", sender_address="a@example.com", receiver=["b@example.com"], cc=[],
+	                 subject="test", content="report attached")
+
+
+def test_missing_attachment_fails_before_data(tmp_path):
+	path = tmp_path / "report.pdf"
+	path.write_bytes(b"%PDF" * 1000)
+
+	with SMTPSink() as sink:
+		host, port = sink.server_address
+		with MailSession(host=host, port=port) as session:
+			with pytest.raises(FileNotFoundError):
+				_email().send_email_streamed(attachment_path=[str(path), str(tmp_path / "missing.pdf")],
+				                             session=session)
+
+			# connection is untouched and still usable
+			_email().send_email_streamed(attachment_path=[str(path)], session=session)
+
+	assert len(sink.received) == 1
+	assert session.connection_count == 1
+
+
+def test_error_inside_data_drops_connection():
+	def blocks():
+		yield b"Subject: test\r\n\r\n"
+		raise OSError("disk gone")
+
+	with SMTPSink() as sink:
+		host, port = sink.server_address
+		with MailSession(host=host, port=port) as session:
+			with pytest.raises(OSError):
+				session._deliver(lambda: session._sendmail_blocks(from_addr="a@example.com",
+				                                                  to_list=["b@example.com"], blocks=blocks()))
+			assert session.email_server is None
+
+			session.send_raw(from_addr="a@example.com", to_list=["b@example.com"], data=MESSAGE)
+
+	assert len(sink.received) == 1
+	assert session.connection_count == 2
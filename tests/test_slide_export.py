@@ -0,0 +1,41 @@
+import os
+from document_converter import ConverterBackend
+from slide_export import SlideExporter
+
+
+class _Backend(ConverterBackend):
+	"""
+	Writes one image per deck with path of deck as content
+	"""
+
+	def export_slides(self, path_src, slides, dir_dst, width=None, height=None):
+		path_image = os.path.join(dir_dst, "slide_1.png")
+		with open(file=path_image, mode="w") as f:
+			f.write(path_src)
+		return {1: path_image}
+
+
+def _write(path):
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(file=path, mode="w") as f:
+		f.write(path)
+	return path
+
+
+def test_decks_with_same_name_get_own_directories(tmp_path):
+	path_one = _write(str(tmp_path / "one" / "deck.pptx"))
+	path_two = _write(str(tmp_path / "two" / "Deck.pptx"))
+	dir_dst = tmp_path / "images"
+
+	SlideExporter(backend=_Backend, workers=1).export([path_one, path_two], dir_dst)
+
+	with open(file=dir_dst / "deck" / "slide_1.png") as f:
+		assert f.read() == path_one
+	with open(file=dir_dst / "Deck_2" / "slide_1.png") as f:
+		assert f.read() == path_two
+
+	# directory is kept from manifest, even if order of decks changes
+	exporter = SlideExporter(backend=_Backend, workers=1)
+	exporter.export([path_two, path_one], dir_dst)
+	assert exporter.report["status"].tolist() == ["unchanged", "unchanged"]
+	assert sorted(os.listdir(dir_dst)) == [".slide_manifest.json", "Deck_2", "deck"]
@@ -0,0 +1,80 @@
+import logging
+import pytest
+from sql_log_handler import SQLServerLogHandler
+
+
+class _Down(Exception):
+	pass
+
+
+class _Connection:
+
+	def __init__(self, server):
+		self.server = server
+
+	def cursor(self):
+		return self
+
+	def executemany(self, sql, rows):
+		self.server.rows.extend(rows)
+
+	def commit(self):
+		pass
+
+	def close(self):
+		pass
+
+
+class _SQLServer:
+	"""
+	Stand-in for MSSQL, con_pyodbc raises error while down
+	"""
+
+	def __init__(self, error=None):
+		self.error = error
+		self.rows = []
+
+	def con_pyodbc(self):
+		if self.error is not None:
+			raise self.error
+		return _Connection(self)
+
+
+@pytest.fixture
+def logger():
+	logger = logging.getLogger("test_sql_log_handler")
+	logger.propagate = False
+	yield logger
+	logger.handlers.clear()
+
+
+def test_dropped_records_are_reported(logger, capsys):
+	handler = SQLServerLogHandler(_SQLServer(error=_Down("down")), "log", batch_size=100, flush_interval=60,
+	                              max_buffer=5)
+	logger.addHandler(handler)
+
+	for number in range(8):
+		logger.warning("message %s", number)
+	handler.close()
+
+	# 3 evicted from full buffer, 5 not spooled without spool_path
+	assert handler.dropped == 8
+	assert "8 log records dropped" in capsys.readouterr().err
+
+
+def test_writer_survives_unexpected_error(logger, tmp_path):
+	server = _SQLServer(error=ValueError("unexpected"))
+	spool_path = str(tmp_path / "log.jsonl")
+	handler = SQLServerLogHandler(server, "log", batch_size=2, flush_interval=0.05, spool_path=spool_path)
+	logger.addHandler(handler)
+
+	logger.warning("first")
+	logger.warning("second")
+	handler.wake.set()
+	handler.stopped.wait(timeout=0.3)
+	assert handler.writer.is_alive()
+
+	# records were spooled and are inserted once database is back
+	server.error = None
+	handler.close()
+	assert [row[7] for row in server.rows] == ["first", "second"]
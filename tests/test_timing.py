@@ -0,0 +1,26 @@
+from timing import Metrics
+
+
+def test_percentiles_use_nearest_rank():
+	metrics = Metrics()
+	metrics.record("two", 1.0)
+	metrics.record("two", 3.0)
+	for seconds in range(1, 101):
+		metrics.record("hundred", float(seconds))
+
+	rows = {row["span"]: row for row in metrics.summary()}
+
+	assert (rows["two"]["p50"], rows["two"]["p95"], rows["two"]["max"]) == (1.0, 3.0, 3.0)
+	assert (rows["hundred"]["p50"], rows["hundred"]["p95"]) == (50.0, 95.0)
+
+
+def test_samples_are_bounded():
+	metrics = Metrics(max_samples=100)
+	for seconds in range(10000):
+		metrics.record("span", float(seconds))
+
+	assert len(metrics.durations["span"]["samples"]) == 100
+	row = metrics.summary()[0]
+	# count, total and max stay exact
+	assert (row["count"], row["total"], row["max"]) == (10000, sum(range(10000)), 9999.0)
+	assert 0.0 <= row["p50"] <= 9999.0
@@ -0,0 +1,242 @@
+import atexit
+import csv
+import functools
+import logging
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class Metrics:
+	"""
+	Collect durations of named spans and write summary to log; count, total and max are exact, percentiles come from
+	a random sample of at most max_samples durations per span, so memory does not grow with number of calls
+	"""
+
+	def __init__(self, max_samples=10000):
+		"""
+		Initialization for attributes, disabled until start is called
+		:param max_samples: int | durations kept per span name for percentiles
+		"""
+
+		self.enabled = False
+		self.max_samples = max_samples
+		self.durations = {}
+		self.random = random.Random()
+		self.lock = threading.Lock()
+		self.local = threading.local()
+		self.logger = logging.getLogger("timing")
+		self.path_metrics = None
+		self.flush_interval = None
+		self.timer = None
+		self.exit_registered = False
+
+	def start(self, flush_interval=60, path_metrics=None, logger=None):
+		"""
+		Enable timing and write summary regularly
+		:param flush_interval: float | seconds between two summaries, only at exit if None
+		:param path_metrics: path like | also append summary to .csv or .parquet file
+		:param logger: object | logger for summary, logger "timing" if None
+		:return: None
+		"""
+
+		self.enabled = True
+		self.flush_interval = flush_interval
+		self.path_metrics = path_metrics
+		if logger is not None:
+			self.logger = logger
+
+		if not self.exit_registered:
+			atexit.register(self.stop)
+			self.exit_registered = True
+
+		# calling start again must not add a second chain of timers
+		if self.timer is not None:
+			self.timer.cancel()
+			self.timer = None
+		self._schedule()
+
+	def stop(self):
+		"""
+		Write last summary and disable timing
+		:return: None
+		"""
+
+		if self.timer is not None:
+			self.timer.cancel()
+			self.timer = None
+
+		if self.enabled:
+			self.flush()
+		self.enabled = False
+
+	def record(self, name, seconds):
+		"""
+		Add one duration
+		:param name: str | span name
+		:param seconds: float | duration
+		:return: None
+		"""
+
+		with self.lock:
+			stats = self.durations.get(name)
+			if stats is None:
+				stats = self.durations[name] = {"count": 0, "total": 0.0, "max": seconds, "samples": []}
+
+			stats["count"] += 1
+			stats["total"] += seconds
+			stats["max"] = max(stats["max"], seconds)
+
+			# reservoir sampling: each duration is kept with same probability
+			if len(stats["samples"]) < self.max_samples:
+				stats["samples"].append(seconds)
+			else:
+				position = self.random.randrange(stats["count"])
+				if position < self.max_samples:
+					stats["samples"][position] = seconds
+
+	@contextmanager
+	def span(self, name):
+		"""
+		Measure duration of with block, nested spans are named parent/child
+		:param name: str | span name
+		:return: None
+		"""
+
+		stack = getattr(self.local, "stack", None)
+		if stack is None:
+			stack = self.local.stack = []
+
+		stack.append(name)
+		full_name = "/".join(stack)
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.record(name=full_name, seconds=time.perf_counter() - start)
+			stack.pop()
+
+	def summary(self, reset=False):
+		"""
+		Count, total, p50, p95 and max for each span name
+		:param reset: boolean | drop collected durations afterwards
+		:return: list | one dict for each span name
+		"""
+
+		with self.lock:
+			durations = self.durations
+			if reset:
+				self.durations = {}
+
+		rows = []
+		for name, stats in sorted(durations.items()):
+			values = sorted(stats["samples"])
+			rows.append({"span": name,
+			             "count": stats["count"],
+			             "total": stats["total"],
+			             "p50": self._percentile(values, 0.50),
+			             "p95": self._percentile(values, 0.95),
+			             "max": stats["max"]})
+
+		return rows
+
+	def flush(self):
+		"""
+		Write summary since last flush to log and metrics file
+		:return: list | summary
+		"""
+
+		rows = self.summary(reset=True)
+		if not rows:
+			return rows
+
+		for row in rows:
+			self.logger.info("span %s count=%d total=%.3fs p50=%.4fs p95=%.4fs max=%.4fs", row["span"],
+			                 row["count"], row["total"], row["p50"], row["p95"], row["max"])
+
+		if self.path_metrics:
+			self._write_file(rows)
+
+		return rows
+
+	def _schedule(self):
+		if not self.flush_interval or not self.enabled:
+			return
+
+		self.timer = threading.Timer(interval=self.flush_interval, function=self._flush_and_schedule)
+		self.timer.daemon = True
+		self.timer.start()
+
+	def _flush_and_schedule(self):
+		self.flush()
+		# timer replaced by start() or stop() meanwhile
+		if self.timer is threading.current_thread():
+			self._schedule()
+
+	def _write_file(self, rows):
+		flushed = time.strftime("%Y-%m-%d %H:%M:%S")
+		rows = [{"flushed": flushed, **row} for row in rows]
+
+		if str(self.path_metrics).endswith(".parquet"):
+			import pandas as pd
+
+			df_rows = pd.DataFrame(data=rows)
+			if os.path.exists(self.path_metrics):
+				df_rows = pd.concat([pd.read_parquet(self.path_metrics), df_rows], ignore_index=True)
+			df_rows.to_parquet(self.path_metrics, index=False)
+			return
+
+		new_file = not os.path.exists(self.path_metrics)
+		with open(file=self.path_metrics, mode="a", newline="", encoding="utf-8") as f:
+			writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+			if new_file:
+				writer.writeheader()
+			writer.writerows(rows)
+
+	@staticmethod
+	def _percentile(values, q):
+		# nearest rank: smallest value with at least q of all values less or equal
+		return values[max(math.ceil(q * len(values)), 1) - 1]
+
+
+# shared instance used by span and timed
+METRICS = Metrics()
+
+
+def span(name):
+	"""
+	Context manager measuring one named span, does nothing while timing is disabled
+	:param name: str | span name
+	:return: object | context manager
+	"""
+
+	if not METRICS.enabled:
+		return nullcontext()
+
+	return METRICS.span(name)
+
+
+def timed(name=None):
+	"""
+	Decorator measuring each call of function as one span
+	:param name: str | span name, qualified function name if None
+	:return: function | decorator
+	"""
+
+	def decorator(func):
+		span_name = name or func.__qualname__
+
+		@functools.wraps(func)
+		def wrapper(*args, **kwargs):
+			if not METRICS.enabled:
+				return func(*args, **kwargs)
+
+			with METRICS.span(span_name):
+				return func(*args, **kwargs)
+
+		return wrapper
+
+	return decorator